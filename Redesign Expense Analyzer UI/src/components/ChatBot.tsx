@@ -1,7 +1,7 @@
 import { useState, useRef, useEffect } from 'react';
 import { motion } from 'motion/react';
 import { X, Send, Sparkles } from 'lucide-react';
-import { askChatbot } from '../services/api';
+import { streamChatbot } from '../services/api';
 
 interface Message {
   role: 'user' | 'assistant';
@@ -52,13 +52,20 @@ export function ChatBot({ isOpen, onClose, startDate, endDate }: ChatBotProps) {
     setIsLoading(true);
 
     try {
-      const response = await askChatbot(input, startDate, endDate);
-      const assistantMessage: Message = {
-        role: 'assistant',
-        content: response.answer,
-        timestamp: new Date()
-      };
-      setMessages(prev => [...prev, assistantMessage]);
+      let started = false;
+      await streamChatbot(input, startDate, endDate, (token) => {
+        if (!started) {
+          // first token: swap the typing indicator for the growing answer
+          started = true;
+          setIsLoading(false);
+          setMessages(prev => [...prev, { role: 'assistant', content: token, timestamp: new Date() }]);
+          return;
+        }
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          return [...prev.slice(0, -1), { ...last, content: last.content + token }];
+        });
+      });
     } catch (error: any) {
       const errorMessage: Message = {
         role: 'assistant',
@@ -68,6 +68,23 @@ export interface Merchant {
   }[];
 }
 
+export interface JobStage {
+  status: 'pending' | 'running' | 'done';
+  done: number;
+  total: number | null;
+  seconds: number;
+}
+
+export interface JobStatus {
+  id: string;
+  kind: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  stages: Record<string, JobStage>;
+  result: { transactions_count?: number; answer?: string } | null;
+  error: string | null;
+  duration_s: number | null;
+}
+
 export interface DateRange {
   min_date: string;
   max_date: string;
@@ -256,6 +273,19 @@ export async function addMerchantRule(merchant: string, category: string): Promi
   return response.json();
 }
 
+/**
+ * Add or update many merchant rules with a single recategorization
+ */
+export async function addMerchantRules(rules: { merchant: string; category: string }[]): Promise<{ success: boolean; saved: number; message: string }> {
+  const response = await fetch(`${API_BASE_URL}/settings/merchant-rules/bulk`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ rules })
+  });
+  if (!response.ok) throw new Error('Failed to add merchant rules');
+  return response.json();
+}
+
 /**
  * Get one-off overrides
  */
@@ -279,7 +309,41 @@ export async function addOneOffOverride(txn_id: string, category: string): Promi
 }
 
 /**
- * Upload CSV files
+ * Add or update many one-off overrides with a single recategorization
+ */
+export async function addOneOffOverrides(overrides: { txn_id: string; category: string }[]): Promise<{ success: boolean; saved: number; message: string }> {
+  const response = await fetch(`${API_BASE_URL}/settings/one-off/bulk`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ overrides })
+  });
+  if (!response.ok) throw new Error('Failed to add one-off overrides');
+  return response.json();
+}
+
+/**
+ * Get status of a background job
+ */
+export async function getJob(jobId: string): Promise<JobStatus> {
+  const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+  if (!response.ok) throw new Error('Failed to fetch job status');
+  return response.json();
+}
+
+/**
+ * Poll a background job until it finishes
+ */
+export async function waitForJob(jobId: string, intervalMs = 1000): Promise<JobStatus> {
+  while (true) {
+    const job = await getJob(jobId);
+    if (job.status === 'succeeded') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Processing failed');
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+}
+
+/**
+ * Upload CSV files (processing runs as a background job; this waits for it)
  */
 export async function uploadFiles(files: File[]): Promise<{ success: boolean; message: string; files: string[]; transactions_count: number }> {
   const formData = new FormData();
@@ -290,7 +354,9 @@ export async function uploadFiles(files: File[]): Promise<{ success: boolean; me
     body: formData
   });
   if (!response.ok) throw new Error('Failed to upload files');
-  return response.json();
+  const data = await response.json();
+  const job = await waitForJob(data.job_id);
+  return { ...data, transactions_count: job.result?.transactions_count ?? 0 };
 }
 
 /**
@@ -313,7 +379,9 @@ export async function deleteFile(filename: string): Promise<{ success: boolean;
     const errorData = await response.json().catch(() => ({ error: 'Unknown error' }));
     throw new Error(errorData.error || 'Failed to delete file');
   }
-  return response.json();
+  const data = await response.json();
+  await waitForJob(data.job_id);
+  return data;
 }
 
 /**
@@ -335,7 +403,57 @@ export async function getDateRange(): Promise<{ min_date: string; max_date: stri
 }
 
 /**
- * Ask AI chatbot a question about spending
+ * Ask AI chatbot a question and receive the answer token by token (server-sent events).
+ * Resolves with the full answer once the stream ends.
+ */
+export async function streamChatbot(
+  question: string,
+  startDate: string,
+  endDate: string,
+  onToken: (token: string) => void
+): Promise<string> {
+  const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({
+      question,
+      start_date: startDate,
+      end_date: endDate
+    })
+  });
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({ error: 'Failed to get AI response' }));
+    throw new Error(errorData.error || 'Failed to get AI response');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop() || '';
+    for (const raw of events) {
+      const lines = raw.split('\n');
+      const event = lines.find(l => l.startsWith('event: '))?.slice(7) || 'message';
+      const data = JSON.parse(lines.find(l => l.startsWith('data: '))?.slice(6) || '{}');
+      if (event === 'error') throw new Error(data.error || 'Failed to get AI response');
+      if (event === 'message' && data.token) {
+        answer += data.token;
+        onToken(data.token);
+      }
+    }
+  }
+  return answer;
+}
+
+/**
+ * Ask AI chatbot a question about spending (LLM answers run as a background job; this waits for it)
  */
 export async function askChatbot(question: string, startDate: string, endDate: string): Promise<{ answer: string }> {
   const response = await fetch(`${API_BASE_URL}/chat`, {
@@ -353,5 +471,8 @@ export async function askChatbot(question: string, startDate: string, endDate: s
     const errorData = await response.json().catch(() => ({ error: 'Failed to get AI response' }));
     throw new Error(errorData.error || 'Failed to get AI response');
   }
-  return response.json();
+  const data = await response.json();
+  if (response.status !== 202) return data;
+  const job = await waitForJob(data.job_id, 250);
+  return { answer: job.result?.answer ?? '' };
 }
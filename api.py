@@ -3,8 +3,11 @@
 import os
 import json
 import calendar
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import google.generativeai as genai
@@ -13,78 +16,383 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-from src.categorize_transactions import categorize, load_overrides, load_one_off, clean_string
-from src.clean_transactions import clean_all
-from src.forecast import forecast_by_category, forecast_total_spend
-from src.plot_charts import _read_data, CLEAN_DIR
+from src.categorize_transactions import (
+    STATS_FILE, CategorizeStats, categorize, categorize_partitions, load_overrides, load_one_off, load_stats, save_stats,
+)
+from src.normalize import clean_string
+from src.config_store import config_store
+from src.rules import RuleError, compile_rules, load_rules
+from src.ngram_model import ML_ENABLED, learn as learn_override, train as train_model, training_examples
+from src.clean_transactions import (
+    CLEAN_CSV, CLEAN_SOURCES, append_clean, clean_all, clean_files, clean_sources, load_clean, raw_signatures,
+)
+from src.dedup import (
+    REPORT_FILE as DEDUP_REPORT, DedupReport, duplicate_new_rows, load_report as load_dedup_report, save_report,
+)
+from src.forecast import forecast_by_category_from_summary, forecast_total_from_summary
+from src.plot_charts import CLEAN_DIR
+from src.dataset import (
+    load_dataset, log_assignments, log_rows, needs_compaction, publish_dataset, drop_dataset, read_version, txn_id_str,
+)
+from src.txlog import ChangeLog
+from src.atomic_io import atomic_path, write_csv_atomic, write_json_atomic
+from src.pipeline import PipelineCoordinator
+from src.jobs import JobQueue
+from src.search_index import dataset_search_index
+from src.row_index import select_rows, scan_rows
+from src.partitions import OUT_OF_CORE, clean_store, categorized_store
+from src.summaries import monthly_summary
+from src.intents import stats as intent_stats
+from src.metrics import PIPELINE_METRICS, finish_trace, registry as metrics, stage, start_trace
+from src.progress import ProgressGroup
+from src.memory_budget import budget
+from src.tenants import DEFAULT_TENANT, TENANT_HEADER, TenantError, get_tenant
+from src import profiling
+from src.chat import ChatBusy, service as chat_service, start_answer as start_chat, stats as chat_stats, stream_answer
 
 app = Flask(__name__)
 CORS(app)
 
-OVERRIDES_JSON = "data/config/overrides.json"
-ONE_OFF_CSV = "data/config/one_off_overrides.csv"
+# the default tenant's layout; other tenants live under EXPENSE_TENANTS_DIR (see src.tenants)
 RAW_DIR = "data/raw"
+JOBS_DIR = "data/jobs"
 
 # Configure Gemini API (you'll need to set your API key)
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY_HERE")
 genai.configure(api_key=GEMINI_API_KEY)
 
 
-def _load_clean_df():
+@app.before_request
+def _start_trace():
+    """Collect per-stage timings for this request (see src.metrics)."""
+    start_trace(request.url_rule.rule if request.url_rule else "unmatched")
+
+
+@app.after_request
+def _finish_trace(response):
+    finish_trace(response.status_code, method=request.method)
+    return response
+
+
+@app.before_request
+def _start_profile():
+    """Profile this request when EXPENSE_PROFILE is on or the debug header asks (see src.profiling)."""
+    if profiling.PROFILE_ALL or profiling.header_requested(request.headers.get(profiling.PROFILE_HEADER)):
+        g.profile = profiling.start(f"{request.method} {request.path}")
+
+
+@app.after_request
+def _finish_profile(response):
+    path = profiling.finish(g.pop("profile", None))
+    if path:
+        response.headers["X-Expense-Profile-File"] = os.path.basename(path)
+    return response
+
+
+@app.teardown_request
+def _drop_profile(exc):
+    # the handler raised before after_request could run
+    profiling.finish(g.pop("profile", None))
+
+
+def _dataset_rows():
+    """Rows in the default tenant's published dataset (0 before the first categorize run)."""
+    clean_dir = get_tenant(DEFAULT_TENANT).clean_dir
+    if OUT_OF_CORE:
+        return categorized_store(clean_dir).rows()
+    return len(load_dataset(clean_dir)) if read_version(clean_dir) else 0
+
+
+def _chat_metrics():
+    numbers = {**chat_stats.snapshot(), **chat_service.in_flight()}
+    intents = intent_stats.snapshot()
+    numbers.update({f"intent_{k}": v for k, v in intents.items() if not isinstance(v, dict)})
+    return {(("stat", k),): v for k, v in numbers.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+def _cache_metrics():
+    numbers = budget.stats()
+    values = {(("cache", c), ("stat", "bytes")): n for c, n in numbers["bytes_by_cache"].items()}
+    values.update({(("cache", c), ("stat", "evictions")): n for c, n in numbers["evictions"].items()})
+    values.update({(("cache", "all"), ("stat", k)): numbers[k] for k in ("limit_bytes", "bytes", "entries", "evicted_bytes")})
+    return values
+
+
+metrics.gauge("expense_dataset_rows", "Transactions in the published dataset.", _dataset_rows)
+metrics.gauge("expense_chat", "Chat counters, in-flight calls and local-answer hit rate.", _chat_metrics)
+metrics.gauge("expense_cache_memory", "Shared cache budget: bytes held and evictions per cache, across tenants.",
+              _cache_metrics)
+metrics.gauge("expense_tenants_active", "Tenants with a pipeline coordinator in this worker.", lambda: len(_pipelines))
+
+
+def _config_paths(tenant):
+    """categorize() keyword arguments selecting the tenant's overrides, rules, model and normalization cache."""
+    return {"config_db": tenant.config_db, "rules_json": tenant.rules_json, "model_dir": tenant.model_dir,
+            "norm_cache": tenant.norm_cache}
+
+
+def _load_clean_df(tenant):
     """Load cleaned transactions."""
-    path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
-    if not os.path.exists(path):
-        return pd.DataFrame(columns=["date", "description", "amount_signed", "amount_spend", "category"])
-    df = pd.read_csv(path, parse_dates=["date"])
-    return df
+    return load_clean(tenant.clean_dir)
 
 
-def _load_cat_df():
-    """Load categorized transactions."""
-    return _read_data(CLEAN_DIR)
+def _load_cat_df(tenant):
+    """Load categorized transactions (memory-mapped, shared across workers)."""
+    if OUT_OF_CORE:
+        # full-history views: every partition, still memory-mapped
+        return categorized_store(tenant.clean_dir).read_range()
+    return load_dataset(tenant.clean_dir)
 
 
-def _save_cat_df(df_cat: pd.DataFrame):
-    """Save categorized transactions."""
-    out_path = os.path.join(CLEAN_DIR, "transactions_categorized.csv")
-    df_cat.to_csv(out_path, index=False)
+def _save_cat_df(tenant, df_cat: pd.DataFrame, sources=None):
+    """Save categorized transactions and publish them to all workers as a new snapshot."""
+    out_path = os.path.join(tenant.clean_dir, "transactions_categorized.csv")
+    write_csv_atomic(df_cat, out_path)
+    publish_dataset(df_cat, tenant.clean_dir, sources)
     return out_path
 
 
-def _save_overrides(d):
-    """Save merchant override rules."""
-    os.makedirs(os.path.dirname(OVERRIDES_JSON), exist_ok=True)
-    with open(OVERRIDES_JSON, "w") as f:
-        json.dump(d, f, indent=2)
-
+class _StaleExport(Exception):
+    """The dataset changed while its CSV export was being written."""
 
-def _save_one_off_map(m):
-    """Save one-time transaction overrides."""
-    rows = [{"txn_id": k, "category": v} for k, v in m.items()]
-    pd.DataFrame(rows).to_csv(ONE_OFF_CSV, index=False)
 
+def _export_csv(tenant):
+    """Rewrite transactions_categorized.csv from the live dataset (snapshot plus change log).
 
-def _recompute_and_refresh():
-    """Re-run categorization and refresh state."""
-    clean_df = _load_clean_df()
-    df_cat = categorize(clean_df)
-    _save_cat_df(df_cat)
-    return df_cat
+    The export is dropped if the dataset changes while it is written: that
+    change queues (or, for a new snapshot, writes) a newer one.
+    """
+    with _exports_lock:
+        _exports_queued.discard(tenant.id)
+    try:
+        version = read_version(tenant.clean_dir)
+        if version is None:
+            return
+        with stage("export"):
+            df = _load_cat_df(tenant)
+            with atomic_path(os.path.join(tenant.clean_dir, "transactions_categorized.csv")) as tmp:
+                df.assign(txn_id=df["txn_id"].map(txn_id_str)).to_csv(tmp, index=False)
+                if read_version(tenant.clean_dir) != version:
+                    raise _StaleExport()
+    except _StaleExport:
+        pass
+    except Exception as e:
+        print(f"CSV export failed for tenant {tenant.id}: {type(e).__name__}: {e}")
+
+
+def _refresh_published(tenant):
+    """After logging changes: fold the log into a new snapshot once it has grown enough, else re-export the CSV.
+
+    The export rewrites every row, so it runs on a background thread rather
+    than in the pipeline run; at most one export per tenant waits at a time.
+    """
+    if needs_compaction(tenant.clean_dir):
+        with stage("compact"):
+            df = _load_cat_df(tenant)
+            sources = ChangeLog(tenant.clean_dir).manifest()["sources"]
+            _save_cat_df(tenant, df.assign(txn_id=df["txn_id"].map(txn_id_str)), sources)
+        return
+    with _exports_lock:
+        if tenant.id in _exports_queued:
+            return
+        _exports_queued.add(tenant.id)
+    _exporter.submit(_export_csv, tenant)
+
+
+def _list_raw_files(tenant):
+    """Names of raw CSVs currently uploaded."""
+    if not os.path.exists(tenant.raw_dir):
+        return []
+    return [f for f in os.listdir(tenant.raw_dir) if f.endswith('.csv')]
+
+
+def _drop_processed(tenant):
+    """Delete processed data files once no raw files are left."""
+    for name in ("transactions_clean.csv", "transactions_clean.arrow", CLEAN_SOURCES, "transactions_categorized.csv",
+                 STATS_FILE, DEDUP_REPORT):
+        path = os.path.join(tenant.clean_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Deleted: {path}")
+    drop_dataset(tenant.clean_dir)
+    clean_store(tenant.clean_dir).drop()
+    categorized_store(tenant.clean_dir).drop()
+
+
+def _new_statements(tenant, raw_files):
+    """Raw files not in the dataset yet, or None when an ingested file was removed or replaced.
+
+    None also means there is no change log to append to (out-of-core mode,
+    nothing published, or a snapshot published without file signatures).
+    """
+    if OUT_OF_CORE or read_version(tenant.clean_dir) is None:
+        return None
+    known = ChangeLog(tenant.clean_dir).manifest()["sources"]
+    if not known:
+        return None
+    current = raw_signatures(tenant.raw_dir, raw_files)
+    if any(current.get(src) != sig for src, sig in known.items()):
+        return None
+    return [f for f in raw_files if os.path.splitext(f)[0] not in known]
+
+
+def _append_statements(tenant, fnames, progress):
+    """Clean, dedup and categorize only the new statements and append them to the change log.
+
+    The cleaned rows go into the clean store as well, so re-categorizing
+    from it (run.py categorize, the Streamlit app) keeps them.
+    """
+    new = clean_files(tenant.raw_dir, fnames, progress)
+    existing = _load_cat_df(tenant)
+    report = DedupReport()
+    with progress.stage("clean", len(fnames), len(fnames)):
+        new = new[~duplicate_new_rows(existing, new, report, tenant.norm_cache)].reset_index(drop=True)
+    save_report(report, tenant.clean_dir)
+    stats = CategorizeStats()
+    with progress.stage("categorize", 1, 1):
+        df_new = categorize(new, stats, **_config_paths(tenant))
+    with progress.stage("persist", 1, 1):
+        sources = raw_signatures(tenant.raw_dir, fnames)
+        log_rows(df_new, tenant.clean_dir, sources)
+        append_clean(new, tenant.clean_dir, sources)
+        save_stats(stats, tenant.clean_dir)
+        _refresh_published(tenant)
+    if ML_ENABLED:
+        train_model(training_examples(_load_cat_df(tenant)), tenant.model_dir)
+    return len(existing) + len(df_new)
+
+
+def _rebuild(tenant, full, progress):
+    """Pipeline body run by the tenant's coordinator: (re-clean and) categorize, then publish.
+
+    Uploads that only add statements, and recategorizations, append to the
+    dataset's change log; removed or replaced files re-clean everything and
+    publish a new snapshot. Returns the number of categorized transactions.
+    """
+    progress = ProgressGroup([progress, PIPELINE_METRICS])
+    if full:
+        raw_files = _list_raw_files(tenant)
+        if not raw_files:
+            print("No files left, deleting processed data files...")
+            _drop_processed(tenant)
+            return 0
+        added = _new_statements(tenant, raw_files)
+        if added:
+            return _append_statements(tenant, added, progress)
+        clean_all(tenant.raw_dir, os.path.join(tenant.clean_dir, CLEAN_CSV), progress=progress,
+                  norm_cache=tenant.norm_cache)
+    # after new statements the learned categorizer is refitted too (train_model)
+    if OUT_OF_CORE:
+        return categorize_partitions(tenant.clean_dir, progress=progress, train_model=full, **_config_paths(tenant))
+    stats = CategorizeStats()
+    if not full and read_version(tenant.clean_dir) is not None:
+        # recategorize what is published and log only the rows whose category changed
+        current = _load_cat_df(tenant)
+        with progress.stage("categorize", 1, 1):
+            df_cat = categorize(current, stats, **_config_paths(tenant))
+        with progress.stage("persist", 1, 1):
+            log_assignments(current, df_cat, tenant.clean_dir)
+            save_stats(stats, tenant.clean_dir)
+            _refresh_published(tenant)
+        return len(df_cat)
+    clean_df = _load_clean_df(tenant)
+    with progress.stage("categorize", 1, 1):
+        df_cat = categorize(clean_df, stats, train_model=full, **_config_paths(tenant))
+    with progress.stage("persist", 1, 1):
+        # the raw files the clean store holds, so later uploads can be appended
+        _save_cat_df(tenant, df_cat, clean_sources(tenant.clean_dir))
+        save_stats(stats, tenant.clean_dir)
+    return len(df_cat)
+
+
+# tenant id -> PipelineCoordinator, least recently used first; each tenant's writes are serialized separately
+_pipelines = OrderedDict()
+_pipelines_lock = threading.Lock()
+# coordinators kept per process; beyond this the least recently used idle ones are dropped
+MAX_PIPELINES = int(os.environ.get("EXPENSE_PIPELINES", 256))
+# CSV re-exports after logged changes run here, one at a time; tenant ids with one waiting
+_exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expense-export")
+_exports_queued = set()
+_exports_lock = threading.Lock()
+# one job pool for every tenant; status files go to each tenant's jobs dir
+jobs = JobQueue(JOBS_DIR, max_workers=int(os.environ.get("EXPENSE_JOB_WORKERS", 2)))
+
+
+def _pipeline(tenant):
+    """The tenant's writer coordinator (created on first use).
+
+    Dropping an idle coordinator is safe on POSIX: runs and edits also take
+    the tenant's file locks, so one still held by a caller stays serialized
+    with its replacement.
+    """
+    with _pipelines_lock:
+        coordinator = _pipelines.get(tenant.id)
+        if coordinator is not None:
+            _pipelines.move_to_end(tenant.id)
+            return coordinator
+        coordinator = _pipelines[tenant.id] = PipelineCoordinator(
+            lambda full, progress: _rebuild(tenant, full, progress), tenant.pipeline_lock)
+        excess = len(_pipelines) - MAX_PIPELINES
+        for tenant_id in list(_pipelines):
+            if excess <= 0:
+                break
+            if tenant_id != tenant.id and _pipelines[tenant_id].idle():
+                del _pipelines[tenant_id]
+                excess -= 1
+        return coordinator
+
+
+@app.before_request
+def _select_tenant():
+    """Scope this request to the tenant named by the X-Expense-Tenant header (see src.tenants)."""
+    if request.endpoint in ("health_check", "get_metrics"):
+        return None
+    try:
+        g.tenant = get_tenant(request.headers.get(TENANT_HEADER))
+    except TenantError as e:
+        return jsonify({"error": str(e)}), 400
+    return None
 
 
-def _reclean_and_refresh():
-    """Run multi-file cleaning then categorize and refresh state."""
+def _teach_model(tenant, merchants=None, txn_ids=None):
+    """Feed new overrides ({merchant or txn_id: category}) to the learned categorizer (when enabled) before recategorizing."""
+    if not ML_ENABLED:
+        return
     try:
-        clean_all()
+        df = _load_cat_df(tenant)
+        texts = {}  # category -> description_norm series
+        if merchants:
+            merchant = df["merchant"].astype(str)
+            for key, category in merchants.items():
+                rows = merchant.str.contains(key, regex=False)
+                texts.setdefault(category, []).append(df.loc[rows, "description_norm"])
+        if txn_ids:
+            category = df["txn_id"].map(txn_id_str).map({str(k): v for k, v in txn_ids.items()})
+            rows = category.notna()
+            for cat, norms in df.loc[rows, "description_norm"].groupby(category[rows], observed=True):
+                texts.setdefault(cat, []).append(norms)
+        for category, parts in texts.items():
+            learn_override(pd.concat(parts).astype(str).unique(), category, model_dir=tenant.model_dir)
     except Exception as e:
-        return {"error": str(e)}, 500
-    return _recompute_and_refresh()
+        print(f"Learned categorizer not updated: {type(e).__name__}: {e}")
+
+
+def _recompute_and_refresh(tenant):
+    """Re-run categorization and refresh state."""
+    return _pipeline(tenant).request(full=False)
 
 
-def _save_uploaded_files(files):
-    """Persist uploaded files into data/raw with unique names."""
+def _submit_reclean(tenant, kind):
+    """Queue a re-clean + categorize run; returns the job."""
+    def work(job):
+        return {"transactions_count": _pipeline(tenant).request(full=True, progress=job)}
+    return jobs.submit(kind, work, tenant.jobs_dir)
+
+
+def _save_uploaded_files(tenant, files):
+    """Persist uploaded files into the tenant's raw dir with unique names."""
     import re
-    os.makedirs(RAW_DIR, exist_ok=True)
+    os.makedirs(tenant.raw_dir, exist_ok=True)
     saved = []
     for uf in files:
         base_name = os.path.splitext(uf.filename)[0]
@@ -92,18 +400,18 @@ def _save_uploaded_files(files):
         fname = safe_base + ".csv"
         # ensure uniqueness
         counter = 1
-        while os.path.exists(os.path.join(RAW_DIR, fname)):
+        while os.path.exists(os.path.join(tenant.raw_dir, fname)):
             fname = f"{safe_base}_{counter}.csv"
             counter += 1
-        full_path = os.path.join(RAW_DIR, fname)
+        full_path = os.path.join(tenant.raw_dir, fname)
         uf.save(full_path)
         saved.append(fname)
     return saved
 
 
-def _delete_raw_file(filename):
+def _delete_raw_file(tenant, filename):
     """Delete a raw CSV and refresh dataset."""
-    path = os.path.join(RAW_DIR, filename)
+    path = os.path.join(tenant.raw_dir, filename)
     if os.path.exists(path):
         os.remove(path)
         return True
@@ -119,9 +427,8 @@ def health_check():
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
     """Get transactions with optional filters."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         # Get query parameters
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -132,44 +439,60 @@ def get_transactions():
         max_amount = request.args.get('max_amount')
         exclude_transfers = request.args.get('exclude_transfers', 'true').lower() == 'true'
         
-        # Apply filters
-        if exclude_transfers:
-            df = df[df["category"] != "EXCLUDE"]
-        
-        if start_date:
-            df = df[df["date"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["date"] <= pd.to_datetime(end_date)]
-        if category:
-            if category == "All Expenses":
-                df = df[(df["category"] != "Income") & (df["category"] != "EXCLUDE")]
-            else:
-                df = df[df["category"] == category]
-        if merchant_search:
-            search_lower = merchant_search.lower()
-            df = df[df["merchant"].str.lower().str.contains(search_lower, na=False)]
-        if source and source != "All":
-            df = df[df["source"] == source]
-        if min_amount:
-            df = df[df["amount_spend"] >= float(min_amount)]
-        if max_amount:
-            df = df[df["amount_spend"] <= float(max_amount)]
+        # Indexed filters: date range is a slice, source/category/search narrow it
+        if category == "All Expenses":
+            wanted, excluded = None, ["Income", "EXCLUDE"]
+        else:
+            wanted, excluded = category or None, ["EXCLUDE"] if exclude_transfers else []
+        with stage("filter"):
+            hits = dataset_search_index("merchant", tenant.clean_dir).search(merchant_search) if merchant_search else None
+            df = select_rows(
+                start_date, end_date,
+                source=source if source and source != "All" else None,
+                category=wanted, exclude_categories=excluded, rows=hits, clean_dir=tenant.clean_dir,
+            )
+            if min_amount:
+                df = df[df["amount_spend"] >= float(min_amount)]
+            if max_amount:
+                df = df[df["amount_spend"] <= float(max_amount)]
         
         # Convert to JSON-serializable format with standardized fields
-        result = []
-        for _, row in df.iterrows():
-            result.append({
-                'date': row['date'].strftime('%Y-%m-%d %H:%M:%S') if pd.notna(row.get('date')) else '',
-                'merchant': str(row.get('merchant', '')),
-                'amount_spend': float(row.get('amount_spend', 0)),
-                'amount_signed': float(row.get('amount_signed', 0)),
-                'category': str(row.get('category', '')),
-                'description': str(row.get('description', '')),
-                'txn_id': str(row.get('txn_id', '')),
-                'source': str(row.get('source', ''))
-            })
-        
-        return jsonify({"transactions": result, "count": len(result)})
+        with stage("serialize"):
+            result = []
+            for _, row in df.iterrows():
+                result.append({
+                    'date': row['date'].strftime('%Y-%m-%d %H:%M:%S') if pd.notna(row.get('date')) else '',
+                    'merchant': str(row.get('merchant', '')),
+                    'amount_spend': float(row.get('amount_spend', 0)),
+                    'amount_signed': float(row.get('amount_signed', 0)),
+                    'category': str(row.get('category', '')),
+                    'description': str(row.get('description', '')),
+                    'txn_id': txn_id_str(row.get('txn_id', '')),
+                    'source': str(row.get('source', ''))
+                })
+            
+            return jsonify({"transactions": result, "count": len(result)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/search/suggest', methods=['GET'])
+def search_suggest():
+    """Search-as-you-type: matching merchants (or descriptions) with counts."""
+    tenant = g.tenant
+    try:
+        query = request.args.get('q', '')
+        field = request.args.get('field', 'merchant')
+        limit = int(request.args.get('limit', 10))
+        prefix = request.args.get('prefix', 'false').lower() == 'true'
+        if field not in ("merchant", "description"):
+            return jsonify({"error": "field must be merchant or description"}), 400
+        if not query.strip():
+            return jsonify({"query": query, "results": []})
+        
+        index = dataset_search_index(field, tenant.clean_dir)
+        results = [{"value": v, "count": n} for v, n in index.suggest(query, limit=limit, prefix=prefix)]
+        return jsonify({"query": query, "results": results})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -177,33 +500,26 @@ def get_transactions():
 @app.route('/api/summary', methods=['GET'])
 def get_summary():
     """Get overview summary stats."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         source = request.args.get('source', 'All')
         
-        # Filter by date
-        if start_date:
-            df = df[df["date"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["date"] <= pd.to_datetime(end_date)]
-        
-        # Filter by source
-        if source != "All" and "source" in df.columns:
-            df = df[df["source"] == source]
-        
-        # Exclude transfers
-        base_filtered = df[df["category"] != "EXCLUDE"].copy()
-        
-        # Separate income and expenses
-        income_df = base_filtered[base_filtered["category"] == "Income"]
-        expense_df = base_filtered[base_filtered["category"] != "Income"]
-        
-        total_income = float(income_df["amount_signed"].sum()) if len(income_df) > 0 else 0.0
-        total_spend = float(expense_df["amount_spend"].sum()) if len(expense_df) > 0 else 0.0
-        total_txns = len(expense_df)
+        # Reduce chunk by chunk (one month partition at a time in out-of-core mode)
+        total_income, total_spend, total_txns = 0.0, 0.0, 0
+        for df in scan_rows(start_date, end_date, source=None if source == "All" else source, clean_dir=tenant.clean_dir):
+            with stage("aggregate"):
+                # Exclude transfers
+                base_filtered = df[df["category"] != "EXCLUDE"]
+                
+                # Separate income and expenses
+                income_df = base_filtered[base_filtered["category"] == "Income"]
+                expense_df = base_filtered[base_filtered["category"] != "Income"]
+                
+                total_income += float(income_df["amount_signed"].sum()) if len(income_df) > 0 else 0.0
+                total_spend += float(expense_df["amount_spend"].sum()) if len(expense_df) > 0 else 0.0
+                total_txns += len(expense_df)
         net_balance = total_income - total_spend
         
         return jsonify({
@@ -219,35 +535,32 @@ def get_summary():
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Get category breakdown."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         source = request.args.get('source', 'All')
         
-        # Filter by date
-        if start_date:
-            df = df[df["date"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["date"] <= pd.to_datetime(end_date)]
-        
-        # Filter by source
-        if source != "All" and "source" in df.columns:
-            df = df[df["source"] == source]
-        
-        # Get expenses only
-        expense_df = df[(df["category"] != "EXCLUDE") & (df["category"] != "Income")].copy()
+        # Per-chunk category totals (one month partition at a time in out-of-core mode)
+        partials, spend_parts = [], []
+        for df in scan_rows(start_date, end_date, source=None if source == "All" else source, clean_dir=tenant.clean_dir):
+            with stage("aggregate"):
+                # Get expenses only
+                expense_df = df[(df["category"] != "EXCLUDE") & (df["category"] != "Income")]
+                partials.append(
+                    expense_df.groupby("category", observed=True)
+                    .agg(total=("amount_spend", "sum"), count=("amount_spend", "count"))
+                )
+                if len(expense_df) > 0:
+                    spend_parts.append(float(expense_df["amount_spend"].sum()))
         
         # Group by category
-        cat_summary = (
-            expense_df.groupby("category")
-            .agg(total=("amount_spend", "sum"), count=("amount_spend", "count"))
-            .sort_values("total", ascending=False)
-            .reset_index()
-        )
+        cat_summary = pd.concat(partials) if len(partials) > 1 else partials[0]
+        if len(partials) > 1:
+            cat_summary = cat_summary.groupby(level=0).sum()
+        cat_summary = cat_summary.sort_values("total", ascending=False).reset_index()
         
-        total_spend = float(expense_df["amount_spend"].sum()) if len(expense_df) > 0 else 1.0
+        total_spend = sum(spend_parts) if spend_parts else 1.0
         
         result = []
         for _, row in cat_summary.iterrows():
@@ -269,38 +582,33 @@ def get_categories():
 @app.route('/api/daily-spend', methods=['GET'])
 def get_daily_spend():
     """Get daily spending data."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         source = request.args.get('source', 'All')
         
-        # Filter by date
-        if start_date:
-            df = df[df["date"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["date"] <= pd.to_datetime(end_date)]
-        
-        # Filter by source
-        if source != "All" and "source" in df.columns:
-            df = df[df["source"] == source]
-        
-        # Get expenses only
-        expense_df = df[(df["category"] != "EXCLUDE") & (df["category"] != "Income")].copy()
-        
-        # Group by date
-        daily_spend = expense_df.groupby(expense_df["date"].dt.date)["amount_spend"].sum().reset_index()
+        # Month partitions never share a day, so per-chunk daily sums just concatenate
+        parts = []
+        for df in scan_rows(start_date, end_date, source=None if source == "All" else source, clean_dir=tenant.clean_dir):
+            with stage("aggregate"):
+                # Get expenses only
+                expense_df = df[(df["category"] != "EXCLUDE") & (df["category"] != "Income")]
+                
+                # Group by date
+                parts.append(expense_df.groupby(expense_df["date"].dt.date)["amount_spend"].sum().reset_index())
+        daily_spend = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
         daily_spend.columns = ["date", "amount"]
         
-        result = []
-        for _, row in daily_spend.iterrows():
-            result.append({
-                "date": row["date"].strftime('%Y-%m-%d'),
-                "amount": float(row["amount"])
-            })
-        
-        return jsonify({"daily_spend": result})
+        with stage("serialize"):
+            result = []
+            for _, row in daily_spend.iterrows():
+                result.append({
+                    "date": row["date"].strftime('%Y-%m-%d'),
+                    "amount": float(row["amount"])
+                })
+            
+            return jsonify({"daily_spend": result})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -308,28 +616,28 @@ def get_daily_spend():
 @app.route('/api/forecast', methods=['GET'])
 def get_forecast():
     """Get forecast data."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         months_lookback = int(request.args.get('months_lookback', 3))
         exclude_months = request.args.getlist('exclude_months')
         exclude_categories = request.args.getlist('exclude_categories')
         
-        # Prepare data
-        expenses_df = df[df["category"] != "EXCLUDE"].copy()
+        # Prepare data: precomputed month x category totals, no transaction rows
+        summary = monthly_summary(tenant.clean_dir)
+        summary = summary[summary["category"] != "EXCLUDE"]
         
         if exclude_months:
-            expenses_df["year_month"] = expenses_df["date"].dt.to_period("M").astype(str)
-            expenses_df = expenses_df[~expenses_df["year_month"].isin(exclude_months)]
+            summary = summary[~summary["month"].isin(exclude_months)]
         
         if exclude_categories:
-            expenses_df = expenses_df[~expenses_df["category"].isin(exclude_categories)]
-        
-        # Get total forecast
-        total_forecast = forecast_total_spend(expenses_df, months_lookback=months_lookback)
+            summary = summary[~summary["category"].isin(exclude_categories)]
         
-        # Get category forecast
-        cat_forecast = forecast_by_category(expenses_df, months_lookback=months_lookback)
+        with stage("aggregate"):
+            # Get total forecast
+            total_forecast = forecast_total_from_summary(summary, months_lookback=months_lookback)
+            
+            # Get category forecast
+            cat_forecast = forecast_by_category_from_summary(summary, months_lookback=months_lookback)
         
         # Convert category forecast to list
         cat_result = []
@@ -355,40 +663,37 @@ def get_forecast():
 @app.route('/api/merchants', methods=['GET'])
 def get_merchants():
     """Get list of merchants."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
-        
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Filter by date
-        if start_date:
-            df = df[df["date"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["date"] <= pd.to_datetime(end_date)]
-        
-        # Get expenses only
-        expense_df = df[(df["category"] != "EXCLUDE")].copy()
+        with stage("filter"):
+            df = select_rows(start_date, end_date, clean_dir=tenant.clean_dir)
+            
+            # Get expenses only
+            expense_df = df[(df["category"] != "EXCLUDE")].copy()
         
         # Get unique merchants with their current category and sample transactions
-        merchants = []
-        for merchant in sorted(expense_df["merchant"].dropna().unique()):
-            merchant_txns = expense_df[expense_df["merchant"] == merchant].sort_values("date", ascending=False).head(3)
-            current_cat = merchant_txns["category"].iloc[0] if len(merchant_txns) > 0 else "Unknown"
-            
-            sample_txns = []
-            for _, txn in merchant_txns.iterrows():
-                sample_txns.append({
-                    "date": txn["date"].strftime('%Y-%m-%d'),
-                    "amount": float(txn["amount_spend"]),
-                    "description": txn["description"]
+        with stage("aggregate"):
+            merchants = []
+            for merchant in sorted(expense_df["merchant"].dropna().unique()):
+                merchant_txns = expense_df[expense_df["merchant"] == merchant].sort_values("date", ascending=False).head(3)
+                current_cat = merchant_txns["category"].iloc[0] if len(merchant_txns) > 0 else "Unknown"
+                
+                sample_txns = []
+                for _, txn in merchant_txns.iterrows():
+                    sample_txns.append({
+                        "date": txn["date"].strftime('%Y-%m-%d'),
+                        "amount": float(txn["amount_spend"]),
+                        "description": txn["description"]
+                    })
+                
+                merchants.append({
+                    "name": merchant,
+                    "current_category": current_cat,
+                    "sample_transactions": sample_txns
                 })
-            
-            merchants.append({
-                "name": merchant,
-                "current_category": current_cat,
-                "sample_transactions": sample_txns
-            })
         
         return jsonify({"merchants": merchants})
     except Exception as e:
@@ -398,9 +703,10 @@ def get_merchants():
 @app.route('/api/settings/merchant-rules', methods=['GET'])
 def get_merchant_rules():
     """Get all merchant override rules."""
+    tenant = g.tenant
     try:
-        overrides = load_overrides()
-        return jsonify({"rules": overrides})
+        overrides = load_overrides(tenant.config_db)
+        return jsonify({"rules": overrides, "changes": config_store(tenant.config_db).change_counter()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -408,6 +714,7 @@ def get_merchant_rules():
 @app.route('/api/settings/merchant-rules', methods=['POST'])
 def add_merchant_rule():
     """Add or update a merchant rule."""
+    tenant = g.tenant
     try:
         data = request.json
         merchant = data.get('merchant')
@@ -416,25 +723,104 @@ def add_merchant_rule():
         if not merchant or not category:
             return jsonify({"error": "merchant and category are required"}), 400
         
-        overrides = load_overrides()
         norm_merchant = clean_string(merchant)
-        overrides[norm_merchant] = category
-        _save_overrides(overrides)
+        with _pipeline(tenant).edit_lock():
+            config_store(tenant.config_db).set_merchant(norm_merchant, category)
+        _teach_model(tenant, merchants={norm_merchant: category})
         
         # Re-categorize
-        _recompute_and_refresh()
+        _recompute_and_refresh(tenant)
         
         return jsonify({"success": True, "message": f"Updated rule for {merchant}"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _bulk_items(data, list_key, key):
+    """[(key, category)] from a bulk request body, or raise ValueError naming every bad entry."""
+    entries = (data or {}).get(list_key)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{list_key} must be a non-empty list of {{{key}, category}} objects")
+    items, errors = [], []
+    for i, entry in enumerate(entries):
+        value = entry.get(key) if isinstance(entry, dict) else None
+        category = entry.get("category") if isinstance(entry, dict) else None
+        if not value or not isinstance(category, str) or not category.strip():
+            errors.append(f"{list_key}[{i}]: {key} and category are required")
+            continue
+        items.append((str(value), category.strip()))
+    if errors:
+        raise ValueError("; ".join(errors[:20]) + (f" (+{len(errors) - 20} more)" if len(errors) > 20 else ""))
+    return items
+
+
+@app.route('/api/settings/merchant-rules/bulk', methods=['POST'])
+def add_merchant_rules_bulk():
+    """Add or update many merchant rules ({"rules": [{merchant, category}, ...]}) with one recategorization."""
+    tenant = g.tenant
+    try:
+        try:
+            items = _bulk_items(request.json, "rules", "merchant")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # later entries for the same merchant win
+        rules = {clean_string(merchant): category for merchant, category in items}
+        store = config_store(tenant.config_db)
+        with _pipeline(tenant).edit_lock():
+            store.set_merchants(rules.items())
+        _teach_model(tenant, merchants=rules)
+        
+        # one (incremental) re-categorize for the whole batch
+        _recompute_and_refresh(tenant)
+        
+        return jsonify({"success": True, "saved": len(rules), "changes": store.change_counter(),
+                        "message": f"Updated {len(rules)} merchant rules"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/settings/rules', methods=['GET'])
+def get_rules():
+    """Get the declarative categorization rules (data/config/rules.json)."""
+    tenant = g.tenant
+    try:
+        return jsonify({"rules": load_rules(tenant.rules_json)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/settings/rules', methods=['POST'])
+def save_rules():
+    """Replace the categorization rules; every rule is validated before anything is saved."""
+    tenant = g.tenant
+    try:
+        rules = (request.json or {}).get('rules')
+        if not isinstance(rules, list):
+            return jsonify({"error": "rules must be a list"}), 400
+        try:
+            compiled = compile_rules(rules)
+        except RuleError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        with _pipeline(tenant).edit_lock():
+            write_json_atomic({"rules": rules}, tenant.rules_json)
+        
+        # Re-categorize
+        _recompute_and_refresh(tenant)
+        
+        return jsonify({"success": True, "message": f"Saved {len(compiled)} active rules"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/settings/one-off', methods=['GET'])
 def get_one_off_overrides():
     """Get all one-off overrides."""
+    tenant = g.tenant
     try:
-        one_off = load_one_off()
-        return jsonify({"overrides": one_off})
+        one_off = load_one_off(tenant.config_db)
+        return jsonify({"overrides": one_off, "changes": config_store(tenant.config_db).change_counter()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -442,6 +828,7 @@ def get_one_off_overrides():
 @app.route('/api/settings/one-off', methods=['POST'])
 def add_one_off_override():
     """Add or update a one-off override."""
+    tenant = g.tenant
     try:
         data = request.json
         txn_id = data.get('txn_id')
@@ -450,37 +837,65 @@ def add_one_off_override():
         if not txn_id or not category:
             return jsonify({"error": "txn_id and category are required"}), 400
         
-        one_off = load_one_off()
-        one_off[str(txn_id)] = category
-        _save_one_off_map(one_off)
+        with _pipeline(tenant).edit_lock():
+            config_store(tenant.config_db).set_one_off(str(txn_id), category)
+        _teach_model(tenant, txn_ids={txn_id: category})
         
         # Re-categorize
-        _recompute_and_refresh()
+        _recompute_and_refresh(tenant)
         
         return jsonify({"success": True, "message": "Updated one-off override"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/settings/one-off/bulk', methods=['POST'])
+def add_one_off_overrides_bulk():
+    """Add or update many one-off overrides ({"overrides": [{txn_id, category}, ...]}) with one recategorization."""
+    tenant = g.tenant
+    try:
+        try:
+            items = _bulk_items(request.json, "overrides", "txn_id")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        overrides = dict(items)
+        store = config_store(tenant.config_db)
+        with _pipeline(tenant).edit_lock():
+            store.set_one_offs(overrides.items())
+        _teach_model(tenant, txn_ids=overrides)
+        
+        # one (incremental) re-categorize for the whole batch
+        _recompute_and_refresh(tenant)
+        
+        return jsonify({"success": True, "saved": len(overrides), "changes": store.change_counter(),
+                        "message": f"Updated {len(overrides)} one-off overrides"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_files():
     """Upload CSV files."""
+    tenant = g.tenant
     try:
         if 'files' not in request.files:
             return jsonify({"error": "No files provided"}), 400
         
         files = request.files.getlist('files')
-        saved = _save_uploaded_files(files)
+        with _pipeline(tenant).edit_lock():
+            saved = _save_uploaded_files(tenant, files)
         
-        # Re-clean and categorize
-        df = _reclean_and_refresh()
+        # Re-clean and categorize in the background
+        job = _submit_reclean(tenant, "upload")
         
         return jsonify({
             "success": True,
             "message": f"Uploaded {len(saved)} file(s)",
             "files": saved,
-            "transactions_count": len(df)
-        })
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}"
+        }), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -488,10 +903,11 @@ def upload_files():
 @app.route('/api/files', methods=['GET'])
 def list_files():
     """List all raw CSV files."""
+    tenant = g.tenant
     try:
         files = []
-        if os.path.exists(RAW_DIR):
-            files = sorted([f for f in os.listdir(RAW_DIR) if f.endswith('.csv')])
+        if os.path.exists(tenant.raw_dir):
+            files = sorted([f for f in os.listdir(tenant.raw_dir) if f.endswith('.csv')])
         return jsonify({"files": files})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -500,9 +916,11 @@ def list_files():
 @app.route('/api/files/<filename>', methods=['DELETE'])
 def delete_file(filename):
     """Delete a raw CSV file."""
+    tenant = g.tenant
     try:
         print(f"Attempting to delete file: {filename}")
-        success = _delete_raw_file(filename)
+        with _pipeline(tenant).edit_lock():
+            success = _delete_raw_file(tenant, filename)
         if not success:
             print(f"File not found: {filename}")
             return jsonify({"error": "File not found"}), 404
@@ -510,31 +928,19 @@ def delete_file(filename):
         print(f"File deleted successfully: {filename}")
         
         # Check remaining files
-        remaining = [f for f in os.listdir(RAW_DIR) if f.endswith('.csv')] if os.path.exists(RAW_DIR) else []
+        remaining = _list_raw_files(tenant)
         print(f"Remaining files: {remaining}")
         
-        if remaining:
-            # Re-clean and categorize remaining files
-            print("Re-cleaning and refreshing remaining files...")
-            _reclean_and_refresh()
-        else:
-            # No files left - delete the processed data files entirely
-            print("No files left, deleting processed data files...")
-            clean_path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
-            cat_path = os.path.join(CLEAN_DIR, "transactions_categorized.csv")
-            
-            if os.path.exists(clean_path):
-                os.remove(clean_path)
-                print(f"Deleted: {clean_path}")
-            if os.path.exists(cat_path):
-                os.remove(cat_path)
-                print(f"Deleted: {cat_path}")
+        # Re-clean remaining files (or drop processed data if none are left)
+        job = _submit_reclean(tenant, "delete")
         
         return jsonify({
             "success": True,
             "message": f"Deleted {filename}",
-            "remaining_files": remaining
-        })
+            "remaining_files": remaining,
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}"
+        }), 202
     except Exception as e:
         print(f"Error deleting file: {str(e)}")
         import traceback
@@ -542,11 +948,55 @@ def delete_file(filename):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background job, with per-stage progress and timings."""
+    tenant = g.tenant
+    job = jobs.get(job_id, tenant.jobs_dir)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/api/pipeline/status', methods=['GET'])
+def get_pipeline_status():
+    """Writer coordinator counters (queued / coalesced runs)."""
+    tenant = g.tenant
+    return jsonify(_pipeline(tenant).stats())
+
+
+@app.route('/api/categorize/stats', methods=['GET'])
+def get_categorize_stats():
+    """Rows resolved and time spent per categorization tier in the last run, plus fuzzy matcher calls."""
+    tenant = g.tenant
+    data = load_stats(tenant.clean_dir)
+    if data is None:
+        return jsonify({"error": "No categorization run yet"}), 404
+    return jsonify(data)
+
+
+@app.route('/api/dedup/report', methods=['GET'])
+def get_dedup_report():
+    """Duplicate rows the last clean merged across statements, per source pair, with examples."""
+    tenant = g.tenant
+    data = load_dedup_report(tenant.clean_dir)
+    if data is None:
+        return jsonify({"error": "No clean run yet"}), 404
+    return jsonify(data)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: request and stage latencies, cache hit rates, dataset size."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/sources', methods=['GET'])
 def get_sources():
     """Get list of data sources."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
+        df = _load_cat_df(tenant)
         sources = ["All"]
         if "source" in df.columns:
             sources.extend(sorted(df["source"].dropna().unique().tolist()))
@@ -558,8 +1008,9 @@ def get_sources():
 @app.route('/api/date-range', methods=['GET'])
 def get_date_range():
     """Get min and max dates from data."""
+    tenant = g.tenant
     try:
-        df = _load_cat_df()
+        df = _load_cat_df(tenant)
         if df.empty or "date" not in df.columns:
             today = datetime.now().date()
             return jsonify({
@@ -578,9 +1029,20 @@ def get_date_range():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/chat/stats', methods=['GET'])
+def get_chat_stats():
+    """Chat request counts, context cache hits, coalescing, local-answer hit rate and latencies."""
+    return jsonify({**chat_stats.snapshot(), **chat_service.in_flight(), "intents": intent_stats.snapshot()})
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """AI chatbot endpoint - answers questions about spending data using Gemini."""
+    """AI chatbot endpoint - answers questions about spending data via the configured LLM backend.
+
+    Local answers come back directly; questions for the LLM return a job to
+    poll, so no web thread waits on the model.
+    """
+    tenant = g.tenant
     try:
         data = request.get_json()
         question = data.get('question', '')
@@ -592,50 +1054,19 @@ def chat():
         if not question:
             return jsonify({"error": "No question provided"}), 400
         
-        # Load transaction data for the date range
-        df = _load_cat_df()
-        if df.empty:
-            return jsonify({"answer": "I don't have any transaction data to analyze yet. Please upload your bank statement first."})
-        
-        # Filter by date range if provided
-        if start_date and end_date:
-            df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-        
-        print(f"Filtered data: {len(df)} transactions")
-        
-        # Prepare data summary for the AI
-        total_spend = df[df['amount_spend'] > 0]['amount_spend'].sum()
-        category_breakdown = df[df['amount_spend'] > 0].groupby('category')['amount_spend'].sum().to_dict()
-        top_merchants = df[df['amount_spend'] > 0].groupby('merchant')['amount_spend'].sum().nlargest(10).to_dict()
-        transaction_count = len(df)
-        
-        # Create context for the AI
-        context = f"""You are a helpful financial assistant analyzing spending data.
-
-Date Range: {start_date} to {end_date}
-Total Transactions: {transaction_count}
-Total Spending: ${total_spend:.2f}
-
-Category Breakdown:
-{json.dumps({k: f"${v:.2f}" for k, v in category_breakdown.items()}, indent=2)}
-
-Top Merchants:
-{json.dumps({k: f"${v:.2f}" for k, v in list(top_merchants.items())[:5]}, indent=2)}
-
-User Question: {question}
-
-Please provide a helpful, concise answer based on this spending data. Use specific numbers and be friendly."""
-
-        print("Calling Gemini API...")
-        
-        # Call Gemini API
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        response = model.generate_content(context)
-        
-        print(f"Gemini response received: {response.text[:100]}...")
-        
-        return jsonify({"answer": response.text})
+        started = start_chat(question, start_date, end_date, clean_dir=tenant.clean_dir)
+        if isinstance(started, dict):
+            return jsonify(started)
+        job = jobs.track("chat", tenant.jobs_dir)
+        started.add_done_callback(lambda gen: jobs.complete(job, gen.reply(), gen.error))
+        return jsonify({
+            "success": True,
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}"
+        }), 202
         
+    except ChatBusy as e:
+        return jsonify({"error": f"Chat is busy, try again shortly ({e})"}), 429
     except Exception as e:
         print(f"Chat error: {type(e).__name__}: {str(e)}")
         import traceback
@@ -643,5 +1074,22 @@ Please provide a helpful, concise answer based on this spending data. Use specif
         return jsonify({"error": f"Failed to process question: {str(e)}"}), 500
 
 
+
+@app.route('/api/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Chat answer as server-sent events: one `data: {"token"}` per chunk, then `event: done`."""
+    tenant = g.tenant
+    data = request.get_json(silent=True) or request.args
+    question = data.get('question', '')
+    if not question:
+        return jsonify({"error": "No question provided"}), 400
+    try:
+        events = stream_answer(question, data.get('start_date'), data.get('end_date'), clean_dir=tenant.clean_dir)
+    except ChatBusy as e:
+        return jsonify({"error": f"Chat is busy, try again shortly ({e})"}), 429
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -1,9 +1,9 @@
 """Clean, intuitive expense tracking and forecasting app with graphs."""
 
 import os
-import json
 import calendar
 import re
+import numpy as np
 import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
@@ -11,12 +11,19 @@ import matplotlib.dates as mdates
 
 from src.plot_charts import _read_data, CLEAN_DIR
 from src.categorize_transactions import categorize
+from src.config_store import config_store
+from src.search_index import SearchIndex
 from src.forecast import forecast_by_category, forecast_total_spend
-from src.clean_transactions import clean_all
+from src.clean_transactions import clean_all, clean_sources, load_clean
+from src.atomic_io import write_csv_atomic
+from src.dataset import publish_dataset
+from src.pipeline import file_lock
+from src.tenants import DEFAULT_TENANT, get_tenant
 
-OVERRIDES_JSON = "data/config/overrides.json"
-ONE_OFF_CSV = "data/config/one_off_overrides.csv"
 RAW_DIR = "data/raw"
+# the API's writer lock for data/ (its default tenant): a publish here resets the change log,
+# so it must not interleave with an API rebuild, append or override recategorization
+PIPELINE_LOCK = get_tenant(DEFAULT_TENANT).pipeline_lock
 
 st.set_page_config(page_title="Expense Analyzer", layout="wide")
 st.title("💰 Expense Analyzer")
@@ -25,22 +32,9 @@ st.title("💰 Expense Analyzer")
 plt.style.use("seaborn-v0_8-darkgrid")
 
 
-def normalize_merchant(merchant_name):
-    """Normalize merchant name for storage."""
-    m = str(merchant_name).strip().lower()
-    m = re.sub(r"[\s\-_/]+", " ", m)
-    m = re.sub(r"[^\w\s+]", "", m)
-    return m
-
-
 def _load_clean_df():
     """Load cleaned transactions."""
-    path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
-    if not os.path.exists(path):
-        # Return empty dataframe; caller decides whether to trigger upload or cleaning.
-        return pd.DataFrame(columns=["date","description","amount_signed","amount_spend","category"])
-    df = pd.read_csv(path, parse_dates=["date"])
-    return df
+    return load_clean(CLEAN_DIR)
 
 
 def _load_cat_df():
@@ -51,73 +45,37 @@ def _load_cat_df():
 def _save_cat_df(df_cat: pd.DataFrame):
     """Save categorized transactions."""
     out_path = os.path.join(CLEAN_DIR, "transactions_categorized.csv")
-    df_cat.to_csv(out_path, index=False)
+    write_csv_atomic(df_cat, out_path)
+    publish_dataset(df_cat, CLEAN_DIR, clean_sources(CLEAN_DIR))
     return out_path
 
 
-def _load_overrides():
-    """Load merchant override rules."""
-    if not os.path.exists(OVERRIDES_JSON):
-        os.makedirs(os.path.dirname(OVERRIDES_JSON), exist_ok=True)
-        with open(OVERRIDES_JSON, "w") as f:
-            json.dump({}, f)
-        return {}
-    
-    try:
-        with open(OVERRIDES_JSON, "r") as f:
-            data = json.load(f)
-        return data
-    except:
-        return {}
-
-
-def _save_overrides(d):
-    """Save merchant override rules."""
-    os.makedirs(os.path.dirname(OVERRIDES_JSON), exist_ok=True)
-    with open(OVERRIDES_JSON, "w") as f:
-        json.dump(d, f, indent=2)
-
-
-def _load_one_off_map():
-    """Load one-time transaction overrides."""
-    if not os.path.exists(ONE_OFF_CSV):
-        os.makedirs(os.path.dirname(ONE_OFF_CSV), exist_ok=True)
-        pd.DataFrame({"txn_id": [], "category": []}).to_csv(ONE_OFF_CSV, index=False)
-        return {}
-    
-    try:
-        df = pd.read_csv(ONE_OFF_CSV)
-        result = {}
-        for _, row in df.iterrows():
-            result[str(row["txn_id"])] = str(row["category"])
-        return result
-    except:
-        return {}
-
-
-def _save_one_off_map(m):
-    """Save one-time transaction overrides."""
-    rows = [{"txn_id": k, "category": v} for k, v in m.items()]
-    pd.DataFrame(rows).to_csv(ONE_OFF_CSV, index=False)
+def _recompute():
+    """Categorize the clean data and publish it (caller holds PIPELINE_LOCK)."""
+    df_cat = categorize(_load_clean_df())
+    _save_cat_df(df_cat)
+    return df_cat
 
 
 def _recompute_and_refresh():
     """Re-run categorization and refresh state."""
-    clean_df = _load_clean_df()
-    df_cat = categorize(clean_df)
-    _save_cat_df(df_cat)
+    with file_lock(PIPELINE_LOCK):
+        df_cat = _recompute()
     st.session_state["df"] = df_cat
     return df_cat
 
 
 def _reclean_and_refresh():
     """Run multi-file cleaning then categorize and refresh state."""
-    try:
-        clean_all()
-    except Exception as e:
-        st.error(f"Cleaning failed: {e}")
-        return None
-    return _recompute_and_refresh()
+    with file_lock(PIPELINE_LOCK):
+        try:
+            clean_all()
+        except Exception as e:
+            st.error(f"Cleaning failed: {e}")
+            return None
+        df_cat = _recompute()
+    st.session_state["df"] = df_cat
+    return df_cat
 
 
 def _save_uploaded_files(uploaded_files):
@@ -140,6 +98,23 @@ def _save_uploaded_files(uploaded_files):
     return saved
 
 
+def _search_frame(frame, query, columns):
+    """Rows of `frame` (a slice of the session df) whose columns contain `query`."""
+    df = st.session_state["df"]
+    cached = st.session_state.get("search_indexes")
+    if not cached or cached[0] is not df:
+        flat = df.reset_index(drop=True)
+        cached = (df, {c: SearchIndex.from_series(flat[c]) for c in ("merchant", "description") if c in flat.columns})
+        st.session_state["search_indexes"] = cached
+    indexes = cached[1]
+    mask = np.zeros(len(df), dtype=bool)
+    for c in columns:
+        if c in indexes:
+            mask |= indexes[c].mask(query)
+    positions = df.index.get_indexer(frame.index)
+    return frame[mask[positions]]
+
+
 def _delete_raw_file(filename):
     """Delete a raw CSV and refresh dataset."""
     path = os.path.join(RAW_DIR, filename)
@@ -355,10 +330,7 @@ elif mode == "home":
     
     # Merchant search results
     if merchant_search.strip():
-        search_lower = merchant_search.lower()
-        merchant_df = filtered_df[
-            filtered_df["merchant"].str.lower().str.contains(search_lower, na=False)
-        ].copy()
+        merchant_df = _search_frame(filtered_df, merchant_search, ("merchant",)).copy()
         
         if len(merchant_df) > 0:
             st.subheader("🔍 Search Results")
@@ -487,11 +459,7 @@ elif mode == "category_detail":
         cat_df["display_amount"] = cat_df["amount_spend"]
     
     if search.strip():
-        s = search.lower()
-        cat_df = cat_df[
-            cat_df["merchant"].str.lower().str.contains(s, na=False) |
-            cat_df["description"].str.lower().str.contains(s, na=False)
-        ]
+        cat_df = _search_frame(cat_df, search, ("merchant", "description"))
     
     # Apply sort
     if sort_by == "Amount (High→Low)":
@@ -700,11 +668,8 @@ elif mode == "settings":
             new_cat = st.selectbox("Change to:", all_categories, key="merch_cat")
             
             if st.button("✅ Apply", key="apply_merch"):
-                overrides = _load_overrides()
-                # use normalized merchant name for key
-                norm_merchant = normalize_merchant(merchant)
-                overrides[norm_merchant] = new_cat
-                _save_overrides(overrides)
+                # keyed by the normalized merchant name
+                config_store().set_merchant(merchant, new_cat)
                 _recompute_and_refresh()
                 st.success(f"✅ Changed! '{merchant}' → {new_cat}")
                 st.rerun()
@@ -733,10 +698,7 @@ elif mode == "settings":
                 new_cat = st.selectbox("Change to:", all_categories, key="oneoff_cat")
                 
                 if st.button("✅ Apply", key="apply_oneoff"):
-                    one_off = _load_one_off_map()
-                    txn_id = str(matched["txn_id"])
-                    one_off[txn_id] = new_cat
-                    _save_one_off_map(one_off)
+                    config_store().set_one_off(str(matched["txn_id"]), new_cat)
                     _recompute_and_refresh()
                     st.success(f"✅ Changed! '{matched['merchant']}' on {matched['date'].date()} → {new_cat}")
                     st.rerun()
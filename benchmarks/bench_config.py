@@ -0,0 +1,93 @@
+"""Benchmark saving one override: SQLite upsert against rewriting the JSON / CSV files.
+
+    python -m benchmarks.bench_config --merchants 50000 --one-offs 200000 --edits 200
+
+Seeds both stores with the same merchant and one-off overrides, then times
+single edits: the old load + modify + full atomic rewrite of
+overrides.json / one_off_overrides.csv versus ConfigStore.set_merchant /
+set_one_off, plus reading the maps back after an edit (cached per change
+counter in the store) and a bulk export to the legacy formats.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src.atomic_io import write_csv_atomic, write_json_atomic
+from src.config_store import ONE_OFF_CSV, OVERRIDES_JSON, ConfigStore
+
+
+def _median_s(fn, n):
+    times = []
+    for i in range(n):
+        started = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - started)
+    return round(float(np.median(times)), 5)
+
+
+def run(merchants, one_offs, edits):
+    folder = tempfile.mkdtemp(prefix="bench-config-")
+    try:
+        json_path, csv_path = os.path.join(folder, OVERRIDES_JSON), os.path.join(folder, ONE_OFF_CSV)
+        write_json_atomic({f"merchant {i}": f"Cat{i % 40}" for i in range(merchants)}, json_path)
+        write_csv_atomic(pd.DataFrame({"txn_id": [f"{i:040x}" for i in range(one_offs)],
+                                       "category": [f"Cat{i % 40}" for i in range(one_offs)]}), csv_path)
+        result = {"merchants": merchants, "one_offs": one_offs, "edits": edits}
+
+        def rewrite_merchant(i):
+            with open(json_path, "r") as f:
+                data = json.load(f)
+            data[f"merchant {i}"] = "Edited"
+            write_json_atomic(data, json_path)
+
+        def rewrite_one_off(i):
+            df = pd.read_csv(csv_path, dtype=str)
+            m = dict(zip(df["txn_id"], df["category"]))
+            m[f"{i:040x}"] = "Edited"
+            write_csv_atomic(pd.DataFrame({"txn_id": list(m), "category": list(m.values())}), csv_path)
+
+        result["rewrite_merchant_s"] = _median_s(rewrite_merchant, edits)
+        result["rewrite_one_off_s"] = _median_s(rewrite_one_off, max(edits // 10, 1))
+
+        started = time.perf_counter()
+        store = ConfigStore(os.path.join(folder, "config.db"))
+        result["import_s"] = round(time.perf_counter() - started, 3)
+        result["upsert_merchant_s"] = _median_s(lambda i: store.set_merchant(f"merchant {i}", "Edited"), edits)
+        result["upsert_one_off_s"] = _median_s(lambda i: store.set_one_off(f"{i:040x}", "Edited"), edits)
+        result["read_after_edit_s"] = _median_s(
+            lambda i: (store.set_one_off(f"{i:040x}", "Again"), store.merchant_overrides(), store.one_off_overrides()), 10)
+        result["read_cached_s"] = _median_s(lambda i: (store.merchant_overrides(), store.one_off_overrides()), edits)
+        started = time.perf_counter()
+        store.export_legacy()
+        result["export_s"] = round(time.perf_counter() - started, 3)
+        result["changes"] = store.change_counter()
+        return result
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--merchants", type=int, default=50_000)
+    p.add_argument("--one-offs", type=int, default=200_000)
+    p.add_argument("--edits", type=int, default=200, help="single-override saves to time")
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    print(f"{args.merchants:,} merchant and {args.one_offs:,} one-off overrides...", file=sys.stderr)
+    results = run(args.merchants, args.one_offs, args.edits)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark date-range filtering: boolean masks vs the sorted date index.
+
+    python -m benchmarks.bench_date_filter --rows-per-year 200000 --years 1 5 20
+
+The query window (one month, one source) stays fixed while the history
+grows, so the indexed timings should stay flat and the mask timings grow.
+"""
+
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src.dataset import publish_dataset, load_dataset
+from src.row_index import select_rows
+from benchmarks.bench_ingest import MERCHANTS, CATEGORIES
+
+SOURCES = ["chase_checking", "chase_sapphire", "amex_gold", "citi_double"]
+
+
+def synthetic_dataset(years, rows_per_year, seed=0):
+    """Categorized-style frame covering `years` years ending 2025-12-31."""
+    rng = np.random.default_rng(seed)
+    n = years * rows_per_year
+    start = np.datetime64("2026-01-01") - np.timedelta64(365 * years, "D")
+    merchants = np.array(MERCHANTS)[rng.integers(0, len(MERCHANTS), n)]
+    amount = np.round(rng.gamma(2.0, 20.0, n), 2)
+    return pd.DataFrame({
+        "date": np.sort(start + rng.integers(0, 365 * years, n).astype("timedelta64[D]")),
+        "description": merchants,
+        "merchant": pd.Series(merchants).str.lower(),
+        "category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n)],
+        "source": np.array(SOURCES)[rng.integers(0, len(SOURCES), n)],
+        "amount_spend": amount,
+        "amount_signed": -amount,
+    })
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def bench(years, rows_per_year, repeat):
+    with tempfile.TemporaryDirectory() as clean_dir:
+        publish_dataset(synthetic_dataset(years, rows_per_year), clean_dir)
+        df = load_dataset(clean_dir)
+        start, end, source = pd.Timestamp("2025-06-01"), pd.Timestamp("2025-06-30"), SOURCES[1]
+
+        def masked():
+            return df[(df["date"] >= start) & (df["date"] <= end) & (df["source"] == source)]
+
+        def indexed():
+            return select_rows(start, end, source=source, clean_dir=clean_dir)
+
+        assert len(masked()) == len(indexed())
+        return {
+            "years": years,
+            "rows": len(df),
+            "matched": len(indexed()),
+            "mask_ms": _best_ms(masked, repeat),
+            "indexed_ms": _best_ms(indexed, repeat),
+            "date_only_mask_ms": _best_ms(lambda: df[(df["date"] >= start) & (df["date"] <= end)], repeat),
+            "date_only_indexed_ms": _best_ms(lambda: select_rows(start, end, clean_dir=clean_dir), repeat),
+        }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows-per-year", type=int, default=200_000)
+    p.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    results = [bench(y, args.rows_per_year, args.repeat) for y in args.years]
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark streaming vs in-memory ingest on a synthetic bank export.
+
+    python -m benchmarks.bench_ingest --rows 10000000 --chunksize 200000
+    python -m benchmarks.bench_ingest --rows 1000000 --with-full
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+
+MERCHANTS = [
+    "WHOLEFDS HDP#10458", "TRADER JOE'S #706", "STARBUCKS STORE 1234", "UBER *TRIP",
+    "AMAZON MKTP US*2K3", "NETFLIX.COM", "SHELL OIL 5744", "CHIPOTLE 0912", "TARGET 00012",
+    "SPOTIFY USA", "DOORDASH*DASHPASS", "COMCAST CABLE", "CVS/PHARMACY #0812", "IKEA CHICAGO",
+]
+CATEGORIES = ["Groceries", "Food & Drink", "Travel", "Shopping", "Entertainment", "Bills & Utilities", "Health & Wellness"]
+
+
+def write_synthetic_csv(path, rows, chunk=500_000, seed=0):
+    """Write a Chase-style export of `rows` rows without holding it in memory."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2015-01-01")
+    written = 0
+    header = True
+    while written < rows:
+        n = min(chunk, rows - written)
+        dates = start + rng.integers(0, 3650, n).astype("timedelta64[D]")
+        date_str = pd.Series(dates).dt.strftime("%m/%d/%Y")
+        df = pd.DataFrame({
+            "Transaction Date": date_str,
+            "Post Date": date_str,
+            "Description": np.array(MERCHANTS)[rng.integers(0, len(MERCHANTS), n)],
+            "Category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n)],
+            "Type": "Sale",
+            "Amount": -np.round(rng.gamma(2.0, 20.0, n), 2),
+            "Memo": "",
+        })
+        df.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        written += n
+
+
+def _run_mode(raw_dir, clean_dir, chunksize):
+    """Child process: clean once and report time + peak RSS."""
+    from src.clean_transactions import clean_all
+    started = time.perf_counter()
+    clean_all(raw_dir=raw_dir, save_path=os.path.join(clean_dir, "transactions_clean.csv"), chunksize=chunksize)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    print(json.dumps({"seconds": round(elapsed, 3), "peak_rss_mb": round(peak_kb / 1024, 1)}))
+
+
+def _spawn(raw_dir, clean_dir, chunksize):
+    cmd = [sys.executable, "-m", "benchmarks.bench_ingest", "--child", raw_dir, clean_dir, str(chunksize or 0)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=10_000_000)
+    p.add_argument("--chunksize", type=int, default=200_000)
+    p.add_argument("--with-full", action="store_true", help="also run the in-memory path (needs lots of RAM)")
+    p.add_argument("--out", help="write results JSON here")
+    p.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        raw_dir, clean_dir, chunksize = args.child
+        _run_mode(raw_dir, clean_dir, int(chunksize) or None)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        os.makedirs(raw_dir)
+        csv_path = os.path.join(raw_dir, "synthetic.csv")
+        print(f"Generating {args.rows:,} rows...")
+        write_synthetic_csv(csv_path, args.rows)
+        results = {
+            "rows": args.rows,
+            "file_mb": round(os.path.getsize(csv_path) / 2**20, 1),
+            "streaming": _spawn(raw_dir, os.path.join(tmp, "clean_stream"), args.chunksize),
+            "chunksize": args.chunksize,
+        }
+        if args.with_full:
+            results["in_memory"] = _spawn(raw_dir, os.path.join(tmp, "clean_full"), None)
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the learned categorizer: training, batch inference and held-out accuracy.
+
+    python -m benchmarks.bench_model --rows 1000000 --merchants 20000
+
+Merchants are made-up brands with a business kind ("KALOMI CAFE #1234");
+the label follows the kind. The model is trained on half of the merchants
+and scored on every row of the other half, the way categorize runs it:
+once per distinct description, broadcast back to rows.
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_rules import KINDS, make_rows
+from src.ngram_model import MIN_CONFIDENCE, NgramModel, model_text
+
+LABELS = dict(zip(KINDS, ["Dining", "Groceries", "Dining", "Dining", "Home", "Shopping", "Health", "Travel", "Shopping", "Dining"]))
+
+
+def run(rows, merchants, threshold):
+    df = make_rows(rows, merchants)
+    kind = df["description"].str.split().str[1]
+    df["category"] = kind.map(LABELS)
+    names = df["description"].unique()
+    train_names = set(names[::2])
+    seen = df["description"].isin(train_names).to_numpy()
+
+    train = df[seen].drop_duplicates("description")
+    started = time.perf_counter()
+    model = NgramModel().partial_fit([model_text(t) for t in train["description"].str.lower()], train["category"].tolist())
+    train_s = time.perf_counter() - started
+
+    test = df[~seen]
+    started = time.perf_counter()
+    codes, uniques = pd.factorize(test["description"].str.lower())
+    labels, confidence = model.predict([model_text(u) for u in uniques])
+    labels, confidence = labels[codes], confidence[codes]
+    predict_s = time.perf_counter() - started
+
+    confident = confidence >= threshold
+    correct = labels == test["category"].to_numpy()
+    return {
+        "rows": rows,
+        "merchants": merchants,
+        "train_examples": len(train),
+        "test_rows": len(test),
+        "test_distinct": len(uniques),
+        "train_s": round(train_s, 3),
+        "predict_s": round(predict_s, 3),
+        "rows_per_s": int(len(test) / predict_s) if predict_s else None,
+        "threshold": threshold,
+        "coverage": round(float(confident.mean()), 4),
+        "accuracy_confident": round(float(correct[confident].mean()), 4) if confident.any() else None,
+        "accuracy_all": round(float(correct.mean()), 4),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--merchants", type=int, default=20_000)
+    p.add_argument("--threshold", type=float, default=MIN_CONFIDENCE)
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    print(f"{args.rows:,} rows, {args.merchants:,} merchants...", file=sys.stderr)
+    results = run(args.rows, args.merchants, args.threshold)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Benchmark the whole pipeline: clean -> categorize -> forecast -> API endpoints.
+
+    python -m benchmarks.bench_pipeline --rows 10000 100000 1000000 --out bench.json
+    python -m benchmarks.bench_pipeline --rows 100000 --compare bench.json
+
+Each size runs in its own subprocess and working directory (the API uses
+relative data/ paths), on statements from benchmarks.synthetic. Every
+GET /api/* endpoint without path parameters is timed through the Flask
+test client, cold (first call after publishing) and warm (best of
+--repeat), plus a locally answered chat question. Results are JSON so runs
+from two commits can be compared with --compare.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import tempfile
+
+# streamed responses are not timed (routes with path parameters are skipped too)
+SKIP_ENDPOINTS = {"/api/chat/stream"}
+CHAT_QUESTION = "How much did I spend on groceries last month?"
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - started, 4)
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def _endpoints(app):
+    """Parameterless GET /api/* routes, sorted."""
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.rule.startswith("/api/") and "GET" in rule.methods
+        and not rule.arguments and rule.rule not in SKIP_ENDPOINTS
+    )
+
+
+def _check_txn_ids(df):
+    """make_txn_ids (sha1) must keep the existing ids row for row, missing and categorical descriptions included."""
+    import numpy as np
+    import pandas as pd
+    from src.categorize_transactions import make_txn_id, make_txn_ids
+    from src.normalize import normalize_descriptions
+    # an empty description reads back from CSV as NaN; one-off overrides saved for it use this id
+    row = pd.DataFrame({"date": pd.to_datetime(["2024-01-05"]), "amount_signed": [-12.5], "description": [np.nan]})
+    assert make_txn_ids(row, algo="sha1").tolist() == ["0c56367bf922c9bdf383b59fb7e302fb036f0a7e"]
+    sample = df.head(100).copy()
+    sample["description"] = sample["description"].astype(object)
+    sample.iloc[::10, sample.columns.get_loc("description")] = np.nan
+    expected = [make_txn_id(row) for _, row in sample.iterrows()]
+    assert make_txn_ids(sample, algo="sha1").tolist() == expected
+    # the published dataset keeps descriptions as a categorical
+    sample["description"] = sample["description"].astype("category")
+    assert make_txn_ids(sample, algo="sha1").tolist() == expected
+    norm, _ = normalize_descriptions(sample["description"], cache_path=None)
+    assert make_txn_ids(sample, norm, algo="sha1").tolist() == expected
+
+
+def run_size(rows, sources, merchants, days, repeat):
+    """Child process: build a dataset of `rows` rows in the cwd and time every stage."""
+    os.environ.setdefault("EXPENSE_LLM_BACKEND", "stub")
+    from benchmarks.synthetic import write_statements
+    from src.clean_transactions import clean_all, load_clean
+    from src.categorize_transactions import categorize
+    from src.dataset import publish_dataset
+    from src.atomic_io import write_csv_atomic
+    from src.forecast import (
+        forecast_by_category, forecast_total_spend,
+        forecast_by_category_from_summary, forecast_total_from_summary,
+    )
+    from src.summaries import monthly_summary
+    import api
+
+    clean_dir = api.CLEAN_DIR
+    result = {"rows": rows, "sources": sources, "merchants": merchants, "days": days}
+    _, result["generate_s"] = _timed(lambda: write_statements(api.RAW_DIR, rows, sources, merchants, days=days))
+
+    # the same steps api._rebuild runs
+    _, result["clean_all_s"] = _timed(lambda: clean_all(api.RAW_DIR, os.path.join(clean_dir, "transactions_clean.csv")))
+    df_clean, result["load_clean_s"] = _timed(lambda: load_clean(clean_dir))
+    _check_txn_ids(df_clean)
+    df_cat, result["categorize_s"] = _timed(lambda: categorize(df_clean))
+    _, result["write_csv_s"] = _timed(lambda: write_csv_atomic(df_cat, os.path.join(clean_dir, "transactions_categorized.csv")))
+    _, result["publish_s"] = _timed(lambda: publish_dataset(df_cat, clean_dir))
+    result["clean_rows"] = len(df_clean)
+
+    summary = monthly_summary(clean_dir)
+    spend = df_cat[df_cat["category"] != "EXCLUDE"]
+    result["forecast_ms"] = {
+        "forecast_total_spend": _best_ms(lambda: forecast_total_spend(spend), repeat),
+        "forecast_by_category": _best_ms(lambda: forecast_by_category(spend), repeat),
+        "forecast_total_from_summary": _best_ms(lambda: forecast_total_from_summary(summary), repeat),
+        "forecast_by_category_from_summary": _best_ms(lambda: forecast_by_category_from_summary(summary), repeat),
+    }
+    del df_clean, df_cat, spend
+
+    client = api.app.test_client()
+    endpoints = {}
+    for path in _endpoints(api.app):
+        response, cold = _timed(lambda: client.get(path))
+        endpoints[path] = {
+            "status": response.status_code,
+            "cold_ms": round(cold * 1000, 3),
+            # one warm run is enough for multi-second endpoints
+            "warm_ms": _best_ms(lambda: client.get(path), 1 if cold > 1 else repeat),
+        }
+    post_chat = lambda: client.post("/api/chat", json={"question": CHAT_QUESTION})
+    response, cold = _timed(post_chat)
+    endpoints["POST /api/chat"] = {"status": response.status_code, "cold_ms": round(cold * 1000, 3),
+                                   "warm_ms": _best_ms(post_chat, repeat)}
+    result["endpoints"] = endpoints
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    result["peak_rss_mb"] = round(peak_kb / 1024, 1)
+    return result
+
+
+def _spawn(rows, args):
+    """Run one size in a fresh interpreter and temp working directory."""
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as tmp:
+        cmd = [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", str(rows),
+               "--sources", str(args.sources), "--merchants", str(args.merchants),
+               "--days", str(args.days), "--repeat", str(args.repeat)]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo, os.environ.get("PYTHONPATH")])))
+        proc = subprocess.run(cmd, cwd=tmp, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark at {rows} rows failed:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _flatten(result):
+    """{"clean_all_s": 1.2, "forecast_ms.forecast_total_spend": 3.4, "endpoints./api/summary.warm_ms": ...}."""
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            for sub, inner in _flatten(value).items():
+                flat[f"{key}.{sub}"] = inner
+        elif isinstance(value, (int, float)) and (key.endswith(("_s", "_ms", "_mb"))):
+            flat[key] = value
+    return flat
+
+
+def compare(baseline, current, threshold):
+    """Lines for metrics that moved more than `threshold` (a ratio) between runs."""
+    lines = []
+    before = {r["rows"]: _flatten(r) for r in baseline["results"]}
+    for result in current["results"]:
+        old = before.get(result["rows"])
+        if old is None:
+            continue
+        for key, value in _flatten(result).items():
+            prev = old.get(key)
+            if not prev or not value:
+                continue
+            ratio = value / prev
+            if ratio > 1 + threshold or ratio < 1 / (1 + threshold):
+                label = "SLOWER" if ratio > 1 else "faster"
+                lines.append(f"{result['rows']:>9,} rows  {key:<55} {prev:>10} -> {value:<10} x{ratio:.2f} {label}")
+    return lines
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--sources", type=int, default=3)
+    p.add_argument("--merchants", type=int, default=500)
+    p.add_argument("--days", type=int, default=730, help="date span of the synthetic statements")
+    p.add_argument("--repeat", type=int, default=5, help="warm runs per endpoint / forecast (best is kept)")
+    p.add_argument("--out", help="write results JSON here")
+    p.add_argument("--compare", help="baseline results JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.2, help="report changes beyond this ratio (0.2 = 20%%)")
+    p.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_size(args.child, args.sources, args.merchants, args.days, args.repeat)))
+        return
+
+    results = []
+    for rows in args.rows:
+        print(f"Benchmarking {rows:,} rows...", file=sys.stderr)
+        results.append(_spawn(rows, args))
+    report = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines = compare(baseline, report, args.threshold)
+        print(f"\nvs {baseline.get('commit')}: " + (f"{len(lines)} changes beyond {args.threshold:.0%}" if lines else "no changes beyond threshold"),
+              file=sys.stderr)
+        for line in lines:
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark the compiled rule engine: many user rules over many rows.
+
+    python -m benchmarks.bench_rules --rules 10000 --rows 1000000 --merchants 20000
+
+Rules are generated from made-up merchant names: mostly merchant
+regexes, some alternations and description patterns, a share with amount
+or date conditions, and a few patterns without a usable literal (checked
+by the combined fallback regex). Reports compile and apply time.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.normalize import normalize_descriptions
+from src.rules import compile_rules
+
+CATEGORIES = ["Groceries", "Dining", "Travel", "Shopping", "Entertainment", "Bills", "Health", "Home"]
+KINDS = ["CAFE", "MARKET", "DELI", "GRILL", "SUPPLY", "GOODS", "PHARMACY", "FUEL", "BOOKS", "TAVERN"]
+SYLLABLES = ["ka", "lo", "mi", "ter", "van", "po", "ri", "sen", "du", "bel", "ox", "na", "quin", "ta", "ro", "fel"]
+
+
+def merchant_names(count, seed=0):
+    """`count` distinct merchant descriptions ("KALOMI CAFE #1234") with made-up brand words."""
+    rng = np.random.default_rng(seed)
+    names = set()
+    while len(names) < count:
+        brand = "".join(rng.choice(SYLLABLES, rng.integers(2, 5)))
+        names.add(f"{brand.upper()} {KINDS[len(names) % len(KINDS)]} #{rng.integers(100, 9999)}")
+    return sorted(names)
+
+
+def make_rows(rows, merchants, seed=0):
+    """Transactions frame with the columns categorize hands to the rule engine."""
+    rng = np.random.default_rng(seed)
+    names = np.array(merchant_names(merchants, seed), dtype=object)
+    weights = 1.0 / np.arange(1, merchants + 1) ** 0.8
+    description = pd.Series(names[rng.choice(merchants, rows, p=weights / weights.sum())])
+    _, merchant = normalize_descriptions(description)
+    return pd.DataFrame({
+        "description": description,
+        "merchant": merchant,
+        "amount_spend": np.round(rng.gamma(2.0, 20.0, rows), 2),
+        "date": np.datetime64("2023-01-01") + rng.integers(0, 730, rows).astype("timedelta64[D]"),
+    })
+
+
+def make_rules(count, merchants, seed=0):
+    """`count` rule dicts in the rules.json format."""
+    rng = np.random.default_rng(seed)
+    names = merchant_names(merchants, seed)
+    rules = []
+    for i in range(count):
+        name = names[rng.integers(0, len(names))]
+        words = re.sub(r"[^a-z0-9 ]", "", name.lower()).split()
+        rule = {"id": f"bench-{i}", "category": CATEGORIES[i % len(CATEGORIES)], "priority": int(rng.integers(0, 3))}
+        kind = rng.random()
+        if kind < 0.6:
+            rule["merchant"] = r"\b" + r"\s+".join(re.escape(w) for w in words[:2] if not w.isdigit()) + r"\b"
+        elif kind < 0.75:
+            other = names[rng.integers(0, len(names))].split()[-1].lower()
+            rule["merchant"] = f"({re.escape(words[0])}|{re.escape(other)})"
+        elif kind < 0.98:
+            rule["description"] = r"\s+".join(re.escape(w) for w in words[:2])
+        else:
+            # no literal of 3+ characters: screened by the combined fallback regex
+            rule["description"] = f"^{words[0][:2]}.*#\\d{{{1 + i % 4}}}$"
+        if rng.random() < 0.15:
+            rule["amount"] = {"gt": int(rng.choice([25, 50, 100, 250]))}
+        if rng.random() < 0.05:
+            rule["date"] = {"from": "2024-01-01", "to": "2024-06-30"}
+        rules.append(rule)
+    return rules
+
+
+def run(rules, rows, merchants):
+    df = make_rows(rows, merchants)
+    raw = make_rules(rules, merchants)
+    started = time.perf_counter()
+    ruleset = compile_rules(raw)
+    compile_s = time.perf_counter() - started
+    started = time.perf_counter()
+    ranks = ruleset.apply({"merchant": df["merchant"], "description": df["description"]},
+                          df["amount_spend"].to_numpy(), df["date"].to_numpy())
+    apply_s = time.perf_counter() - started
+    return {
+        "rules": rules,
+        "rows": rows,
+        "merchants": merchants,
+        "distinct_descriptions": int(df["description"].nunique()),
+        "compile_s": round(compile_s, 3),
+        "apply_s": round(apply_s, 3),
+        "rows_per_s": int(rows / apply_s) if apply_s else None,
+        "matched_share": round(float((ranks >= 0).mean()), 4),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rules", type=int, default=10_000)
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--merchants", type=int, default=20_000)
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    print(f"{args.rules:,} rules over {args.rows:,} rows...", file=sys.stderr)
+    results = run(args.rules, args.rows, args.merchants)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
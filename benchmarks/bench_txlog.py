@@ -0,0 +1,102 @@
+"""Benchmark the dataset change log against rewriting the whole dataset.
+
+    python -m benchmarks.bench_txlog --rows 1000000 --edits 20 --edit-rows 500 --append-rows 10000
+
+Publishes a categorized snapshot, then times what a small change costs:
+the old full rewrite (CSV + Arrow snapshot) versus logging only the
+changed category assignments or the newly appended rows, plus how long a
+worker takes to load the dataset with every segment replayed, and the
+compaction back into one snapshot.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_rules import make_rows
+from src.atomic_io import write_csv_atomic
+from src.categorize_transactions import categorize
+from src import dataset
+from src.dataset import load_dataset, log_assignments, log_rows, publish_dataset
+from src.txlog import ChangeLog
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - started, 3)
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def _load(clean_dir):
+    # a fresh worker: nothing cached in this process
+    dataset._cache.pop(clean_dir, None)
+    return load_dataset(clean_dir)
+
+
+def run(rows, edits, edit_rows, append_rows):
+    clean_dir = tempfile.mkdtemp(prefix="bench-txlog-")
+    try:
+        frame = make_rows(rows + append_rows, max(rows // 50, 100))
+        frame = frame.assign(amount_signed=-frame["amount_spend"], source="bench")
+        df_cat = categorize(frame.iloc[:rows].reset_index(drop=True))
+        result = {"rows": rows}
+        _, result["full_rewrite_csv_s"] = _timed(lambda: write_csv_atomic(df_cat, os.path.join(clean_dir, "full.csv")))
+        _, result["full_rewrite_snapshot_s"] = _timed(lambda: publish_dataset(df_cat, clean_dir))
+        _, result["load_snapshot_s"] = _timed(lambda: _load(clean_dir))
+
+        rng = np.random.default_rng(0)
+        edit_s = []
+        for i in range(edits):
+            old = _load(clean_dir)
+            new = old.copy()
+            picked = rng.choice(len(new), edit_rows, replace=False)
+            category = new["category"].astype(object).to_numpy(copy=True)
+            category[picked] = f"Edited{i}"
+            new["category"] = category
+            _, seconds = _timed(lambda: log_assignments(old, new, clean_dir))
+            edit_s.append(seconds)
+        result["edit_rows"] = edit_rows
+        result["log_edit_s_median"] = round(float(np.median(edit_s)), 4)
+
+        added = categorize(frame.iloc[rows:].reset_index(drop=True))
+        _, result["log_append_s"] = _timed(lambda: log_rows(added, clean_dir))
+        result["append_rows"] = append_rows
+        result["log_segments"] = len(ChangeLog(clean_dir).manifest()["segments"])
+        result["log_bytes"] = _dir_bytes(ChangeLog(clean_dir).root)
+        replayed, result["load_with_log_s"] = _timed(lambda: _load(clean_dir))
+        result["rows_after"] = len(replayed)
+        _, result["compact_s"] = _timed(lambda: publish_dataset(replayed, clean_dir, ChangeLog(clean_dir).manifest()["sources"]))
+        return result
+    finally:
+        shutil.rmtree(clean_dir, ignore_errors=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--edits", type=int, default=20, help="override edits to log")
+    p.add_argument("--edit-rows", type=int, default=500, help="rows whose category each edit changes")
+    p.add_argument("--append-rows", type=int, default=10_000, help="rows of one appended statement")
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    print(f"{args.rows:,} rows, {args.edits} edits of {args.edit_rows} rows...", file=sys.stderr)
+    results = run(args.rows, args.edits, args.edit_rows, args.append_rows)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
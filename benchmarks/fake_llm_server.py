@@ -0,0 +1,66 @@
+"""Fake LLM server for chat load tests: streams canned NDJSON tokens slowly.
+
+    python -m benchmarks.fake_llm_server --port 8765 --delay 2.0 --tokens 40
+
+Speaks the protocol of the "http" chat backend: POST {"prompt", "stream"}
+and get back one {"token": ...} JSON line per token, spread over `delay`
+seconds, so it behaves like a slow remote model without any network.
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(delay, tokens, calls):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with calls["lock"]:
+                calls["count"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            words = [f"word{i}" for i in range(tokens)]
+            words[0] = f"Answer ({len(body.get('prompt', ''))} prompt chars):"
+            for i, word in enumerate(words):
+                time.sleep(delay / tokens)
+                self.wfile.write((json.dumps({"token": word if i == 0 else " " + word}) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8765, delay=2.0, tokens=40):
+    """Start the server on a background thread; returns (server, calls)."""
+    calls = {"count": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, tokens, calls))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, calls
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--delay", type=float, default=2.0, help="seconds per answer")
+    p.add_argument("--tokens", type=int, default=40)
+    args = p.parse_args()
+
+    server, _ = serve(args.port, args.delay, args.tokens)
+    print(f"Fake LLM listening on http://127.0.0.1:{args.port}/generate ({args.delay}s per answer)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
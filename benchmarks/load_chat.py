@@ -0,0 +1,196 @@
+"""Load test: do slow chat answers starve the rest of the API?
+
+    python -m benchmarks.load_chat --clients 32 --llm-delay 2.0 --rows 200000
+
+Runs the Flask app on a threaded server against a synthetic dataset, with
+chat answered by benchmarks.fake_llm_server. `/api/summary` latency is
+measured alone and again while `--clients` threads keep asking chat
+questions (a few distinct ones, so identical questions coalesce). Each
+question gets a job back (202), which the client polls every `--poll`
+seconds until the answer is in; questions over EXPENSE_CHAT_MAX_INFLIGHT
+are rejected with 429 and retried after `--poll` seconds. The server runs
+`--web-threads` request threads, like gunicorn's gthread workers, so chat
+waiting on the model would show up as dashboard requests queueing.
+"""
+
+import os
+import json
+import logging
+import time
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _call(url, payload=None, timeout=120):
+    status, _, elapsed = _request(url, payload, timeout)
+    return status, elapsed
+
+
+def _request(url, payload=None, timeout=120):
+    """(status, parsed JSON body or None, seconds) for one request."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        body, status = e.read(), e.code
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        parsed = None
+    return status, parsed, time.perf_counter() - started
+
+
+def _ask(base, question, poll):
+    """POST a chat question and poll its job; (status, seconds until the answer)."""
+    started = time.perf_counter()
+    status, body, _ = _request(f"{base}/api/chat", {"question": question})
+    while status == 202 or (status == 200 and body.get("status") in ("queued", "running")):
+        time.sleep(poll)
+        url = body.get("status_url") or f"/api/jobs/{body['id']}"
+        status, body, _ = _request(base + url)
+    if status == 200 and body.get("status") == "failed":
+        status = 500
+    return status, time.perf_counter() - started
+
+
+def _server(app, port, threads):
+    """A werkzeug server handling requests on a fixed pool of `threads` threads."""
+    from werkzeug.serving import ThreadedWSGIServer
+
+    class PooledServer(ThreadedWSGIServer):
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="web")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+    return PooledServer("127.0.0.1", port, app)
+
+
+def _percentiles(seconds):
+    if not seconds:
+        return {}
+    ms = np.array(seconds) * 1000
+    return {"n": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2), "max_ms": round(float(ms.max()), 2)}
+
+
+def _probe(base, duration):
+    """Hit /api/summary back to back for `duration` seconds."""
+    latencies = []
+    stop = time.monotonic() + duration
+    while time.monotonic() < stop:
+        status, elapsed = _call(f"{base}/api/summary")
+        if status == 200:
+            latencies.append(elapsed)
+    return latencies
+
+
+def run(clients, questions, llm_delay, rows, duration, port, llm_port, web_threads, poll):
+    from benchmarks.fake_llm_server import serve
+
+    llm, llm_calls = serve(llm_port, llm_delay)
+    os.environ.update({
+        "EXPENSE_LLM_BACKEND": "http",
+        "EXPENSE_LLM_URL": f"http://127.0.0.1:{llm_port}/generate",
+        # every question goes to the model (src.intents would answer these locally)
+        "EXPENSE_CHAT_INTENTS": "0",
+    })
+    os.chdir(tempfile.mkdtemp(prefix="expense-load-"))
+
+    from src.dataset import publish_dataset
+    from benchmarks.bench_date_filter import synthetic_dataset
+    import api
+
+    publish_dataset(synthetic_dataset(1, rows), api.CLEAN_DIR)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = _server(api.app, port, web_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{port}"
+    _call(f"{base}/api/summary")  # warm the dataset cache
+
+    idle = _probe(base, duration)
+
+    chat = {"ok": [], "busy": 0, "failed": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(i):
+        n = 0
+        while not stop.is_set():
+            question = f"Where did my money go? (variant {(i + n) % questions})"
+            status, elapsed = _ask(base, question, poll)
+            n += 1
+            with lock:
+                if status == 200:
+                    chat["ok"].append(elapsed)
+                elif status == 429:
+                    chat["busy"] += 1
+                else:
+                    chat["failed"] += 1
+            if status == 429:
+                time.sleep(poll)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    loaded = _probe(base, duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    stats = json.loads(urllib.request.urlopen(f"{base}/api/chat/stats").read())
+    server.shutdown()
+    llm.shutdown()
+
+    return {
+        "rows": rows,
+        "clients": clients,
+        "distinct_questions": questions,
+        "llm_delay_s": llm_delay,
+        "web_threads": web_threads,
+        "poll_s": poll,
+        "summary_idle": _percentiles(idle),
+        "summary_under_chat_load": _percentiles(loaded),
+        "chat_ok": _percentiles(chat["ok"]),
+        "chat_rejected_429": chat["busy"],
+        "chat_failed": chat["failed"],
+        "llm_calls": llm_calls["count"],
+        "chat_stats": stats,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--questions", type=int, default=4, help="distinct chat questions")
+    p.add_argument("--llm-delay", type=float, default=2.0)
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--duration", type=float, default=5.0, help="seconds per latency probe")
+    p.add_argument("--web-threads", type=int, default=16, help="server request threads (gunicorn --threads)")
+    p.add_argument("--poll", type=float, default=0.25, help="seconds between job polls and 429 retries")
+    p.add_argument("--port", type=int, default=5055)
+    p.add_argument("--llm-port", type=int, default=8765)
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    out = os.path.abspath(args.out) if args.out else None  # run() changes directory
+    result = run(args.clients, args.questions, args.llm_delay, args.rows, args.duration, args.port, args.llm_port,
+                 args.web_threads, args.poll)
+    print(json.dumps(result, indent=2))
+    if out:
+        with open(out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
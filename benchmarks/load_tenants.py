@@ -0,0 +1,165 @@
+"""Load test: many tenants on one API worker under a shared cache budget.
+
+    python -m benchmarks.load_tenants --tenants 1000 --rows 20000 --hot 50 --hot-share 0.9 --budget-mb 256
+
+Set EXPENSE_TENANTS_DIR or EXPENSE_CACHE_BUDGET_MB beforehand and they are
+overridden for the run (a temporary directory and --budget-mb).
+
+Publishes a synthetic dataset for each of `--tenants` tenants, then runs the
+Flask app on a threaded server while `--clients` threads send read requests
+(summary, transactions, categories, search suggestions, forecast), each for
+a tenant picked from a hot working set of `--hot` tenants with probability
+`--hot-share`, otherwise from all tenants. Reports p50/p95/p99 latency for
+hot and cold tenants, and what the shared cache budget
+(EXPENSE_CACHE_BUDGET_MB) held and evicted.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+ENDPOINTS = [
+    "/api/summary",
+    "/api/transactions?start_date=2025-06-01&end_date=2025-06-30",
+    "/api/categories",
+    "/api/search/suggest?q=star",
+    "/api/forecast",
+]
+
+
+def _call(url, tenant, timeout=120):
+    req = urllib.request.Request(url, headers={"X-Expense-Tenant": tenant})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def _percentiles(seconds):
+    if not seconds:
+        return {}
+    ms = np.array(seconds) * 1000
+    return {"n": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2), "max_ms": round(float(ms.max()), 2)}
+
+
+def run(tenants, rows, hot, hot_share, clients, requests, budget_mb, port):
+    root = tempfile.mkdtemp(prefix="expense-tenants-")
+    os.environ["EXPENSE_TENANTS_DIR"] = os.path.join(root, "tenants")
+    os.environ["EXPENSE_CACHE_BUDGET_MB"] = str(budget_mb)
+    os.chdir(root)
+
+    from werkzeug.serving import make_server
+    from benchmarks.bench_date_filter import synthetic_dataset
+    from src.dataset import publish_dataset
+    from src.memory_budget import budget
+    from src.tenants import get_tenant
+    import api
+
+    ids = [f"tenant{i:05d}" for i in range(tenants)]
+    started = time.perf_counter()
+    for i, tenant_id in enumerate(ids):
+        publish_dataset(synthetic_dataset(1, rows, seed=i), get_tenant(tenant_id).clean_dir)
+    setup_s = time.perf_counter() - started
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{port}"
+
+    latencies = {"hot": [], "cold": []}
+    by_endpoint = {path: [] for path in ENDPOINTS}
+    failed = []
+    lock = threading.Lock()
+    per_client = requests // clients
+
+    def client(i):
+        rng = np.random.default_rng(i)
+        for n in range(per_client):
+            is_hot = rng.random() < hot_share
+            tenant = ids[rng.integers(0, hot)] if is_hot else ids[rng.integers(0, tenants)]
+            path = ENDPOINTS[(i + n) % len(ENDPOINTS)]
+            status, elapsed = _call(base + path, tenant)
+            with lock:
+                if status == 200:
+                    latencies["hot" if is_hot else "cold"].append(elapsed)
+                    by_endpoint[path].append(elapsed)
+                else:
+                    failed.append(status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    stats = budget.stats()
+    return {
+        "tenants": tenants,
+        "rows_per_tenant": rows,
+        "hot_tenants": hot,
+        "hot_share": hot_share,
+        "clients": clients,
+        "setup_s": round(setup_s, 1),
+        "requests": len(latencies["hot"]) + len(latencies["cold"]),
+        "failed": len(failed),
+        "requests_per_s": round((len(latencies["hot"]) + len(latencies["cold"])) / elapsed, 1),
+        "all": _percentiles(latencies["hot"] + latencies["cold"]),
+        "hot": _percentiles(latencies["hot"]),
+        "cold": _percentiles(latencies["cold"]),
+        "by_endpoint": {path: _percentiles(seconds) for path, seconds in by_endpoint.items()},
+        "cache_budget_mb": budget_mb,
+        "cache_held_mb": round(stats["bytes"] / 2**20, 1),
+        "cache_entries": stats["entries"],
+        "cache_evictions": stats["evictions"],
+        "cache_evicted_mb": round(stats["evicted_bytes"] / 2**20, 1),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--tenants", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=20_000, help="transactions per tenant")
+    p.add_argument("--hot", type=int, default=50, help="tenants in the hot working set")
+    p.add_argument("--hot-share", type=float, default=0.9, help="share of requests going to hot tenants")
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--requests", type=int, default=20_000)
+    p.add_argument("--budget-mb", type=float, default=256, help="EXPENSE_CACHE_BUDGET_MB for the run")
+    p.add_argument("--port", type=int, default=5056)
+    p.add_argument("--out", help="write results JSON here")
+    args = p.parse_args()
+
+    os.environ.setdefault("EXPENSE_LLM_BACKEND", "stub")
+    print(f"{args.tenants:,} tenants x {args.rows:,} rows, {args.clients} clients...", file=sys.stderr)
+    results = run(args.tenants, args.rows, args.hot, args.hot_share, args.clients, args.requests,
+                  args.budget_mb, args.port)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
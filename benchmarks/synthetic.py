@@ -0,0 +1,102 @@
+"""Synthetic bank statements for benchmarks.
+
+    python -m benchmarks.synthetic data/raw --rows 100000 --sources 3 --merchants 500
+
+Each source is one CSV in one of the header layouts detect_columns
+understands (Chase-style, "Posted Date/Details/Transaction Amount",
+lower-case "date/memo/value"), each with its own date format. Merchant
+popularity is skewed like real spending: a few merchants get most rows.
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_ingest import MERCHANTS, CATEGORIES
+
+# header layout -> (column names in order, date format)
+LAYOUTS = {
+    "chase": (["Transaction Date", "Post Date", "Description", "Category", "Type", "Amount", "Memo"], "%m/%d/%Y"),
+    "posted": (["Posted Date", "Details", "Transaction Amount", "Category"], "%Y-%m-%d"),
+    "minimal": (["date", "memo", "value"], "%d %b %Y"),
+}
+INCOME = ["PAYROLL DIRECT DEP ACME CORP", "ZELLE FROM J SMITH", "INTEREST PAYMENT"]
+PAYMENTS = ["AUTOPAY PAYMENT THANK YOU", "ONLINE PAYMENT THANK YOU"]
+
+
+def merchant_names(count, seed=0):
+    """`count` merchant descriptions: the realistic base list, then generated ones."""
+    rng = np.random.default_rng(seed)
+    names = list(MERCHANTS[:count])
+    words = ["CAFE", "MARKET", "DELI", "GRILL", "SUPPLY", "GOODS", "PHARMACY", "FUEL", "BOOKS", "TAVERN"]
+    while len(names) < count:
+        i = len(names)
+        names.append(f"{words[i % len(words)]} {i:05d} #{rng.integers(100, 9999)}")
+    return names
+
+
+def statement(rows, layout, merchants, start, days, rng):
+    """One source's raw statement frame in `layout`."""
+    columns, date_format = LAYOUTS[layout]
+    # Zipf-like popularity over merchants
+    weights = 1.0 / np.arange(1, len(merchants) + 1)
+    desc = np.array(merchants, dtype=object)[rng.choice(len(merchants), rows, p=weights / weights.sum())]
+    amount = -np.round(rng.gamma(2.0, 20.0, rows), 2)
+    category = np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)]
+    kind = np.full(rows, "Sale", dtype=object)
+
+    # ~2% income and ~1% card payments (credits excluded from spending)
+    income = rng.random(rows) < 0.02
+    desc[income] = np.array(INCOME, dtype=object)[rng.integers(0, len(INCOME), income.sum())]
+    amount[income] = np.round(rng.uniform(500, 4000, income.sum()), 2)
+    category[income], kind[income] = "", "Credit"
+    payment = ~income & (rng.random(rows) < 0.01)
+    desc[payment] = np.array(PAYMENTS, dtype=object)[rng.integers(0, len(PAYMENTS), payment.sum())]
+    amount[payment] = np.round(rng.uniform(200, 2000, payment.sum()), 2)
+    category[payment], kind[payment] = "", "Payment"
+
+    dates = pd.Series(np.datetime64(start) + rng.integers(0, days, rows).astype("timedelta64[D]"))
+    date_str = dates.dt.strftime(date_format)
+    values = {
+        "Transaction Date": date_str, "Post Date": date_str, "Posted Date": date_str, "date": date_str,
+        "Description": desc, "Details": desc, "memo": desc,
+        "Amount": amount, "Transaction Amount": amount, "value": amount,
+        "Category": category, "Type": kind, "Memo": "",
+    }
+    return pd.DataFrame({c: values[c] for c in columns})
+
+
+def write_statements(raw_dir, rows, sources=3, merchants=200, start="2023-01-01", days=730, seed=0):
+    """Write `rows` transactions split across `sources` CSVs in `raw_dir`; returns their paths."""
+    rng = np.random.default_rng(seed)
+    names = merchant_names(merchants, seed)
+    layouts = list(LAYOUTS)
+    os.makedirs(raw_dir, exist_ok=True)
+    paths = []
+    for i in range(sources):
+        layout = layouts[i % len(layouts)]
+        n = rows // sources + (1 if i < rows % sources else 0)
+        path = os.path.join(raw_dir, f"{layout}_{i}.csv")
+        statement(n, layout, names, start, days, rng).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("raw_dir")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--sources", type=int, default=3)
+    p.add_argument("--merchants", type=int, default=200)
+    p.add_argument("--start", default="2023-01-01")
+    p.add_argument("--days", type=int, default=730, help="date span")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    for path in write_statements(args.raw_dir, args.rows, args.sources, args.merchants, args.start, args.days, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
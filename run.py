@@ -4,39 +4,98 @@ import argparse
 import os
 import pandas as pd
 from src.clean_transactions import main as do_clean
-from src.categorize_transactions import main as do_categorize
+from src.dedup import format_report, load_report
+from src.categorize_transactions import format_stats, load_stats, main as do_categorize
+from src.dataset import CSV_FILE, compact_frame, memory_report
+from src.search_index import search_rows
+from src.row_index import select_rows
+from src.partitions import categorized_store
+from src.profiling import PROFILE_DIR, list_profiles, summarize
+from src.config_store import config_store
 
 
 def _print_top(args):
     """Query and display top transactions with optional filters."""
-    path = os.path.join("data", "clean", "transactions_categorized.csv")
-    if not os.path.exists(path):
+    clean_dir = os.path.join("data", "clean")
+    if not os.path.exists(os.path.join(clean_dir, CSV_FILE)) and not categorized_store(clean_dir).months():
         raise FileNotFoundError("run: python run.py categorize")
-    df = pd.read_csv(path, parse_dates=["date"])
+    df = select_rows(args.start, args.end, clean_dir=clean_dir)
 
+    if args.search:
+        df = df.iloc[search_rows(df, args.search)]
     if args.category:
         df = df[df["category"].str.lower() == args.category.lower()]
-    if args.start:
-        df = df[df["date"] >= pd.to_datetime(args.start)]
-    if args.end:
-        df = df[df["date"] <= pd.to_datetime(args.end)]
     if args.min is not None:
         df = df[df["amount_spend"] >= float(args.min)]
     if args.max is not None:
         df = df[df["amount_spend"] <= float(args.max)]
-    if args.search:
-        s = args.search.lower()
-        df = df[df["description"].str.lower().str.contains(s) | df["merchant"].str.lower().str.contains(s)]
 
     df = df.sort_values(["amount_spend", "date"], ascending=[False, False]).head(args.limit)
     cols = ["date", "merchant", "category", "amount_spend", "category_source", "description"]
     print(df[cols].to_string(index=False))
 
 
+def _print_memory(args):
+    """Show in-memory bytes per row for the categorized data before/after compaction."""
+    path = os.path.join("data", "clean", CSV_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError("run: python run.py categorize")
+    df = pd.read_csv(path, parse_dates=["date"])
+    before = memory_report(df)
+    after = memory_report(compact_frame(df))
+    print(f"rows: {before['rows']}")
+    print(f"bytes/row before: {before['bytes_per_row']:>8}  ({before['total_bytes'] / 2**20:.1f} MB)")
+    print(f"bytes/row after:  {after['bytes_per_row']:>8}  ({after['total_bytes'] / 2**20:.1f} MB)")
+    print("\nper column (before -> after):")
+    for col, b in before["by_column"].items():
+        print(f"  {col:<22} {b:>8} -> {after['by_column'].get(col, 0):>8}")
+
+
+def _print_profiles(args):
+    """List captured profiles, or summarize one (by file name or list position)."""
+    profiles = list_profiles()
+    if not args.name:
+        if not profiles:
+            print(f"No profiles in {PROFILE_DIR} (set EXPENSE_PROFILE=1 or send the X-Expense-Profile header)")
+            return
+        print(f"{'#':>3}  {'taken':<15} {'ms':>8}  {'format':<9} {'KB':>7}  label")
+        for i, e in enumerate(profiles[:args.limit], 1):
+            print(f"{i:>3}  {e['taken']:<15} {e['ms'] or '':>8}  {e['format']:<9} {e['bytes'] / 1024:>7.1f}  {e['label']}")
+        if len(profiles) > args.limit:
+            print(f"... {len(profiles) - args.limit} older (use --limit)")
+        return
+    if args.name.isdigit() and 1 <= int(args.name) <= len(profiles):
+        entry = profiles[int(args.name) - 1]
+    else:
+        entry = next((e for e in profiles if e["name"] == os.path.basename(args.name)), None)
+        if entry is None:
+            raise FileNotFoundError(f"no profile {args.name!r} in {PROFILE_DIR}")
+    print(f"{entry['name']}\n")
+    print(summarize(entry["path"], limit=args.limit, sort=args.sort))
+
+
+def _config(args):
+    """Export the override tables to overrides.json / one_off_overrides.csv, or import them back."""
+    store = config_store()
+    if args.name == "export":
+        for table, path in store.export_legacy().items():
+            print(f"{table}: wrote {path}")
+    elif args.name == "import":
+        counts = store.import_legacy(replace=args.replace)
+        if not counts:
+            print(f"No overrides.json or one_off_overrides.csv next to {store.path}")
+        for table, n in counts.items():
+            print(f"{table}: imported {n} rows")
+    else:
+        print(f"{store.path}: {len(store.merchant_overrides())} merchant overrides, "
+              f"{len(store.one_off_overrides())} one-off overrides, {store.change_counter()} changes")
+
+
 def main():
     """Parse arguments and run pipeline command."""
     p = argparse.ArgumentParser(description="expense-coach runner")
-    p.add_argument("cmd", choices=["clean", "categorize", "top"])
+    p.add_argument("cmd", choices=["clean", "categorize", "top", "memory", "profiles", "config"])
+    p.add_argument("name", nargs="?", help="profiles: file name or list number to summarize; config: export or import")
     p.add_argument("--category", help="Filter by category")
     p.add_argument("--limit", type=int, default=10, help="Number of results")
     p.add_argument("--start", help="Start date (YYYY-MM-DD)")
@@ -44,15 +103,33 @@ def main():
     p.add_argument("--min", type=float, help="Minimum amount")
     p.add_argument("--max", type=float, help="Maximum amount")
     p.add_argument("--search", help="Search merchant/description")
+    p.add_argument("--chunksize", type=int, help="Stream raw CSVs in chunks of this many rows (clean)")
+    p.add_argument("--sort", default="cumulative", help="profiles: pstats sort key (cumulative, tottime, ...)")
+    p.add_argument("--stats", action="store_true", help="categorize: print rows and time per categorization tier; clean: print merged duplicates")
+    p.add_argument("--replace", action="store_true", help="config import: replace the tables instead of merging")
+    p.add_argument("--retrain", action="store_true", help="categorize: refit the learned categorizer (EXPENSE_ML_CATEGORIZER=1)")
 
     args = p.parse_args()
 
     if args.cmd == "clean":
-        do_clean()
+        do_clean(chunksize=args.chunksize)
+        report = load_report(os.path.join("data", "clean")) if args.stats else None
+        if report:
+            print()
+            print(format_report(report))
     elif args.cmd == "categorize":
-        do_categorize()
+        do_categorize(train_model=args.retrain)
+        if args.stats:
+            print()
+            print(format_stats(load_stats(os.path.join("data", "clean"))))
     elif args.cmd == "top":
         _print_top(args)
+    elif args.cmd == "memory":
+        _print_memory(args)
+    elif args.cmd == "profiles":
+        _print_profiles(args)
+    elif args.cmd == "config":
+        _config(args)
 
 
 if __name__ == "__main__":
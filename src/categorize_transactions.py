@@ -3,13 +3,32 @@
 import os
 import re
 import json
+import time
 import hashlib
+import functools
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from rapidfuzz import process, fuzz
+from src.atomic_io import write_csv_atomic, write_json_atomic
+from src.dataset import publish_dataset, drop_dataset, month_category_totals
+from src.clean_transactions import clean_sources, load_clean
+from src.partitions import OUT_OF_CORE, PARTITION_WORKERS, clean_store, categorized_store, map_partitions
+from src.progress import NULL_PROGRESS
+from src.metrics import stage
+from src.profiling import profile_run
+from src.rules import RULES_JSON, Rule, RuleSet, load_ruleset
+from src.config_store import CONFIG_DB, config_store
+from src.ngram_model import MODEL_DIR, ML_ENABLED, MIN_CONFIDENCE, load_model, model_text, train, training_examples
+from src.normalize import (
+    clean_string, clean_strings, get_merchant_name, get_merchant_names,
+    NORM_CACHE_PATH, as_text, map_unique, normalize_descriptions,
+)
 
 CLEAN_DIR = "data/clean"
-OVERRIDES_JSON = "data/config/overrides.json"
-ONE_OFF_CSV = "data/config/one_off_overrides.csv"
+# per-tier statistics of the last categorize run, next to the categorized output
+STATS_FILE = "categorize_stats.json"
 
 # keyword to category mapping
 KEYWORD_RULES = {
@@ -40,30 +59,9 @@ BANK_CAT_MAP = {
 
 BANK_UNKNOWN = {"", "nan", "none", "uncategorized", "unknown", "other", "misc", "miscellaneous"}
 
-
-def clean_string(s):
-    """Make string lowercase and remove special characters."""
-    s = str(s).strip().lower()
-    s = re.sub(r"[\s\-_/]+", " ", s)
-    s = re.sub(r"[^\w\s+]", "", s)
-    return s
-
-
-def get_merchant_name(desc):
-    """Try to extract merchant from description."""
-    words_to_skip = {"purchase", "pos", "card", "debit", "credit", "sale", "online", "payment", "venmo", "zelle"}
-    tokens = [t for t in desc.split() if t not in words_to_skip]
-    
-    # remove numbers
-    tokens_clean = []
-    for t in tokens:
-        clean_t = re.sub(r"\d+", "", t)
-        tokens_clean.append(clean_t)
-    
-    result = " ".join(tokens_clean).strip()
-    # just take first 3 words
-    parts = result.split()[:3]
-    return " ".join(parts)
+# "sha1" keeps ids compatible with saved one-off overrides; "fast" uses a
+# vectorized 64-bit hash (old one-off ids are still matched via a remap)
+TXN_ID_HASH = os.environ.get("EXPENSE_TXN_ID_HASH", "sha1")
 
 
 def clean_bank_category(bank_cat):
@@ -81,13 +79,127 @@ def clean_bank_category(bank_cat):
     return str(bank_cat).strip()
 
 
-def match_keyword(text):
-    """Check if text matches any keyword rule."""
-    text_lower = text.lower()
-    for keyword, category in KEYWORD_RULES.items():
-        if keyword in text_lower:
-            return category
-    return None
+@functools.lru_cache(maxsize=4)
+def _keyword_ruleset(items):
+    """KEYWORD_RULES as a RuleSet over "description_norm merchant" (substring match, dict order)."""
+    return RuleSet([Rule(cat, {"text": re.compile(re.escape(kw))}) for kw, cat in items])
+
+
+@functools.lru_cache(maxsize=4)
+def _merchant_ruleset(db_path, changes):
+    """Merchant overrides as a RuleSet: exact merchant first, then substring keys in insertion order.
+
+    Keyed on the config store's merchant change counter, so it is rebuilt only after a merchant edit.
+    """
+    items = list(config_store(db_path).merchant_overrides().items())
+    exact = [Rule(cat, {"merchant": re.compile(rf"\A{re.escape(key)}\Z")}) for key, cat in items if cat]
+    contains = [Rule(cat, {"merchant": re.compile(re.escape(key))}) for key, cat in items if key and cat]
+    return RuleSet(exact + contains)
+
+
+class CategorizeStats:
+    """Rows resolved per decide_category tier, time spent in each tier and fuzzy matcher calls.
+
+    A tier's time covers every row that reached it, including the rows it
+    passed on to the next tier.
+    """
+
+    # tiers in the order categorize tries them
+    TIERS = ("credit", "one_off", "user_rule", "merchant", "bank", "rule", "fuzzy", "model")
+
+    def __init__(self):
+        self.rows = 0
+        self.seconds = 0.0
+        self.resolved = Counter()       # category_source -> rows
+        self.reached = Counter()        # tier -> rows that evaluated it
+        self.tier_s = Counter()         # tier -> seconds
+        self.fuzzy_calls = 0            # rapidfuzz lookups actually run
+        self.fuzzy_cache_hits = 0       # lookups answered from the per-run cache
+        self.fuzzy_merchants = Counter()  # merchants that fell through to fuzzy matching
+
+    @contextmanager
+    def tier(self, name, pending):
+        """Time one tier over the `pending` rows (also reported as stage categorize:<name>)."""
+        self.reached[name] += int(pending.sum())
+        started = time.perf_counter()
+        with stage(f"categorize:{name}"):
+            yield
+        self.tier_s[name] += time.perf_counter() - started
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.seconds += other.seconds
+        for name in ("resolved", "reached", "tier_s", "fuzzy_merchants"):
+            getattr(self, name).update(getattr(other, name))
+        self.fuzzy_calls += other.fuzzy_calls
+        self.fuzzy_cache_hits += other.fuzzy_cache_hits
+        return self
+
+    def to_dict(self, top=20):
+        tiers = []
+        for tier in self.TIERS:
+            reached = self.reached[tier]
+            tiers.append({
+                "tier": tier,
+                "reached": reached,
+                "resolved": sum(n for src, n in self.resolved.items() if _TIER_OF.get(src) == tier),
+                "ms": round(1000 * self.tier_s[tier], 3),
+                "us_per_row": round(1e6 * self.tier_s[tier] / reached, 3) if reached else 0.0,
+            })
+        lookups = self.fuzzy_calls + self.fuzzy_cache_hits
+        return {
+            "rows": self.rows,
+            "ms": round(1000 * self.seconds, 3),
+            "by_source": dict(self.resolved.most_common()),
+            "tiers": tiers,
+            "fuzzy": {
+                "lookups": lookups,
+                "calls": self.fuzzy_calls,
+                "cache_hits": self.fuzzy_cache_hits,
+                "hit_rate": round(self.fuzzy_cache_hits / lookups, 4) if lookups else 0.0,
+                "top_merchants": [{"merchant": m, "rows": n} for m, n in self.fuzzy_merchants.most_common(top)],
+            },
+        }
+
+
+# category_source -> the tier that produces it ("other" is what is left after the last tier)
+_TIER_OF = {"income": "credit", "payment": "credit", "one_off": "one_off", "user_rule": "user_rule",
+            "merchant": "merchant", "bank": "bank", "rule": "rule", "fuzzy": "fuzzy", "model": "model"}
+
+
+def save_stats(stats, clean_dir=CLEAN_DIR):
+    """Write a run's CategorizeStats next to the categorized output."""
+    data = stats.to_dict()
+    data["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return write_json_atomic(data, os.path.join(clean_dir, STATS_FILE))
+
+
+def load_stats(clean_dir=CLEAN_DIR):
+    """Statistics of the last categorize run, or None before the first one."""
+    try:
+        with open(os.path.join(clean_dir, STATS_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def format_stats(data):
+    """Plain-text table of load_stats() output for the command line."""
+    rows = data["rows"] or 1
+    lines = [f"{data['rows']:,} rows categorized in {data['ms'] / 1000:.2f} s", "",
+             f"{'tier':<10} {'reached':>10} {'resolved':>10} {'share':>7} {'ms':>10} {'us/row':>8}"]
+    for t in data["tiers"]:
+        lines.append(f"{t['tier']:<10} {t['reached']:>10,} {t['resolved']:>10,} {100 * t['resolved'] / rows:>6.1f}% "
+                     f"{t['ms']:>10.1f} {t['us_per_row']:>8.2f}")
+    other = data["by_source"].get("other", 0)
+    lines.append(f"{'other':<10} {'':>10} {other:>10,} {100 * other / rows:>6.1f}%")
+    fuzzy = data["fuzzy"]
+    lines += ["", f"fuzzy lookups: {fuzzy['lookups']:,}  calls: {fuzzy['calls']:,}  "
+                  f"cache hits: {fuzzy['cache_hits']:,} ({100 * fuzzy['hit_rate']:.1f}%)"]
+    if fuzzy["top_merchants"]:
+        lines += ["", "merchants reaching the fuzzy tier (add rules/overrides for these):"]
+        lines += [f"  {m['rows']:>8,}  {m['merchant']}" for m in fuzzy["top_merchants"]]
+    return "\n".join(lines)
 
 
 def fuzzy_match(text):
@@ -117,109 +229,65 @@ def make_txn_id(row):
     return hashed
 
 
-def load_overrides():
-    """Load merchant override rules from JSON file."""
-    if not os.path.exists(OVERRIDES_JSON):
-        os.makedirs(os.path.dirname(OVERRIDES_JSON), exist_ok=True)
-        with open(OVERRIDES_JSON, "w") as f:
-            json.dump({}, f)
-        return {}
-    
-    try:
-        with open(OVERRIDES_JSON, "r") as f:
-            data = json.load(f)
-        
-        # canonicalize keys when loading
-        result = {}
-        for k, v in data.items():
-            clean_k = clean_string(k)
-            result[clean_k] = v
-        return result
-    except:
-        return {}
-
-
-def load_one_off():
-    """Load one-time overrides from CSV."""
-    if not os.path.exists(ONE_OFF_CSV):
-        os.makedirs(os.path.dirname(ONE_OFF_CSV), exist_ok=True)
-        pd.DataFrame({"txn_id": [], "category": []}).to_csv(ONE_OFF_CSV, index=False)
-        return {}
-    
-    try:
-        df = pd.read_csv(ONE_OFF_CSV)
-        result = {}
-        for _, row in df.iterrows():
-            result[str(row["txn_id"])] = str(row["category"])
-        return result
-    except:
-        return {}
-
-
-def check_merchant_override(merchant, override_map):
-    """Check if merchant has an override rule."""
-    if merchant in override_map:
-        return override_map[merchant]
-    
-    # check if merchant contains override key
-    for key, cat in override_map.items():
-        if key and key in merchant:
-            return cat
-    
-    return None
+def _txn_id_keys(df, desc_norm=None):
+    """The "date|amount|description" strings make_txn_id hashes, for a whole frame.
 
+    Missing descriptions hash as "nan", like make_txn_id (an empty
+    description reads back from CSV as NaN).
+    """
+    dates = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d").astype(object).fillna("")
+    amounts = pd.Series(np.char.mod("%.2f", df["amount_signed"].astype(float).to_numpy()), index=df.index, dtype=object)
+    if desc_norm is None:
+        if "description" in df.columns:
+            desc_norm = clean_strings(as_text(df["description"]))
+        else:
+            desc_norm = pd.Series("", index=df.index, dtype=object)
+    return dates + "|" + amounts + "|" + as_text(desc_norm)
 
-def decide_category(row, one_off_map, merchant_map):
-    """Decide what category this transaction should be."""
-    txn_id = row["txn_id"]
-    
-    # check if it's a credit (positive amount)
-    try:
-        amt = float(row.get("amount_signed") or 0)
-        if amt > 0:
-            # Check if it's a payment (credit card payoff) - exclude those
-            txn_type = str(row.get("Type", "")).lower()
-            if "payment" in txn_type:
-                return "EXCLUDE", "payment"
-            # Otherwise it's income
-            return "Income", "income"
-    except:
-        pass
-    
-    # check one-off overrides first
-    if txn_id in one_off_map:
-        return one_off_map[txn_id], "one_off"
-    
-    # check merchant override
-    merchant = row["merchant"]
-    hit = check_merchant_override(merchant, merchant_map)
-    if hit:
-        return hit, "merchant"
-    
-    # check bank category
-    bank_cat = row.get("bank_category_clean", "")
-    if bank_cat:
-        if str(bank_cat).lower() == "health":
-            return "Groceries", "bank"
-        return bank_cat, "bank"
-    
-    # try keyword match
-    text = f"{row['description_norm']} {row['merchant']}".strip()
-    cat = match_keyword(text)
-    if cat:
-        return cat, "rule"
-    
-    # try fuzzy match
-    cat = fuzzy_match(text)
-    if cat:
-        return cat, "fuzzy"
-    
-    # default
-    return "Other", "other"
+
+def make_txn_ids(df, desc_norm=None, algo=None):
+    """Transaction ids for a whole frame; "sha1" matches make_txn_id row for row."""
+    algo = algo or TXN_ID_HASH
+    keys = _txn_id_keys(df, desc_norm)
+    if algo == "fast":
+        hashed = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        return pd.Series([f"{h:016x}" for h in hashed.tolist()], index=df.index, dtype=object)
+    sha1 = hashlib.sha1
+    return pd.Series([sha1(k.encode("utf-8")).hexdigest() for k in keys.tolist()], index=df.index, dtype=object)
 
 
-def categorize(df):
-    """Add category to transactions."""
+def _remap_legacy_one_off(one_off_map, df, desc_norm):
+    """Translate sha1-keyed one-off overrides onto non-sha1 txn ids."""
+    legacy = make_txn_ids(df, desc_norm, algo="sha1")
+    result = dict(one_off_map)
+    for old_id, new_id in zip(legacy.tolist(), df["txn_id"].tolist()):
+        if old_id in one_off_map:
+            result[new_id] = one_off_map[old_id]
+    return result
+
+
+def load_overrides(config_db=CONFIG_DB):
+    """Merchant override rules {normalized merchant: category} from the config store."""
+    return dict(config_store(config_db).merchant_overrides())
+
+
+def load_one_off(config_db=CONFIG_DB):
+    """One-time overrides {txn_id: category} from the config store."""
+    return dict(config_store(config_db).one_off_overrides())
+
+
+@profile_run("categorize")
+def categorize(df, stats=None, train_model=False, config_db=CONFIG_DB, rules_json=RULES_JSON, model_dir=MODEL_DIR,
+               norm_cache=NORM_CACHE_PATH):
+    """Add category to transactions.
+
+    Pass a CategorizeStats as `stats` to collect per-tier counts and timings.
+    With the learned tier on (EXPENSE_ML_CATEGORIZER), `train_model` refits
+    the model on this run's rule-categorized rows first; it is also fitted
+    when no model exists yet. `config_db`, `rules_json`, `model_dir` and
+    `norm_cache` select whose overrides, rules, model and normalization
+    cache apply (see src.tenants).
+    """
     # need these columns
     needed = {"date", "description", "amount_spend", "amount_signed"}
     if not needed.issubset(df.columns):
@@ -227,35 +295,125 @@ def categorize(df):
     
     out = df.copy()
     
-    # normalize descriptions
-    out["description_norm"] = out["description"].astype(str).apply(clean_string)
-    
-    # extract merchant
-    out["merchant"] = out["description_norm"].apply(get_merchant_name)
-    
-    # clean bank category
-    if "bank_category" in out.columns:
-        out["bank_category_clean"] = out["bank_category"].apply(clean_bank_category)
-    else:
-        out["bank_category_clean"] = ""
+    # normalize descriptions and extract merchant (once per distinct description)
+    with stage("categorize:normalize"):
+        out["description_norm"], out["merchant"] = normalize_descriptions(out["description"], norm_cache)
+        
+        # clean bank category
+        if "bank_category" in out.columns:
+            out["bank_category_clean"] = map_unique(out["bank_category"], clean_bank_category)
+        else:
+            # statements without a category column (concatenated ones get NaN there too)
+            out["bank_category"] = np.nan
+            out["bank_category_clean"] = ""
     
     # create transaction id
-    out["txn_id"] = out.apply(make_txn_id, axis=1)
+    with stage("categorize:txn_id"):
+        out["txn_id"] = make_txn_ids(out, out["description_norm"])
     
     # load overrides
-    merchant_map = load_overrides()
-    one_off_map = load_one_off()
+    store = config_store(config_db)
+    one_off_map = store.one_off_overrides()
+    if TXN_ID_HASH != "sha1" and one_off_map:
+        one_off_map = _remap_legacy_one_off(one_off_map, out, out["description_norm"])
     
-    # decide category for each row
-    categories = []
-    sources = []
-    for _, row in out.iterrows():
-        cat, source = decide_category(row, one_off_map, merchant_map)
-        categories.append(cat)
-        sources.append(source)
+    # resolve rows tier by tier; each tier only looks at rows no earlier tier settled
+    stats = stats if stats is not None else CategorizeStats()
+    started = time.perf_counter()
+    category = np.full(len(out), None, dtype=object)
+    source = np.full(len(out), "other", dtype=object)
+    pending = np.ones(len(out), dtype=bool)
+
+    def settle(rows, cats, label):
+        category[rows] = cats
+        source[rows] = label
+        pending[rows] = False
+
+    with stats.tier("credit", pending):
+        # positive amounts are income, or card payments (excluded)
+        credit = pd.to_numeric(out["amount_signed"], errors="coerce").to_numpy() > 0
+        if "Type" in out.columns:
+            payment = out["Type"].astype(str).str.lower().str.contains("payment", regex=False).to_numpy()
+            settle(credit & payment, "EXCLUDE", "payment")
+        settle(credit & pending, "Income", "income")
+
+    with stats.tier("one_off", pending):
+        rows = np.flatnonzero(pending)
+        cats = out["txn_id"].iloc[rows].map(one_off_map).to_numpy()
+        hit = pd.notna(cats)
+        settle(rows[hit], cats[hit], "one_off")
+
+    ruleset = load_ruleset(rules_json)
+    with stats.tier("user_rule", pending):
+        rows = np.flatnonzero(pending)
+        if len(ruleset) and len(rows):
+            pick = out.iloc[rows]
+            ranks = ruleset.apply({"merchant": pick["merchant"], "description": pick["description"]},
+                                  pick["amount_spend"].to_numpy(), pick["date"].to_numpy())
+            hit = ranks >= 0
+            settle(rows[hit], ruleset.categories_for(ranks[hit]), "user_rule")
+
+    merchant_rules = _merchant_ruleset(store.path, store.change_counter("merchant_overrides"))
+    with stats.tier("merchant", pending):
+        rows = np.flatnonzero(pending)
+        if len(merchant_rules) and len(rows):
+            ranks = merchant_rules.apply({"merchant": out["merchant"].iloc[rows]})
+            hit = ranks >= 0
+            settle(rows[hit], merchant_rules.categories_for(ranks[hit]), "merchant")
+
+    with stats.tier("bank", pending):
+        rows = np.flatnonzero(pending)
+        bank = out["bank_category_clean"].iloc[rows]
+        hit = (bank != "").to_numpy()
+        cats = np.where(bank.astype(str).str.lower() == "health", "Groceries", bank.to_numpy(dtype=object))
+        settle(rows[hit], cats[hit], "bank")
+
+    # keyword and fuzzy tiers match against "description_norm merchant"
+    rows = np.flatnonzero(pending)
+    text = (out["description_norm"].iloc[rows].astype(str) + " " + out["merchant"].iloc[rows].astype(str)).str.strip()
+    with stats.tier("rule", pending):
+        keyword_rules = _keyword_ruleset(tuple(KEYWORD_RULES.items()))
+        ranks = keyword_rules.apply({"text": text.str.lower()})
+        hit = ranks >= 0
+        settle(rows[hit], keyword_rules.categories_for(ranks[hit]), "rule")
+        rows, text = rows[~hit], text[~hit]
+
+    with stats.tier("fuzzy", pending):
+        # once per distinct text
+        codes, uniques = pd.factorize(text)
+        matched = np.array([fuzzy_match(t) for t in uniques] + [None], dtype=object)[codes]
+        stats.fuzzy_calls += len(uniques)
+        stats.fuzzy_cache_hits += len(rows) - len(uniques)
+        stats.fuzzy_merchants.update(out["merchant"].iloc[rows].value_counts().to_dict())
+        hit = pd.notna(matched) & (matched != "")
+        settle(rows[hit], matched[hit], "fuzzy")
+
+    if ML_ENABLED:
+        with stats.tier("model", pending):
+            model = None if train_model else load_model(model_dir)
+            if model is None:
+                settled = ~pending
+                model = train(training_examples(pd.DataFrame({
+                    "description_norm": out["description_norm"].to_numpy()[settled],
+                    "category": category[settled],
+                    "category_source": source[settled],
+                })), model_dir)
+            rows = np.flatnonzero(pending)
+            if model is not None and len(rows):
+                # once per distinct description, in batches
+                codes, uniques = pd.factorize(out["description_norm"].iloc[rows].astype(str))
+                labels, confidence = model.predict([model_text(u) for u in uniques])
+                labels, confidence = labels[codes], confidence[codes]
+                hit = pd.notna(labels) & (confidence >= MIN_CONFIDENCE)
+                settle(rows[hit], labels[hit], "model")
+
+    category[pending] = "Other"
+    stats.rows += len(out)
+    stats.seconds += time.perf_counter() - started
+    stats.resolved.update(pd.Series(source).value_counts().to_dict())
     
-    out["category"] = categories
-    out["category_source"] = sources
+    out["category"] = category
+    out["category_source"] = source
     
     # reorder columns - put important ones first
     first_cols = [
@@ -269,14 +427,65 @@ def categorize(df):
     return out[final_cols]
 
 
-def main():
-    """Run categorization on clean data."""
-    clean_path = os.path.join(CLEAN_DIR, "transactions_clean.csv")
+@profile_run("categorize_partitions")
+def categorize_partitions(clean_dir=CLEAN_DIR, workers=PARTITION_WORKERS, progress=NULL_PROGRESS, train_model=False,
+                          config_db=CONFIG_DB, rules_json=RULES_JSON, model_dir=MODEL_DIR, norm_cache=NORM_CACHE_PATH):
+    """Categorize the clean month partitions one by one (out-of-core mode).
+
+    `train_model` refits the learned tier's model on all months afterwards,
+    for the next run (months use the saved model; the first one fits it if
+    there is none). The config paths are passed on to categorize().
+    """
+    source, target = clean_store(clean_dir), categorized_store(clean_dir)
+    months = source.months()
+    if not months:
+        raise FileNotFoundError("run clean first")
+    month_stats = {m: CategorizeStats() for m in months}
+    
+    def work(month):
+        # rows are categorized independently, so a month needs nothing from other months
+        with progress.stage("categorize", months.index(month) + 1, len(months)):
+            df_cat = categorize(source.read(month), month_stats[month], config_db=config_db,
+                                rules_json=rules_json, model_dir=model_dir, norm_cache=norm_cache)
+            entry = target.write(month, df_cat)
+            # month-level readers use these totals instead of the rows
+            totals = month_category_totals(df_cat, month=month).drop(columns="month")
+            entry["summary"] = totals.to_dict("records")
+            return entry
+    
+    entries = map_partitions(work, months, workers)
+    with progress.stage("persist", 1, 1):
+        target.commit(dict(zip(months, entries)))
+        # the single-file dataset is now stale
+        drop_dataset(clean_dir)
+        stale = os.path.join(clean_dir, "transactions_categorized.csv")
+        if os.path.exists(stale):
+            os.remove(stale)
+        stats = CategorizeStats()
+        for s in month_stats.values():
+            stats.merge(s)
+        save_stats(stats, clean_dir)
+    if ML_ENABLED and train_model:
+        columns = ["description_norm", "category", "category_source"]
+        train(pd.concat([training_examples(target.read(m, columns=columns)) for m in months], ignore_index=True), model_dir)
+    return sum(e["rows"] for e in entries)
+
+
+def main(train_model=False):
+    """Run categorization on clean data (`train_model` refits the learned tier's model)."""
+    if OUT_OF_CORE:
+        print(f"Categorized {categorize_partitions(CLEAN_DIR, train_model=train_model)} transactions")
+        return
+    
     cat_path = os.path.join(CLEAN_DIR, "transactions_categorized.csv")
     
-    df = pd.read_csv(clean_path, parse_dates=["date"])
-    df_cat = categorize(df)
-    df_cat.to_csv(cat_path, index=False)
+    df = load_clean(CLEAN_DIR)
+    stats = CategorizeStats()
+    df_cat = categorize(df, stats, train_model=train_model)
+    write_csv_atomic(df_cat, cat_path)
+    # keep the raw file signatures so API uploads can still append to this snapshot
+    publish_dataset(df_cat, CLEAN_DIR, clean_sources(CLEAN_DIR))
+    save_stats(stats, CLEAN_DIR)
     print(f"Categorized {len(df_cat)} transactions")
 
 
@@ -0,0 +1,426 @@
+"""Spending chat: cached data summaries in front of a pluggable LLM backend."""
+
+import os
+import json
+import time
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.dataset import CLEAN_DIR, load_dataset, read_version
+from src.partitions import OUT_OF_CORE, categorized_store
+from src.row_index import select_rows
+from src.intents import answer_locally
+from src.metrics import cache_access, stage
+
+GEMINI_MODEL = os.environ.get("EXPENSE_GEMINI_MODEL", "gemini-2.5-flash-lite")
+# "gemini" (default) or "stub" (canned local answers, for tests and offline use)
+LLM_BACKEND = os.environ.get("EXPENSE_LLM_BACKEND", "gemini")
+# endpoint for the "http" backend (e.g. benchmarks/fake_llm_server.py or a local model server)
+LLM_URL = os.environ.get("EXPENSE_LLM_URL", "http://127.0.0.1:8765/generate")
+# (dataset version, start, end) summaries kept per process
+CONTEXT_CACHE_SIZE = 128
+# threads running LLM calls, and chat requests (incl. coalesced followers) allowed at once
+CHAT_WORKERS = int(os.environ.get("EXPENSE_CHAT_WORKERS", 4))
+CHAT_MAX_INFLIGHT = int(os.environ.get("EXPENSE_CHAT_MAX_INFLIGHT", 8))
+CHAT_TIMEOUT_S = float(os.environ.get("EXPENSE_CHAT_TIMEOUT", 60))
+
+NO_DATA_ANSWER = "I don't have any transaction data to analyze yet. Please upload your bank statement first."
+
+
+class GeminiBackend:
+    """Google Gemini; one model client reused by every request."""
+
+    def __init__(self, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class StubBackend:
+    """Deterministic local backend: answers from the prompt without a network call."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt):
+        facts = [line for line in prompt.splitlines() if line.startswith(("Total Transactions", "Total Spending"))]
+        words = ("Stub answer. " + " ".join(facts)).split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay / len(words))
+            yield word if i == 0 else " " + word
+
+
+class HttpBackend:
+    """Any server that takes {"prompt", "stream"} and replies with NDJSON {"token"} lines."""
+
+    def __init__(self, url=LLM_URL, timeout=CHAT_TIMEOUT_S):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt):
+        body = json.dumps({"prompt": prompt, "stream": True}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            for line in resp:
+                if line.strip():
+                    yield json.loads(line)["token"]
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend, "http": HttpBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The process-wide backend, created on first use from EXPENSE_LLM_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if LLM_BACKEND not in BACKENDS:
+                raise ValueError(f"unknown LLM backend {LLM_BACKEND!r} (choose from {', '.join(BACKENDS)})")
+            _backend = BACKENDS[LLM_BACKEND]()
+        return _backend
+
+
+def set_backend(backend):
+    """Swap the backend (e.g. a StubBackend in tests); returns the previous one."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+def data_version(clean_dir=CLEAN_DIR):
+    """Version stamp of whichever categorized store is active."""
+    if OUT_OF_CORE:
+        return categorized_store(clean_dir).version()
+    return read_version(clean_dir)
+
+
+def _summarize(start_date, end_date, clean_dir):
+    """Spend totals, category breakdown and top merchants for the chat prompt."""
+    # the range only applies when both ends are given
+    if start_date and end_date:
+        df = select_rows(start_date, end_date, clean_dir=clean_dir)
+    else:
+        df = select_rows(clean_dir=clean_dir)
+    spend = df[df["amount_spend"] > 0]
+    category_breakdown = spend.groupby("category", observed=True)["amount_spend"].sum().to_dict()
+    top_merchants = spend.groupby("merchant", observed=True)["amount_spend"].sum().nlargest(10).to_dict()
+    return {
+        "dataset_rows": categorized_store(clean_dir).rows() if OUT_OF_CORE else len(load_dataset(clean_dir)),
+        "transaction_count": len(df),
+        "total_spend": float(spend["amount_spend"].sum()),
+        "category_breakdown": {str(k): float(v) for k, v in category_breakdown.items()},
+        "top_merchants": {str(k): float(v) for k, v in top_merchants.items()},
+    }
+
+
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+
+
+def chat_context(start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+    """(summary, cached) for a date range, reused until the dataset version changes."""
+    key = (clean_dir, data_version(clean_dir), start_date, end_date)
+    with _contexts_lock:
+        cache_access("chat_context", key in _contexts)
+        if key in _contexts:
+            _contexts.move_to_end(key)
+            return _contexts[key], True
+    with stage("aggregate"):
+        summary = _summarize(start_date, end_date, clean_dir)
+    with _contexts_lock:
+        _contexts[key] = summary
+        while len(_contexts) > CONTEXT_CACHE_SIZE:
+            _contexts.popitem(last=False)
+    return summary, False
+
+
+def build_prompt(summary, question, start_date=None, end_date=None):
+    """Prompt text for the LLM."""
+    return f"""You are a helpful financial assistant analyzing spending data.
+
+Date Range: {start_date} to {end_date}
+Total Transactions: {summary["transaction_count"]}
+Total Spending: ${summary["total_spend"]:.2f}
+
+Category Breakdown:
+{json.dumps({k: f"${v:.2f}" for k, v in summary["category_breakdown"].items()}, indent=2)}
+
+Top Merchants:
+{json.dumps({k: f"${v:.2f}" for k, v in list(summary["top_merchants"].items())[:5]}, indent=2)}
+
+User Question: {question}
+
+Please provide a helpful, concise answer based on this spending data. Use specific numbers and be friendly."""
+
+
+class ChatStats:
+    """Request counters and cumulative data-prep vs model time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.context_hits = 0
+        self.prep_s = 0.0
+        self.model_s = 0.0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def record(self, cached, prep_s, model_s):
+        with self._lock:
+            self.requests += 1
+            self.context_hits += int(cached)
+            self.prep_s += prep_s
+            self.model_s += model_s
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            n = max(self.requests, 1)
+            return {
+                "requests": self.requests,
+                "context_cache_hits": self.context_hits,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "avg_prep_ms": round(1000 * self.prep_s / n, 3),
+                "avg_model_ms": round(1000 * self.model_s / n, 3),
+            }
+
+
+stats = ChatStats()
+
+
+class ChatBusy(Exception):
+    """Raised when CHAT_MAX_INFLIGHT chat requests are already being served."""
+
+
+class Generation:
+    """One LLM call whose tokens any number of requests can follow."""
+
+    def __init__(self):
+        self.tokens = []
+        self.timings = None
+        self.error = None
+        self.done = False
+        self._cond = threading.Condition()
+        self._callbacks = []
+
+    def push(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, timings=None, error=None):
+        with self._cond:
+            self.timings, self.error, self.done = timings, error, True
+            self._cond.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self._call(fn)
+
+    def add_done_callback(self, fn):
+        """Call `fn(generation)` once the call finishes (right away if it already has)."""
+        with self._cond:
+            if not self.done:
+                self._callbacks.append(fn)
+                return
+        self._call(fn)
+
+    def _call(self, fn):
+        try:
+            fn(self)
+        except Exception as e:
+            print(f"Chat callback failed: {type(e).__name__}: {e}")
+
+    def reply(self):
+        """The finished call as an answer dict ({"answer", "intent", "timings"})."""
+        return {"answer": "".join(self.tokens), "intent": None, "timings": self.timings}
+
+    def follow(self, timeout=CHAT_TIMEOUT_S):
+        """Yield tokens from the start as they arrive; re-raises the call's error."""
+        deadline = time.monotonic() + timeout
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self.tokens) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("chat backend did not answer in time")
+                    self._cond.wait(remaining)
+                fresh, done, error = self.tokens[sent:], self.done, self.error
+            for token in fresh:
+                yield token
+            sent += len(fresh)
+            if done and sent == len(self.tokens):
+                if error is not None:
+                    raise error
+                return
+
+    def result(self, timeout=CHAT_TIMEOUT_S):
+        return "".join(self.follow(timeout))
+
+
+class ChatService:
+    """Runs LLM calls on a dedicated pool so web workers never block on a slow model.
+
+    Identical questions (same data version, range and wording) that arrive
+    while one is being answered share that call; at most `max_inflight`
+    chat requests are admitted at once and the rest get ChatBusy.
+    """
+
+    def __init__(self, workers=CHAT_WORKERS, max_inflight=CHAT_MAX_INFLIGHT):
+        self.max_inflight = max_inflight
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="expense-chat")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._running = {}  # question key -> Generation
+
+    def acquire(self):
+        """Admit one chat request or raise ChatBusy; pair with release()."""
+        with self._lock:
+            if self._active >= self.max_inflight:
+                stats.count("rejected")
+                raise ChatBusy(f"{self._active} chat requests already in flight")
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def in_flight(self):
+        with self._lock:
+            return {"active_requests": self._active, "running_calls": len(self._running), "max_inflight": self.max_inflight}
+
+    def generation(self, question, start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+        """The running Generation for this question, starting one if needed."""
+        key = (clean_dir, data_version(clean_dir), start_date, end_date, " ".join(question.lower().split()))
+        with self._lock:
+            gen = self._running.get(key)
+            if gen is not None:
+                stats.count("coalesced")
+                return gen
+            gen = self._running[key] = Generation()
+        self._pool.submit(self._run, key, gen, question, start_date, end_date, clean_dir)
+        return gen
+
+    def _run(self, key, gen, question, start_date, end_date, clean_dir):
+        try:
+            started = time.perf_counter()
+            summary, cached = chat_context(start_date, end_date, clean_dir)
+            if summary["dataset_rows"] == 0:
+                gen.push(NO_DATA_ANSWER)
+                gen.finish()
+                return
+            prompt = build_prompt(summary, question, start_date, end_date)
+            prepared = time.perf_counter()
+
+            with stage("llm"):
+                for token in get_backend().stream(prompt):
+                    gen.push(token)
+            finished = time.perf_counter()
+
+            stats.record(cached, prepared - started, finished - prepared)
+            timings = {
+                "prep_ms": round(1000 * (prepared - started), 3),
+                "model_ms": round(1000 * (finished - prepared), 3),
+                "context_cached": cached,
+            }
+            print(f"Chat: {summary['transaction_count']} transactions, prep {timings['prep_ms']} ms "
+                  f"({'cached' if cached else 'computed'}), model {timings['model_ms']} ms")
+            gen.finish(timings)
+        except Exception as e:
+            gen.finish(error=e)
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+
+
+service = ChatService()
+
+
+def start_answer(question, start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+    """Answer locally, or start the LLM call without waiting for it. Raises ChatBusy.
+
+    Returns the local answer dict (see answer), or the running Generation;
+    the admission slot is freed when that call finishes, so callers can
+    return at once and collect `reply()` from a done callback.
+    """
+    local = answer_locally(question, start_date, end_date, clean_dir) if data_version(clean_dir) else None
+    if local is not None:
+        return local
+    service.acquire()
+    try:
+        gen = service.generation(question, start_date, end_date, clean_dir)
+    except Exception:
+        service.release()
+        raise
+    gen.add_done_callback(lambda _: service.release())
+    return gen
+
+
+def answer(question, start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+    """Answer a spending question; returns {"answer", "intent", "timings"}. Raises ChatBusy.
+
+    Common questions are answered locally (see src.intents, `intent` names
+    the one used); the rest go to the LLM with `intent` None. Blocks until
+    the model answers; the API uses start_answer instead.
+    """
+    started = start_answer(question, start_date, end_date, clean_dir)
+    if isinstance(started, dict):
+        return started
+    started.result()
+    return started.reply()
+
+
+def stream_answer(question, start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+    """Server-sent events for an answer: token events, then "done" (or "error").
+
+    Admission happens here, before the first event, so ChatBusy can still
+    become an HTTP error; the slot is freed when the stream ends or the
+    client goes away. Local answers arrive as a single token.
+    """
+    local = answer_locally(question, start_date, end_date, clean_dir) if data_version(clean_dir) else None
+    if local is not None:
+        return iter([
+            f"data: {json.dumps({'token': local['answer']})}\n\n",
+            f"event: done\ndata: {json.dumps({'intent': local['intent'], 'timings': local['timings']})}\n\n",
+        ])
+    service.acquire()
+    try:
+        gen = service.generation(question, start_date, end_date, clean_dir)
+    except Exception:
+        service.release()
+        raise
+
+    def events():
+        try:
+            for token in gen.follow():
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'timings': gen.timings})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            service.release()
+
+    return events()
@@ -1,11 +1,45 @@
 """Clean and standardize raw bank CSV files."""
 
 import os
+import json
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 from dateutil import parser
+from pandas.tseries.api import guess_datetime_format
+from src.atomic_io import atomic_path, write_csv_atomic, write_json_atomic
+from src.progress import NULL_PROGRESS
+from src.metrics import stage
+from src.profiling import profile_run
+from src.partitions import OUT_OF_CORE, clean_store
+from src.dedup import DEDUP_ENABLED, DedupReport, dedup_frame, duplicate_rows, save_report
+from src.normalize import NORM_CACHE_PATH
 
 RAW_DIR = "data/raw"
 CLEAN_DIR = "data/clean"
+CLEAN_CSV = "transactions_clean.csv"
+CLEAN_ARROW = "transactions_clean.arrow"
+# raw file signatures the single-file store was built from (see raw_signatures)
+CLEAN_SOURCES = "transactions_clean.sources.json"
+
+# rows per chunk for streaming ingest; 0/unset reads each file in one go
+CHUNKSIZE = int(os.environ.get("EXPENSE_INGEST_CHUNKSIZE", 0)) or None
+
+# fixed schema of the streamed (columnar) clean store
+STREAM_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ns")),
+    ("description", pa.string()),
+    ("amount_signed", pa.float64()),
+    ("amount_spend", pa.float64()),
+    ("amount", pa.float64()),
+    ("bank_category", pa.string()),
+    ("Type", pa.string()),
+    ("source", pa.string()),
+])
 
 
 def find_column(df, possible_names):
@@ -31,43 +65,341 @@ def parse_date(value):
         return pd.NaT
 
 
+def guess_date_format(values):
+    """Guess a strftime format from the first non-empty value (None if unsure)."""
+    sample = values.dropna()
+    if sample.empty:
+        return None
+    return guess_datetime_format(str(sample.iloc[0]))
+
+
+def parse_dates(values, date_format=None):
+    """Parse a date column with one format, falling back to parse_date per odd value."""
+    if date_format is None:
+        return values.apply(parse_date)
+    parsed = pd.to_datetime(values.astype(str), format=date_format, errors="coerce")
+    missed = parsed.isna() & values.notna()
+    if missed.any():
+        parsed = parsed.astype(object)
+        parsed[missed] = values[missed].apply(parse_date)
+        parsed = pd.to_datetime(parsed)
+    return parsed
+
+
+def detect_columns(df):
+    """Map a statement's header onto the columns clean_frame needs."""
+    cols = {
+        "date": find_column(df, ["transaction date", "date", "posted date", "post date"]),
+        "description": find_column(df, ["description", "details", "memo"]),
+        "amount": find_column(df, ["amount", "transaction amount", "value"]),
+        "bank_category": find_column(df, ["category"]),
+        "type": find_column(df, ["type"]),
+    }
+    if not cols["date"] or not cols["description"] or not cols["amount"]:
+        raise ValueError("Could not find required columns (date, description, amount)")
+    return cols
+
+
+def read_raw(raw_path):
+    """Read a single raw CSV as-is."""
+    print(f"\nReading: {raw_path}")
+    return pd.read_csv(raw_path)
+
+
 def clean_transactions(raw_path):
     """Read a single raw CSV and return cleaned DataFrame (not saved)."""
-    print(f"\nReading: {raw_path}")
-    df = pd.read_csv(raw_path)
+    return clean_frame(read_raw(raw_path))
 
-    date_col = find_column(df, ["transaction date", "date", "posted date", "post date"])
-    desc_col = find_column(df, ["description", "details", "memo"])
-    amt_col = find_column(df, ["amount", "transaction amount", "value"])
-    bank_cat_col = find_column(df, ["category"])
 
-    if not date_col or not desc_col or not amt_col:
-        raise ValueError("Could not find required columns (date, description, amount)")
+def clean_frame(df, cols=None, date_format=None, sort=True):
+    """Standardize one raw statement frame (date, description, amounts, bank category).
+
+    Streaming ingest passes the header's `cols` and `date_format` so they are
+    worked out once per file rather than per chunk.
+    """
+    if cols is None:
+        cols = detect_columns(df)
+        date_format = guess_date_format(df[cols["date"]])
 
     out = df.copy()
-    out["date"] = out[date_col].apply(parse_date)
-    out["description"] = out[desc_col].astype(str)
-    out["amount_signed"] = pd.to_numeric(out[amt_col], errors="coerce")
+    with stage("clean:dates"):
+        out["date"] = parse_dates(out[cols["date"]], date_format)
+    out["description"] = out[cols["description"]].astype(str)
+    out["amount_signed"] = pd.to_numeric(out[cols["amount"]], errors="coerce")
     out = out.dropna(subset=["date", "description", "amount_signed"]).reset_index(drop=True)
     out["amount_spend"] = (-out["amount_signed"]).clip(lower=0)
     out["amount"] = out["amount_spend"]
-    if bank_cat_col:
-        out["bank_category"] = out[bank_cat_col].astype(str)
-    out = out.sort_values("date").reset_index(drop=True)
+    if cols["bank_category"]:
+        out["bank_category"] = out[cols["bank_category"]].astype(str)
+    if sort:
+        with stage("clean:sort"):
+            out = out.sort_values("date").reset_index(drop=True)
     return out
 
 
-def clean_all(raw_dir=RAW_DIR, save_path=os.path.join(CLEAN_DIR, "transactions_clean.csv")):
-    """Clean all CSVs in raw_dir, add source column, concatenate, and save."""
+def _stream_batch(cleaned, cols, source):
+    """Project a cleaned chunk onto STREAM_SCHEMA."""
+    out = pd.DataFrame({
+        "date": pd.to_datetime(cleaned["date"]).astype("datetime64[ns]"),
+        "description": cleaned["description"],
+        "amount_signed": cleaned["amount_signed"],
+        "amount_spend": cleaned["amount_spend"],
+        "amount": cleaned["amount"],
+        "bank_category": cleaned["bank_category"] if "bank_category" in cleaned else None,
+        "Type": cleaned[cols["type"]].astype(str) if cols["type"] else None,
+        "source": source,
+    })
+    return pa.RecordBatch.from_pandas(out, schema=STREAM_SCHEMA, preserve_index=False)
+
+
+def _stream_batches(path, source, chunksize, progress):
+    """Clean one raw CSV chunk by chunk, yielding STREAM_SCHEMA record batches."""
+    print(f"\nStreaming: {path}")
+    cols = date_format = None
+    reader = pd.read_csv(path, chunksize=chunksize)
+    while True:
+        with progress.stage("parse"):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+        with progress.stage("clean"):
+            if cols is None:
+                # header-level detection happens once per file
+                cols = detect_columns(chunk)
+                date_format = guess_date_format(chunk[cols["date"]])
+            cleaned = clean_frame(chunk, cols=cols, date_format=date_format, sort=False)
+        if len(cleaned):
+            yield _stream_batch(cleaned, cols, source)
+
+
+def _stream_file(path, source, writer, chunksize, progress):
+    """Clean one raw CSV chunk by chunk, appending each chunk to `writer`."""
+    rows = 0
+    for batch in _stream_batches(path, source, chunksize, progress):
+        writer.write_batch(batch)
+        rows += batch.num_rows
+    return rows
+
+
+def _bucket_slices(reader, slices):
+    """Per row of an Arrow file, which of `slices` hash slices its (day, amount in cents) bucket falls in."""
+    parts = []
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        day = batch.column("date").to_numpy(zero_copy_only=False).astype("datetime64[D]").astype(np.int64)
+        cents = np.round(batch.column("amount_signed").to_numpy(zero_copy_only=False) * 100).astype(np.int64)
+        hashed = pd.util.hash_pandas_object(pd.DataFrame({"day": day, "cents": cents}), index=False).to_numpy()
+        parts.append((hashed % np.uint64(slices)).astype(np.int32))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+
+
+def _read_rows(reader, rows, columns):
+    """The given (sorted) row numbers of an Arrow file as a frame, gathered batch by batch."""
+    parts, offset = [], 0
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        lo, hi = np.searchsorted(rows, [offset, offset + batch.num_rows])
+        if hi > lo:
+            parts.append(batch.select(columns).take(pa.array(rows[lo:hi] - offset)))
+        offset += batch.num_rows
+    return pa.Table.from_batches(parts).to_pandas()
+
+
+def _dedup_arrow(path, report, chunksize, norm_cache=NORM_CACHE_PATH):
+    """Drop cross-source duplicates from a streamed store file in place.
+
+    Duplicates share a day and an amount, so rows are split into hash
+    slices of (day, amount) buckets of about `chunksize` rows, and each
+    slice's key columns are read back and deduplicated on their own. Across
+    slices memory holds only a slice number and a drop flag per row;
+    surviving rows are copied batch by batch from the memory-mapped file.
+    """
+    if not DEDUP_ENABLED:
+        return 0
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        total = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+        slices = max(1, -(-total // chunksize))
+        part = _bucket_slices(reader, slices)
+        drop = np.zeros(total, dtype=bool)
+        for p in range(slices):
+            rows = np.flatnonzero(part == p)
+            if len(rows):
+                keys = _read_rows(reader, rows, ["date", "amount_signed", "description", "source"])
+                drop[rows[duplicate_rows(keys, report, norm_cache)]] = True
+        if not drop.any():
+            return 0
+        keep = pa.array(~drop)
+        with pa.OSFile(path + ".dedup", "wb") as sink:
+            with pa.ipc.new_file(sink, STREAM_SCHEMA) as writer:
+                offset = 0
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    writer.write_batch(batch.filter(keep.slice(offset, batch.num_rows)))
+                    offset += batch.num_rows
+    os.replace(path + ".dedup", path)
+    return int(drop.sum())
+
+
+def clean_all_streaming(raw_dir=RAW_DIR, clean_dir=CLEAN_DIR, chunksize=100_000, progress=NULL_PROGRESS,
+                        norm_cache=NORM_CACHE_PATH):
+    """Clean every raw CSV in `chunksize`-row chunks into the columnar clean store.
+
+    Peak memory is bounded by the chunk size: nothing holds a whole file.
+    The dedup pass afterwards keeps 5 bytes per row (a hash slice and a
+    drop flag) plus the key columns of about `chunksize` rows at a time.
+    Rows are not globally sorted here; load_clean sorts them on read.
+    """
     csvs = [f for f in os.listdir(raw_dir) if f.endswith(".csv")]
     if not csvs:
         raise FileNotFoundError("No CSV files found in data/raw/")
 
+    save_path = os.path.join(clean_dir, CLEAN_ARROW)
+    sources = raw_signatures(raw_dir, csvs)
+    total = 0
+    report = DedupReport()
+    with atomic_path(save_path) as tmp:
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, STREAM_SCHEMA) as writer:
+                for fname in csvs:
+                    try:
+                        total += _stream_file(
+                            os.path.join(raw_dir, fname), os.path.splitext(fname)[0], writer, chunksize, progress
+                        )
+                    except Exception as e:
+                        print(f"Skipping {fname}: {e}")
+        if total == 0:
+            raise RuntimeError("No CSVs could be cleaned successfully")
+        with progress.stage("clean"):
+            total -= _dedup_arrow(tmp, report, chunksize, norm_cache)
+    save_report(report, clean_dir)
+    _save_sources(clean_dir, sources)
+
+    # the CSV store is now stale
+    csv_path = os.path.join(clean_dir, CLEAN_CSV)
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+    print(f"Wrote streamed clean store with {total} rows: {save_path}")
+    return total
+
+
+def clean_all_partitioned(raw_dir=RAW_DIR, clean_dir=CLEAN_DIR, chunksize=100_000, progress=NULL_PROGRESS,
+                          norm_cache=NORM_CACHE_PATH):
+    """Clean every raw CSV into month partitions (out-of-core mode).
+
+    Chunks are split by month into fragment files, then each month's
+    fragments are deduplicated, sorted and written as one partition, so
+    memory holds at most one chunk or one month at a time (duplicates share
+    a date, so they always land in the same month).
+    """
+    csvs = [f for f in os.listdir(raw_dir) if f.endswith(".csv")]
+    if not csvs:
+        raise FileNotFoundError("No CSV files found in data/raw/")
+
+    store = clean_store(clean_dir)
+    os.makedirs(store.root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=store.root)
+    fragments = {}
+    report = DedupReport()
+    try:
+        for fname in csvs:
+            try:
+                batches = _stream_batches(os.path.join(raw_dir, fname), os.path.splitext(fname)[0], chunksize, progress)
+                for batch in batches:
+                    months = pc.strftime(batch.column("date"), format="%Y-%m")
+                    for month in pc.unique(months).to_pylist():
+                        part = batch.filter(pc.equal(months, month))
+                        path = os.path.join(staging, f"{month}.{len(fragments.get(month, []))}.arrow")
+                        feather.write_feather(pa.Table.from_batches([part]), path, compression="uncompressed")
+                        fragments.setdefault(month, []).append(path)
+            except Exception as e:
+                print(f"Skipping {fname}: {e}")
+        if not fragments:
+            raise RuntimeError("No CSVs could be cleaned successfully")
+
+        partitions = {}
+        for i, month in enumerate(sorted(fragments), 1):
+            with progress.stage("persist", i, len(fragments)):
+                table = pa.concat_tables([feather.read_table(p) for p in fragments[month]])
+                partitions[month] = store.write(month, dedup_frame(table.to_pandas(), report, norm_cache))
+        store.commit(partitions)
+        save_report(report, clean_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    # the single-file stores are now stale
+    for name in (CLEAN_CSV, CLEAN_ARROW, CLEAN_SOURCES):
+        path = os.path.join(clean_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    total = sum(p["rows"] for p in partitions.values())
+    print(f"Wrote {len(partitions)} month partitions with {total} rows: {store.root}")
+    return total
+
+
+def load_clean(clean_dir=CLEAN_DIR):
+    """Load cleaned transactions from whichever store the last clean wrote."""
+    arrow_path = os.path.join(clean_dir, CLEAN_ARROW)
+    csv_path = os.path.join(clean_dir, CLEAN_CSV)
+    if OUT_OF_CORE and clean_store(clean_dir).months():
+        # callers that need every row at once (e.g. the Streamlit app)
+        return clean_store(clean_dir).read_range()
+    if os.path.exists(arrow_path):
+        table = pa.ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+        table = table.take(pc.sort_indices(table, [("date", "ascending")]))
+        return table.to_pandas()
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, parse_dates=["date"])
+    return pd.DataFrame(columns=["date", "description", "amount_signed", "amount_spend", "category"])
+
+
+def append_clean(df, clean_dir=CLEAN_DIR, sources=None):
+    """Add newly cleaned rows (statements appended to the dataset's change log) to the single-file clean store.
+
+    The CSV store is copied and the rows appended to the copy; the columnar
+    store's batches are copied with the rows as one more batch. `sources`
+    are merged into the store's recorded raw file signatures. Returns the
+    number of rows added.
+    """
+    arrow_path = os.path.join(clean_dir, CLEAN_ARROW)
+    csv_path = os.path.join(clean_dir, CLEAN_CSV)
+    if os.path.exists(arrow_path):
+        batch = _stream_batch(df, {"type": find_column(df, ["type"])}, df["source"])
+        with atomic_path(arrow_path) as tmp:
+            with pa.memory_map(arrow_path, "r") as source, pa.OSFile(tmp, "wb") as sink:
+                reader = pa.ipc.open_file(source)
+                with pa.ipc.new_file(sink, STREAM_SCHEMA) as writer:
+                    for i in range(reader.num_record_batches):
+                        writer.write_batch(reader.get_batch(i))
+                    writer.write_batch(batch)
+    elif os.path.exists(csv_path):
+        header = list(pd.read_csv(csv_path, nrows=0).columns)
+        with atomic_path(csv_path) as tmp:
+            if set(df.columns) <= set(header):
+                shutil.copyfile(csv_path, tmp)
+                df.reindex(columns=header).to_csv(tmp, mode="a", header=False, index=False)
+            else:
+                # the new statement has columns the store lacks: rewrite it with the wider header
+                pd.concat([pd.read_csv(csv_path, parse_dates=["date"]), df], ignore_index=True).to_csv(tmp, index=False)
+    else:
+        print(f"No single-file clean store in {clean_dir} to append to")
+        return 0
+    if sources:
+        _save_sources(clean_dir, {**(clean_sources(clean_dir) or {}), **sources})
+    print(f"Appended {len(df)} rows to the clean store in {clean_dir}")
+    return len(df)
+
+
+def clean_files(raw_dir, fnames, progress=NULL_PROGRESS):
+    """Clean the given raw CSVs into one frame (file order, with a source column); unreadable files are skipped."""
     frames = []
-    for fname in csvs:
+    for i, fname in enumerate(fnames, 1):
         path = os.path.join(raw_dir, fname)
         try:
-            cleaned = clean_transactions(path)
+            with progress.stage("parse", i, len(fnames)):
+                raw = read_raw(path)
+            with progress.stage("clean", i, len(fnames)):
+                cleaned = clean_frame(raw)
             cleaned["source"] = os.path.splitext(fname)[0]
             frames.append(cleaned)
         except Exception as e:
@@ -75,17 +407,71 @@ def clean_all(raw_dir=RAW_DIR, save_path=os.path.join(CLEAN_DIR, "transactions_c
 
     if not frames:
         raise RuntimeError("No CSVs could be cleaned successfully")
+    return pd.concat(frames, ignore_index=True)
+
+
+def raw_signatures(raw_dir, fnames):
+    """{source: [size, mtime_ns]} for raw CSVs, to tell which ones changed since they were ingested."""
+    signatures = {}
+    for fname in fnames:
+        st = os.stat(os.path.join(raw_dir, fname))
+        signatures[os.path.splitext(fname)[0]] = [st.st_size, st.st_mtime_ns]
+    return signatures
+
+
+def clean_sources(clean_dir=CLEAN_DIR):
+    """Raw file signatures the single-file clean store holds (see raw_signatures), or None if unknown."""
+    try:
+        with open(os.path.join(clean_dir, CLEAN_SOURCES)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_sources(clean_dir, sources):
+    """Record which raw files (and versions of them) the single-file clean store was built from."""
+    write_json_atomic(sources, os.path.join(clean_dir, CLEAN_SOURCES))
+
+
+@profile_run("clean_all")
+def clean_all(raw_dir=RAW_DIR, save_path=os.path.join(CLEAN_DIR, CLEAN_CSV), progress=NULL_PROGRESS, chunksize=CHUNKSIZE,
+              norm_cache=NORM_CACHE_PATH):
+    """Clean all CSVs in raw_dir, add source column, concatenate, and save.
+
+    With `chunksize` set the files are streamed into the columnar store
+    instead and nothing is returned (read it back with load_clean); in
+    out-of-core mode they go to month partitions.
+    """
+    if OUT_OF_CORE:
+        clean_all_partitioned(raw_dir, os.path.dirname(save_path), chunksize or 100_000, progress, norm_cache)
+        return None
+    if chunksize:
+        clean_all_streaming(raw_dir, os.path.dirname(save_path), chunksize, progress, norm_cache)
+        return None
+
+    csvs = [f for f in os.listdir(raw_dir) if f.endswith(".csv")]
+    if not csvs:
+        raise FileNotFoundError("No CSV files found in data/raw/")
 
-    combined = pd.concat(frames, ignore_index=True).sort_values("date").reset_index(drop=True)
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    combined.to_csv(save_path, index=False)
+    sources = raw_signatures(raw_dir, csvs)
+    frames = clean_files(raw_dir, csvs, progress)
+    with progress.stage("clean", len(csvs), len(csvs)):
+        report = DedupReport()
+        combined = dedup_frame(frames, report, norm_cache)
+        combined = combined.sort_values("date").reset_index(drop=True)
+        save_report(report, os.path.dirname(save_path))
+        write_csv_atomic(combined, save_path)
+        _save_sources(os.path.dirname(save_path), sources)
+        stale = os.path.join(os.path.dirname(save_path), CLEAN_ARROW)
+        if os.path.exists(stale):
+            os.remove(stale)
     print(f"Wrote combined cleaned file with {len(combined)} rows: {save_path}")
     return combined
 
 
-def main():
+def main(chunksize=CHUNKSIZE):
     """Clean all CSVs in raw folder (multi-file support)."""
-    clean_all()
+    clean_all(chunksize=chunksize)
 
 
 if __name__ == "__main__":
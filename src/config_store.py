@@ -0,0 +1,217 @@
+"""Override storage: one SQLite database (WAL) shared by the API, CLI and Streamlit app.
+
+Merchant overrides and one-off (per transaction) overrides live in tables
+keyed (and so indexed) by merchant and txn_id, and every edit is a
+single-row upsert instead of rewriting overrides.json / one_off_overrides.csv.
+Each write also bumps change counters (overall and per table) in the same
+transaction; readers cache each override map per counter value, and
+anything derived from overrides can key its own cache on change_counter().
+
+The first time the database is created, overrides.json and
+one_off_overrides.csv next to it are imported if present; import_legacy /
+export_legacy (python run.py config import|export) convert between both
+formats at any time.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from src.atomic_io import write_csv_atomic, write_json_atomic
+from src.normalize import clean_string
+
+CONFIG_DIR = "data/config"
+DB_FILE = "config.db"
+CONFIG_DB = os.environ.get("EXPENSE_CONFIG_DB", os.path.join(CONFIG_DIR, DB_FILE))
+# open stores (each holds a connection per thread) kept per process, least recently used closed first
+MAX_STORES = int(os.environ.get("EXPENSE_CONFIG_STORES", 128))
+# legacy formats, next to the database
+OVERRIDES_JSON = "overrides.json"
+ONE_OFF_CSV = "one_off_overrides.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS merchant_overrides (
+    merchant TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+);
+CREATE TABLE IF NOT EXISTS one_off_overrides (
+    txn_id TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('changes', 0), ('merchant_overrides', 0), ('one_off_overrides', 0);
+"""
+
+# table -> key column
+TABLES = {"merchant_overrides": "merchant", "one_off_overrides": "txn_id"}
+
+# per-process stores: database path -> ConfigStore, least recently used first
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+class ConfigStore:
+    """Merchant and one-off overrides in one SQLite file."""
+
+    def __init__(self, path=CONFIG_DB):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}  # table -> (change counter, {key: category})
+        self._lock = threading.Lock()
+        fresh = not os.path.exists(path)
+        self._conn().executescript(SCHEMA)
+        if fresh:
+            try:
+                self.import_legacy()
+            except (ValueError, KeyError) as e:
+                print(f"Could not import legacy overrides into {path}: {e}")
+
+    def _conn(self):
+        """This thread's connection (sqlite3 connections are not shared across threads or forked workers)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # readers never block the writer (and vice versa) across processes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self):
+        return _Transaction(self._conn())
+
+    def change_counter(self, table=None):
+        """Number of committed override writes so far (any process), to all tables or to `table`."""
+        return self._conn().execute("SELECT value FROM meta WHERE key = ?", (table or "changes",)).fetchone()[0]
+
+    def legacy_paths(self):
+        """(overrides.json, one_off_overrides.csv) next to the database."""
+        folder = os.path.dirname(self.path)
+        return os.path.join(folder, OVERRIDES_JSON), os.path.join(folder, ONE_OFF_CSV)
+
+    def _read(self, table):
+        counter = self.change_counter(table)
+        hit = self._cache.get(table)
+        if hit and hit[0] == counter:
+            return hit[1]
+        # rowid order is insertion order, like the JSON file's key order (substring rules depend on it)
+        rows = self._conn().execute(f"SELECT {TABLES[table]}, category FROM {table} ORDER BY rowid").fetchall()
+        data = dict(rows)
+        with self._lock:
+            self._cache[table] = (counter, data)
+        return data
+
+    def merchant_overrides(self):
+        """{normalized merchant: category}. Shared per change counter: copy before modifying."""
+        return self._read("merchant_overrides")
+
+    def one_off_overrides(self):
+        """{txn_id: category}. Shared per change counter: copy before modifying."""
+        return self._read("one_off_overrides")
+
+    def _bump(self, conn, table):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key IN ('changes', ?)", (table,))
+
+    def _upsert(self, table, items, replace=False):
+        key = TABLES[table]
+        with self._write() as conn:
+            if replace:
+                conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                f"INSERT INTO {table} ({key}, category) VALUES (?, ?) "
+                f"ON CONFLICT({key}) DO UPDATE SET category = excluded.category, "
+                f"updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now')",
+                [(str(k), str(v)) for k, v in items],
+            )
+            self._bump(conn, table)
+
+    def _delete(self, table, keys):
+        with self._write() as conn:
+            deleted = conn.executemany(f"DELETE FROM {table} WHERE {TABLES[table]} = ?", [(str(k),) for k in keys]).rowcount
+            self._bump(conn, table)
+        return deleted
+
+    def set_merchant(self, merchant, category):
+        """Upsert one merchant override (the key is normalized like descriptions are)."""
+        self._upsert("merchant_overrides", [(clean_string(merchant), category)])
+
+    def set_merchants(self, items):
+        """Upsert many (merchant, category) pairs in one transaction."""
+        self._upsert("merchant_overrides", [(clean_string(m), c) for m, c in items])
+
+    def delete_merchants(self, merchants):
+        return self._delete("merchant_overrides", [clean_string(m) for m in merchants])
+
+    def set_one_off(self, txn_id, category):
+        """Upsert one per-transaction override."""
+        self._upsert("one_off_overrides", [(txn_id, category)])
+
+    def set_one_offs(self, items):
+        """Upsert many (txn_id, category) pairs in one transaction."""
+        self._upsert("one_off_overrides", items)
+
+    def delete_one_offs(self, txn_ids):
+        return self._delete("one_off_overrides", txn_ids)
+
+    def import_legacy(self, overrides_json=None, one_off_csv=None, replace=False):
+        """Load overrides.json / one_off_overrides.csv (whichever exist); returns rows imported per table.
+
+        `replace` empties a table before importing into it.
+        """
+        default_json, default_csv = self.legacy_paths()
+        overrides_json, one_off_csv = overrides_json or default_json, one_off_csv or default_csv
+        counts = {}
+        if overrides_json and os.path.exists(overrides_json):
+            with open(overrides_json, "r") as f:
+                data = json.load(f)
+            self._upsert("merchant_overrides", [(clean_string(k), v) for k, v in data.items() if v], replace)
+            counts["merchant_overrides"] = len(data)
+        if one_off_csv and os.path.exists(one_off_csv):
+            df = pd.read_csv(one_off_csv, dtype=str).dropna(subset=["txn_id", "category"])
+            self._upsert("one_off_overrides", zip(df["txn_id"], df["category"]), replace)
+            counts["one_off_overrides"] = len(df)
+        return counts
+
+    def export_legacy(self, overrides_json=None, one_off_csv=None):
+        """Write both tables in the legacy JSON / CSV formats (next to the database by default)."""
+        default_json, default_csv = self.legacy_paths()
+        overrides_json, one_off_csv = overrides_json or default_json, one_off_csv or default_csv
+        write_json_atomic(self.merchant_overrides(), overrides_json)
+        one_off = self.one_off_overrides()
+        write_csv_atomic(pd.DataFrame({"txn_id": list(one_off), "category": list(one_off.values())}), one_off_csv)
+        return {"merchant_overrides": overrides_json, "one_off_overrides": one_off_csv}
+
+
+class _Transaction:
+    """`with` block running one IMMEDIATE transaction (commit on success, rollback on error)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def config_store(path=CONFIG_DB):
+    """The process-wide ConfigStore for `path` (one per tenant's database)."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is not None:
+            _stores.move_to_end(path)
+            return store
+        store = _stores[path] = ConfigStore(path)
+        while len(_stores) > MAX_STORES:
+            # its connections close once no thread still uses the store
+            _stores.popitem(last=False)
+        return store
@@ -0,0 +1,342 @@
+"""Shared categorized dataset: one memory-mapped Arrow file read by every worker.
+
+The file is a snapshot; small changes since then (override edits, new
+statements) live in the append-only change log (src/txlog.py) and are
+replayed on load.
+"""
+
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from src.atomic_io import atomic_path, write_text_atomic
+from src.memory_budget import budget, nbytes
+from src.metrics import cache_access, stage
+from src.txlog import ROW_ID, ChangeLog
+
+CLEAN_DIR = "data/clean"
+DATASET_FILE = "transactions_categorized.arrow"
+VERSION_FILE = "transactions_categorized.version"
+CSV_FILE = "transactions_categorized.csv"
+# per (month, category) totals written next to the dataset
+SUMMARY_FILE = "transactions_categorized.summary.arrow"
+
+# low-cardinality / heavily repeated text stored as categorical codes
+CATEGORICAL_COLUMNS = [
+    "category", "category_source", "source", "month", "bank_category",
+    "bank_category_clean", "merchant", "description", "description_norm",
+]
+# other text columns become categorical when at most this share of values is unique
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+TXN_ID_BYTES = 20
+# Arrow schema metadata key naming the snapshot the change log applies to
+SNAPSHOT_KEY = b"expense_snapshot"
+
+# per-process cache: clean_dir -> {"version": str, "df": DataFrame,
+#   "derived": {name: value}, "previous": derived values of the prior version, plus their sizes};
+#   entries are charged to the shared memory budget, which may evict them
+_cache = {}
+
+
+def _string_dtype():
+    """Arrow-backed string dtype with NaN semantics (keeps mapped buffers shared)."""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3 spells this differently
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def _types_mapper(arrow_type):
+    """Map Arrow strings to pandas string columns that reference the mapped file."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return _string_dtype()
+    if pa.types.is_fixed_size_binary(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def txn_ids_to_binary(ids):
+    """Pack 40-char hex txn ids into a 20-byte fixed-size binary column."""
+    values = ids.astype(str)
+    if len(values) and not values.str.fullmatch(r"[0-9a-f]{40}").all():
+        return ids
+    raw = bytes.fromhex("".join(values.tolist()))
+    arr = pa.FixedSizeBinaryArray.from_buffers(pa.binary(TXN_ID_BYTES), len(values), [None, pa.py_buffer(raw)])
+    return pd.Series(pd.arrays.ArrowExtensionArray(arr), index=ids.index, name=ids.name)
+
+
+def txn_id_str(value):
+    """Hex string for a txn id, whether stored packed or as text."""
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _is_text(series):
+    """True for object / string columns."""
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def compact_frame(df):
+    """Shrink the in-memory schema: categorical text, packed txn ids."""
+    out = df.copy()
+    for col in out.columns:
+        series = out[col]
+        if col == "txn_id" and _is_text(series):
+            out[col] = txn_ids_to_binary(series)
+        elif _is_text(series):
+            if col in CATEGORICAL_COLUMNS or series.nunique() <= CATEGORICAL_MAX_UNIQUE_RATIO * max(len(series), 1):
+                out[col] = series.astype("category")
+    return out
+
+
+def memory_report(df):
+    """Bytes used by a frame, overall, per row and per column."""
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    return {
+        "rows": len(df),
+        "total_bytes": int(usage.sum()),
+        "bytes_per_row": round(float(usage.sum()) / rows, 1),
+        "by_column": {col: round(float(b) / rows, 1) for col, b in usage.sort_values(ascending=False).items()},
+    }
+
+
+def dataset_path(clean_dir=CLEAN_DIR):
+    """Path of the published Arrow file."""
+    return os.path.join(clean_dir, DATASET_FILE)
+
+
+def read_version(clean_dir=CLEAN_DIR):
+    """Return the current version stamp, or None if nothing is published."""
+    try:
+        with open(os.path.join(clean_dir, VERSION_FILE), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def sort_by_date(df):
+    """Rows in date order (stable, missing dates last) so date ranges are slices."""
+    if "date" not in df.columns:
+        return df
+    dates = df["date"]
+    head = dates.iloc[:len(dates) - int(dates.isna().sum())]
+    if head.notna().all() and head.is_monotonic_increasing:
+        return df
+    return df.sort_values("date", kind="stable", na_position="last").reset_index(drop=True)
+
+
+def month_category_totals(df, month=None):
+    """Spend, signed amount and row count per (month, category).
+
+    Pass `month` when every row belongs to that month (a partition) to skip
+    deriving it from the dates.
+    """
+    if month is not None:
+        keys = ["category"]
+    else:
+        if "month" not in df.columns:
+            df = df.assign(month=pd.to_datetime(df["date"]).dt.to_period("M").astype(str))
+        keys = ["month", "category"]
+    out = (
+        df.groupby(keys, observed=True)
+        .agg(spend=("amount_spend", "sum"), signed=("amount_signed", "sum"), count=("amount_spend", "size"))
+        .reset_index()
+    )
+    if month is not None:
+        out.insert(0, "month", month)
+    out["month"] = out["month"].astype(str)
+    out["category"] = out["category"].astype(str)
+    return out
+
+
+def publish_dataset(df, clean_dir=CLEAN_DIR, sources=None):
+    """Write categorized rows as a new snapshot, start an empty change log and bump the version.
+
+    `sources` (raw file signatures, see clean_transactions.raw_signatures)
+    lets later uploads of new statements be appended instead of re-cleaned.
+    """
+    out = df.copy()
+    if "month" not in out.columns and "date" in out.columns:
+        out["month"] = pd.to_datetime(out["date"]).dt.to_period("M").astype(str)
+    if ROW_ID not in out.columns:
+        out[ROW_ID] = np.arange(len(out), dtype=np.int64)
+    snapshot = uuid.uuid4().hex
+    write_arrow(compact_frame(sort_by_date(out)), dataset_path(clean_dir), {SNAPSHOT_KEY: snapshot})
+    if "category" in out.columns:
+        # month-level readers (forecast, monthly charts) use these instead of rows
+        write_arrow(month_category_totals(out), os.path.join(clean_dir, SUMMARY_FILE))
+    next_row_id = int(out[ROW_ID].max()) + 1 if len(out) else 0
+    ChangeLog(clean_dir).reset(snapshot, next_row_id, len(out), sources)
+    return _bump_version(clean_dir)
+
+
+def _bump_version(clean_dir):
+    version = uuid.uuid4().hex
+    write_text_atomic(version, os.path.join(clean_dir, VERSION_FILE))
+    return version
+
+
+def _update_summary(clean_dir, added=None, removed=None):
+    """Adjust the month x category totals by the rows a logged change added / took away."""
+    path = os.path.join(clean_dir, SUMMARY_FILE)
+    parts = [map_arrow(path).astype({"month": object, "category": object})] if os.path.exists(path) else []
+    if added is not None and len(added):
+        parts.append(month_category_totals(added))
+    if removed is not None and len(removed):
+        parts.append(month_category_totals(removed).assign(
+            spend=lambda t: -t["spend"], signed=lambda t: -t["signed"], count=lambda t: -t["count"]))
+    if not parts:
+        return
+    totals = pd.concat(parts, ignore_index=True).groupby(["month", "category"], as_index=False).sum()
+    write_arrow(totals[totals["count"] != 0].reset_index(drop=True), path)
+
+
+def log_rows(df, clean_dir=CLEAN_DIR, sources=None):
+    """Append newly categorized transactions to the change log (O(new rows) written)."""
+    out = df.copy()
+    if "month" not in out.columns and "date" in out.columns:
+        out["month"] = pd.to_datetime(out["date"]).dt.to_period("M").astype(str)
+    out = ChangeLog(clean_dir).append_rows(compact_frame(out), sources)
+    _update_summary(clean_dir, added=out)
+    _bump_version(clean_dir)
+    return len(out)
+
+
+def log_assignments(old, new, clean_dir=CLEAN_DIR):
+    """Log the rows whose category differs between `old` and `new` (same rows, same order).
+
+    Returns how many changed; nothing is written (and the version stays) when none did.
+    """
+    changed = np.zeros(len(new), dtype=bool)
+    for col in ("category", "category_source"):
+        changed |= old[col].to_numpy(dtype=object) != new[col].to_numpy(dtype=object)
+    if not changed.any():
+        return 0
+    after = new[changed]
+    ChangeLog(clean_dir).assign(after[ROW_ID], after["category"], after["category_source"])
+    _update_summary(clean_dir, added=after, removed=old[changed])
+    _bump_version(clean_dir)
+    return int(changed.sum())
+
+
+def needs_compaction(clean_dir=CLEAN_DIR):
+    """True once the change log is big enough that the writer should publish a new snapshot."""
+    return ChangeLog(clean_dir).needs_compaction()
+
+
+def drop_dataset(clean_dir=CLEAN_DIR):
+    """Remove the published dataset (e.g. when the last raw file is deleted)."""
+    for name in (DATASET_FILE, VERSION_FILE, SUMMARY_FILE):
+        path = os.path.join(clean_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    ChangeLog(clean_dir).drop()
+    _cache.pop(clean_dir, None)
+    budget.forget("dataset", clean_dir)
+
+
+def map_arrow(path, columns=None):
+    """Memory-map an Arrow file and wrap it in a DataFrame without copying."""
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if columns is not None:
+        # the pandas metadata still describes dropped columns, which confuses to_pandas
+        table = table.select([c for c in columns if c in table.column_names]).replace_schema_metadata(None)
+    return table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
+
+
+def write_arrow(df, path, metadata=None):
+    """Write a frame as an uncompressed (mappable) Arrow file, atomically."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**table.schema.metadata, **metadata})
+    with atomic_path(path) as tmp:
+        # uncompressed so readers can map the buffers instead of decoding them
+        feather.write_feather(table, tmp, compression="uncompressed")
+
+
+def _snapshot_id(path):
+    metadata = pa.ipc.open_file(pa.memory_map(path, "r")).schema.metadata or {}
+    value = metadata.get(SNAPSHOT_KEY)
+    return value.decode() if value else None
+
+
+def _map_dataset(clean_dir):
+    """Memory-map the published snapshot and replay the change log on top."""
+    path = dataset_path(clean_dir)
+    df = ChangeLog(clean_dir).replay(map_arrow(path), _snapshot_id(path), map_arrow)
+    # files published before rows were kept in date order get sorted once here
+    return sort_by_date(df)
+
+
+def _read_csv(clean_dir):
+    """Load the categorized CSV (pre-Arrow layout)."""
+    path = os.path.join(clean_dir, CSV_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError("run categorize first")
+    df = pd.read_csv(path, parse_dates=["date"])
+    if "amount_spend" not in df.columns:
+        df["amount_spend"] = df.get("amount", 0.0)
+    return df
+
+
+def load_dataset(clean_dir=CLEAN_DIR):
+    """Return the categorized dataset, re-mapping only when the version changes.
+
+    The returned frame is shared by every caller in this process; filter or
+    copy it, never assign into it.
+    """
+    return _entry(clean_dir)["df"]
+
+
+def _charge(clean_dir, entry):
+    """Charge a cache entry (frame, derived values and the prior version's) to the memory budget."""
+    def evict():
+        if _cache.get(clean_dir) is entry:
+            del _cache[clean_dir]
+    size = entry["df_bytes"] + sum(entry["sizes"].values()) + sum(entry["previous_sizes"].values())
+    budget.charge("dataset", clean_dir, size, evict)
+
+
+def _entry(clean_dir):
+    """The cache entry for the current dataset version, mapping it first if needed."""
+    version = read_version(clean_dir)
+    if version is None or not os.path.exists(dataset_path(clean_dir)):
+        # older layout: only the CSV exists, publish it once for everyone
+        publish_dataset(_read_csv(clean_dir), clean_dir)
+        version = read_version(clean_dir)
+
+    cached = _cache.get(clean_dir)
+    cache_access("dataset", cached is not None and cached["version"] == version)
+    if cached and cached["version"] == version:
+        budget.touch("dataset", clean_dir)
+        return cached
+
+    with stage("load"):
+        df = _map_dataset(clean_dir)
+    entry = {"version": version, "df": df, "derived": {}, "sizes": {}, "df_bytes": nbytes(df),
+             "previous": cached["derived"] if cached else {}, "previous_sizes": cached["sizes"] if cached else {}}
+    _cache[clean_dir] = entry
+    _charge(clean_dir, entry)
+    return entry
+
+
+def derived(name, build, clean_dir=CLEAN_DIR):
+    """Cache `build(df, previous)` for the current dataset version.
+
+    `previous` is the value built for the prior version (or None), so
+    builders such as search indexes can update instead of starting over.
+    """
+    entry = _entry(clean_dir)
+    cache_access(name, name in entry["derived"])
+    if name not in entry["derived"]:
+        with stage(f"build:{name}"):
+            value = build(entry["df"], entry["previous"].pop(name, None))
+        entry["previous_sizes"].pop(name, None)
+        entry["derived"][name], entry["sizes"][name] = value, nbytes(value)
+        _charge(clean_dir, entry)
+    return entry["derived"][name]
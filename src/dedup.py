@@ -0,0 +1,217 @@
+"""Duplicate and overlapping-statement detection at ingest.
+
+Uploading the same month twice, or the same card from two exporters,
+would otherwise double every total. Rows are indexed by a hash key of
+(date, signed amount in cents, normalized description) and numbered per
+source, so a transaction that several sources report k times is kept k
+times (the most any one statement shows), never the sum. Repeats inside
+one statement (two coffees on the same day) are real and always kept.
+
+Rows left unpaired by the exact key are compared with rapidfuzz only
+inside their (date, amount) bucket, against rows of other sources, which
+catches exporters that spell the merchant differently. Everything runs on
+hash groupings in O(n); only the near-duplicate buckets loop in Python.
+"""
+
+import os
+import json
+import time
+from collections import Counter
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz
+
+from src.atomic_io import write_json_atomic
+from src.metrics import stage
+from src.normalize import NORM_CACHE_PATH, normalize_descriptions
+
+DEDUP_ENABLED = os.environ.get("EXPENSE_DEDUP", "1").lower() not in ("0", "false", "no")
+# token_set_ratio score (0-100) at which two same-day, same-amount descriptions are one transaction
+SIMILARITY = float(os.environ.get("EXPENSE_DEDUP_SIMILARITY", 90))
+REPORT_FILE = "dedup_report.json"
+# merged pairs kept in the report as examples
+SAMPLES = 50
+
+
+class DedupReport:
+    """What dedup merged: counts per kind and per (kept, dropped) source pair, plus examples."""
+
+    def __init__(self):
+        self.rows_in = 0
+        self.exact = 0
+        self.near = 0
+        self.seconds = 0.0
+        self.pairs = Counter()      # (kept source, dropped source, kind) -> rows
+        self.samples = []
+
+    @property
+    def dropped(self):
+        return self.exact + self.near
+
+    def add(self, kind, kept, dropped, score=100.0):
+        """Record the rows of frame `dropped` merged into rows of frame `kept`."""
+        if kind == "exact":
+            self.exact += len(dropped)
+        else:
+            self.near += len(dropped)
+        pairs = pd.DataFrame({"kept": kept["source"].to_numpy(dtype=object),
+                              "dropped": dropped["source"].to_numpy(dtype=object)}).value_counts()
+        self.pairs.update({(k, d, kind): int(n) for (k, d), n in pairs.items()})
+        room = SAMPLES - len(self.samples)
+        for k, d, s in zip(kept.head(room).itertuples(), dropped.head(room).itertuples(), np.broadcast_to(score, len(dropped))):
+            self.samples.append({
+                "date": pd.Timestamp(k.date).strftime("%Y-%m-%d"), "amount": float(k.amount_signed), "match": kind,
+                "score": round(float(s), 1), "kept_source": k.source, "kept_description": k.description,
+                "dropped_source": d.source, "dropped_description": d.description,
+            })
+
+    def to_dict(self):
+        sources = {}
+        for (kept, dropped, kind), n in self.pairs.items():
+            entry = sources.setdefault((kept, dropped), {"kept": kept, "dropped": dropped, "exact": 0, "near": 0})
+            entry[kind] += n
+        return {
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_in - self.dropped,
+            "dropped": self.dropped,
+            "exact": self.exact,
+            "near": self.near,
+            "similarity": SIMILARITY,
+            "ms": round(1000 * self.seconds, 3),
+            "sources": sorted(sources.values(), key=lambda e: -(e["exact"] + e["near"])),
+            "samples": self.samples,
+        }
+
+
+def duplicate_rows(df, report=None, norm_cache=NORM_CACHE_PATH):
+    """Boolean array: True for rows of `df` that duplicate an earlier row from another source.
+
+    `df` needs date, amount_signed, description and source; earlier rows
+    (in frame order) are the ones kept. All False with EXPENSE_DEDUP=0.
+    `norm_cache` is the tenant's normalization cache (see normalize_descriptions).
+    """
+    if not DEDUP_ENABLED or df.empty:
+        return np.zeros(len(df), dtype=bool)
+    started = time.perf_counter()
+    with stage("clean:dedup"):
+        drop = _duplicate_rows(df, report, norm_cache)
+    if report is not None:
+        report.rows_in += len(df)
+        report.seconds += time.perf_counter() - started
+    return drop
+
+
+def _duplicate_rows(df, report, norm_cache):
+    day = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    cents = np.round(df["amount_signed"].to_numpy(dtype=float) * 100).astype(np.int64)
+    norm, _ = normalize_descriptions(df["description"], norm_cache)
+    norm_code, norms = pd.factorize(norm)
+    source = pd.factorize(df["source"].astype(str))[0]
+
+    keys = pd.DataFrame({"day": day, "cents": cents, "norm": norm_code, "source": source})
+    # k-th occurrence of a key within its source pairs with the k-th occurrence in every other source
+    keys["occ"] = keys.groupby(["day", "cents", "norm", "source"], sort=False).cumcount()
+    group = keys.groupby(["day", "cents", "norm", "occ"], sort=False).ngroup().to_numpy()
+    drop = pd.Series(group).duplicated().to_numpy(copy=True)
+    # groups are numbered in order of first appearance, so this maps group -> kept row
+    kept_row = np.flatnonzero(~drop)[group]
+    if report is not None and drop.any():
+        report.add("exact", df.iloc[kept_row[drop]], df.iloc[np.flatnonzero(drop)])
+
+    # near duplicates: only (date, amount) buckets holding several sources and several descriptions
+    buckets = keys.groupby(["day", "cents"], sort=False)
+    spans = (buckets["source"].transform("nunique").to_numpy() > 1) & (buckets["norm"].transform("nunique").to_numpy() > 1)
+    if spans.any():
+        keys["group"] = group
+        _near_duplicates(keys[spans], norms, df, drop, report)
+    return drop
+
+
+def _near_duplicates(rows, norms, df, drop, report):
+    """Mark kept rows whose description closely matches another source's kept row in the same bucket."""
+    bucket = rows.groupby(["day", "cents"], sort=False).ngroup().to_numpy()
+    order = np.argsort(bucket, kind="stable")
+    index, norm, group, source = (rows.index.to_numpy()[order], rows["norm"].to_numpy()[order],
+                                  rows["group"].to_numpy()[order], rows["source"].to_numpy()[order])
+    bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+    scores = {}
+    kept, dropped, matched = [], [], []
+    for lo, hi in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(order)].tolist()):
+        # sources already merged into each exact group
+        sources = {}
+        for g, src in zip(group[lo:hi].tolist(), source[lo:hi].tolist()):
+            sources.setdefault(g, set()).add(src)
+        # each cluster is one transaction: (first row, its norm code, sources it covers)
+        clusters = []
+        for i, code, g in zip(index[lo:hi].tolist(), norm[lo:hi].tolist(), group[lo:hi].tolist()):
+            if drop[i]:
+                continue
+            for first, first_code, covered in clusters:
+                if covered & sources[g]:
+                    continue
+                pair = (first_code, code)
+                if pair not in scores:
+                    scores[pair] = fuzz.token_set_ratio(norms[first_code], norms[code])
+                if scores[pair] >= SIMILARITY:
+                    covered |= sources[g]
+                    kept.append(first)
+                    dropped.append(i)
+                    matched.append(scores[pair])
+                    break
+            else:
+                clusters.append((i, code, set(sources[g])))
+    drop[dropped] = True
+    if report is not None and dropped:
+        report.add("near", df.iloc[kept], df.iloc[dropped], np.array(matched))
+
+
+def duplicate_new_rows(existing, new, report=None, norm_cache=NORM_CACHE_PATH):
+    """Boolean array over `new`: rows duplicating a row of `existing` (already deduplicated) or an earlier new row."""
+    cols = ["date", "amount_signed", "description", "source"]
+    both = pd.concat([existing[cols].astype({"description": object, "source": object}), new[cols]], ignore_index=True)
+    drop = duplicate_rows(both, report, norm_cache)[len(existing):]
+    if report is not None and DEDUP_ENABLED:
+        report.rows_in -= len(existing)
+    return drop
+
+
+def dedup_frame(df, report=None, norm_cache=NORM_CACHE_PATH):
+    """`df` without cross-source duplicates (index reset)."""
+    drop = duplicate_rows(df, report, norm_cache)
+    if not drop.any():
+        return df
+    return df[~drop].reset_index(drop=True)
+
+
+def save_report(report, clean_dir):
+    """Write a clean run's DedupReport next to the clean store and log a summary line."""
+    data = report.to_dict()
+    data["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    path = write_json_atomic(data, os.path.join(clean_dir, REPORT_FILE))
+    if report.dropped:
+        print(f"Merged {report.dropped} duplicate rows ({report.exact} exact, {report.near} near); see {path}")
+    return path
+
+
+def load_report(clean_dir):
+    """Report of the last clean run, or None before the first one (or with dedup off)."""
+    try:
+        with open(os.path.join(clean_dir, REPORT_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def format_report(data):
+    """Plain-text summary of load_report() output for the command line."""
+    lines = [f"{data['rows_in']:,} rows in, {data['rows_out']:,} kept: {data['exact']:,} exact and "
+             f"{data['near']:,} near duplicates merged in {data['ms'] / 1000:.2f} s"]
+    if data["sources"]:
+        lines += ["", f"{'kept source':<24} {'dropped source':<24} {'exact':>9} {'near':>7}"]
+        lines += [f"{e['kept']:<24} {e['dropped']:<24} {e['exact']:>9,} {e['near']:>7,}" for e in data["sources"]]
+    if data["samples"]:
+        lines += ["", "examples:"]
+        lines += [f"  {x['date']} {x['amount']:>10.2f}  {x['match']:<5} {x['kept_description']!r} "
+                  f"({x['kept_source']}) <- {x['dropped_description']!r} ({x['dropped_source']})"
+                  for x in data["samples"][:10]]
+    return "\n".join(lines)
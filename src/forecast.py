@@ -44,12 +44,16 @@ def forecast_by_category(df, months_lookback=3):
     
     # group by category and month
     monthly_by_cat = (
-        df_recent.groupby(["category", "year_month"])["amount_spend"]
+        df_recent.groupby(["category", "year_month"], observed=True)["amount_spend"]
         .sum()
         .reset_index()
         .rename(columns={"amount_spend": "monthly_total"})
     )
-    
+    return _category_stats(monthly_by_cat)
+
+
+def _category_stats(monthly_by_cat):
+    """Per-category forecast from (category, monthly_total) rows."""
     # calculate stats for each category
     results = []
     for cat in monthly_by_cat["category"].unique():
@@ -100,15 +104,18 @@ def forecast_total_spend(df, months_lookback=3):
         .rename(columns={"amount_spend": "monthly_total"})
     )
     
-    monthly_totals = monthly_totals.tail(months_lookback)
-    
+    return _total_stats(monthly_totals["monthly_total"].tail(months_lookback))
+
+
+def _total_stats(monthly_totals):
+    """Total forecast from the lookback window's monthly totals."""
     if len(monthly_totals) == 0:
         return {}
     
     # remove outliers
-    totals_clean = remove_outliers(monthly_totals["monthly_total"], multiplier=1.5)
+    totals_clean = remove_outliers(monthly_totals, multiplier=1.5)
     if len(totals_clean) == 0:
-        totals_clean = monthly_totals["monthly_total"]
+        totals_clean = monthly_totals
     
     avg = float(totals_clean.mean())
     std = float(totals_clean.std()) if len(totals_clean) > 1 else 0.0
@@ -122,3 +129,28 @@ def forecast_total_spend(df, months_lookback=3):
         "confidence_high": avg + std,
         "num_months": len(totals_clean),
     }
+
+
+def forecast_total_from_summary(summary, months_lookback=3):
+    """forecast_total_spend from month x category totals (see src/summaries.py)."""
+    summary = summary[summary["category"] != "Transfer"]
+    if summary.empty:
+        return {}
+    monthly_totals = summary.groupby("month")["spend"].sum().sort_index()
+    return _total_stats(monthly_totals.tail(months_lookback).reset_index(drop=True))
+
+
+def forecast_by_category_from_summary(summary, months_lookback=3):
+    """forecast_by_category from month x category totals; reads only the lookback months."""
+    summary = summary[summary["category"] != "Transfer"]
+    recent_months = sorted(summary["month"].unique())[-months_lookback:]
+    if not recent_months:
+        return pd.DataFrame()
+    recent = summary[summary["month"].isin(recent_months)]
+    monthly_by_cat = (
+        recent.rename(columns={"month": "year_month", "spend": "monthly_total"})
+        .sort_values(["category", "year_month"])
+        [["category", "year_month", "monthly_total"]]
+        .reset_index(drop=True)
+    )
+    return _category_stats(monthly_by_cat)
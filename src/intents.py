@@ -0,0 +1,350 @@
+"""Local answers for common spending questions, tried before the LLM.
+
+Questions such as "how much did I spend on dining last month" or "top 5
+merchants this year" are parsed into an intent (what to compute), an
+optional category or merchant, and a date range, then answered from the
+row indexes and month summaries in milliseconds. Anything open-ended
+("why", "should I", advice) or not fully understood returns None so the
+caller falls back to the LLM.
+
+Relative periods ("this month", "last year", "last 30 days") count back
+from the latest transaction, so an old statement still gets sensible
+answers.
+"""
+
+import os
+import re
+import time
+import threading
+import calendar
+import pandas as pd
+
+from src.dataset import CLEAN_DIR, derived
+from src.normalize import clean_string
+from src.partitions import OUT_OF_CORE, categorized_store
+from src.row_index import select_rows
+from src.search_index import dataset_search_index
+from src.summaries import monthly_summary
+from src.metrics import stage
+from src.categorize_transactions import BANK_CAT_MAP
+
+# set EXPENSE_CHAT_INTENTS=0 to send every question to the LLM
+INTENTS_ENABLED = os.environ.get("EXPENSE_CHAT_INTENTS", "1").lower() not in ("0", "false", "no")
+
+NOT_SPEND = ("EXCLUDE", "Income")
+
+# questions asking for judgement rather than numbers go to the LLM
+OPEN_ENDED = re.compile(
+    r"\b(why|should|could|would|advice|advise|tips?|recommend\w*|suggest\w*|save|saving|budget\w*|"
+    r"compare|compared|vs|versus|trend\w*|explain|improve|reduce|cut|habits?|forecast|predict\w*)\b"
+)
+INTENTS = [
+    ("largest_transactions", re.compile(
+        r"\b(largest|biggest|most expensive|highest)\b.*\b(transactions?|purchases?|expenses?|charges?|payments?)\b")),
+    ("top_merchants", re.compile(r"\b(top|biggest|most)\b.*\b(merchants?|stores?|shops?|places|vendors?)\b")),
+    ("top_categories", re.compile(
+        r"\b(top|biggest|largest|main)\b.*\bcategor(y|ies)\b|\bcategory breakdown\b|"
+        r"\bbreak ?down\b|\bwhere did (all )?my money go\b")),
+    ("transaction_count", re.compile(r"\bhow many\b.*\b(transactions?|purchases?|charges?|payments?)\b")),
+    ("monthly_average", re.compile(r"\b(average|avg|typical)\b.*\bmonth(ly)?\b|\bper month\b|\ba month\b")),
+    ("income", re.compile(r"\b(income|earn|earned|salary|paychecks?|deposits?)\b")),
+    ("spend", re.compile(r"\bhow much\b|\btotal (spend|spending|spent|expenses)\b|\bwhat did i spend\b")),
+]
+# phrase ends: a period ("in March", "last month"), another phrase or the end of the question
+_PHRASE_END = r"(?=\s+(?:in|during|this|last|past|since|over|for|between|so far|year|month|at|from|on|with)\b|$)"
+# "at Starbucks", "from amazon": always a merchant
+MERCHANT_PHRASE = re.compile(r"\b(?:at|from)\s+(.+?)" + _PHRASE_END)
+# "on coffee": a category, or a merchant when it isn't one
+SUBJECT_PHRASE = re.compile(r"\b(?:on|with)\s+(.+?)" + _PHRASE_END)
+# phrases after "at" / "on" that name neither a merchant nor a category
+NOT_SUBJECT = re.compile(r"(?:all|everything|total|(?:a|each|per) month|(?:average|this|last|past|previous)\b.*)")
+# intents that can be narrowed to one merchant
+MERCHANT_INTENTS = ("spend", "transaction_count", "largest_transactions", "monthly_average")
+MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_name) if m}
+MONTHS.update({m.lower(): i for i, m in enumerate(calendar.month_abbr) if m})
+MONTH_PHRASE = re.compile(r"\b(?:in|for|during|of|since)\s+(" + "|".join(MONTHS) + r")\b(?:\s+(\d{4}))?")
+YEAR_PHRASE = re.compile(r"\b(?:in|for|during|of)\s+(\d{4})\b")
+LAST_N = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b")
+TOP_N = re.compile(r"\btop\s+(\d+)\b")
+
+
+class IntentStats:
+    """How many chat questions were answered locally, by intent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.local = 0
+        self.local_s = 0.0
+        self.by_intent = {}
+
+    def record(self, intent=None, elapsed=0.0):
+        with self._lock:
+            self.questions += 1
+            if intent is not None:
+                self.local += 1
+                self.local_s += elapsed
+                self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "questions": self.questions,
+                "answered_locally": self.local,
+                "local_hit_rate": round(self.local / self.questions, 4) if self.questions else 0.0,
+                "avg_local_ms": round(1000 * self.local_s / max(self.local, 1), 3),
+                "by_intent": dict(self.by_intent),
+            }
+
+
+stats = IntentStats()
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+def latest_date(clean_dir=CLEAN_DIR):
+    """Date of the most recent transaction (anchor for relative periods)."""
+    if OUT_OF_CORE:
+        dates = [p["max_date"] for p in categorized_store(clean_dir).manifest()["partitions"].values() if p["max_date"]]
+        return pd.Timestamp(max(dates)) if dates else None
+    latest = derived("latest_date", lambda df, previous: df["date"].max(), clean_dir)
+    return None if pd.isna(latest) else pd.Timestamp(latest)
+
+
+def resolve_period(text, anchor):
+    """(start, end) Timestamps for a period named in `text`, or None."""
+    if anchor is None:
+        return None
+    anchor = anchor.normalize()
+    month_start = anchor.replace(day=1)
+    if re.search(r"\bthis month\b|\bmonth to date\b", text):
+        return month_start, anchor
+    if re.search(r"\b(last|previous|past) month\b", text):
+        start = month_start - pd.DateOffset(months=1)
+        return start, month_start - pd.Timedelta(days=1)
+    if re.search(r"\bthis year\b|\bytd\b|\byear to date\b", text):
+        return anchor.replace(month=1, day=1), anchor
+    if re.search(r"\b(last|previous|past) year\b", text):
+        start = anchor.replace(year=anchor.year - 1, month=1, day=1)
+        return start, start.replace(month=12, day=31)
+    if re.search(r"\b(last|past) week\b", text):
+        return anchor - pd.Timedelta(days=6), anchor
+    m = LAST_N.search(text)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        offset = pd.DateOffset(**{unit + "s": n})
+        return anchor - offset + pd.Timedelta(days=1), anchor
+    m = MONTH_PHRASE.search(text)
+    if m:
+        month = MONTHS[m.group(1)]
+        year = int(m.group(2)) if m.group(2) else (anchor.year if month <= anchor.month else anchor.year - 1)
+        start = pd.Timestamp(year=year, month=month, day=1)
+        return start, start + pd.offsets.MonthEnd(0)
+    m = YEAR_PHRASE.search(text)
+    if m:
+        year = int(m.group(1))
+        return pd.Timestamp(year=year, month=1, day=1), pd.Timestamp(year=year, month=12, day=31)
+    return None
+
+
+def describe_period(start, end):
+    """"in March 2025", "in 2024", "from 2025-01-05 to 2025-02-03" or "across all your data"."""
+    if start is None and end is None:
+        return "across all your data"
+    start, end = pd.Timestamp(start) if start else None, pd.Timestamp(end) if end else None
+    if start is not None and end is not None:
+        if start.day == 1 and end == start + pd.offsets.MonthEnd(0):
+            return f"in {start.strftime('%B %Y')}"
+        if (start.month, start.day, end.month, end.day) == (1, 1, 12, 31) and start.year == end.year:
+            return f"in {start.year}"
+        return f"from {start.date()} to {end.date()}"
+    return f"since {start.date()}" if start is not None else f"up to {end.date()}"
+
+
+def category_aliases(categories):
+    """Cleaned category name (and singular) -> category for the categories present in the data."""
+    aliases = {}
+    for category in categories:
+        name = clean_string(category)
+        aliases[name] = category
+        if name.endswith("ies"):
+            aliases[name[:-3] + "y"] = category
+        elif name.endswith("s"):
+            aliases[name[:-1]] = category
+    return aliases
+
+
+def category_synonyms(categories):
+    """Bank category phrases ("restaurants", "gas", ...) -> category, for the categories present.
+
+    Only whole phrases count ("spend on gas"): words like "home" or "gas"
+    are also parts of merchant names ("home depot", "gas station").
+    """
+    return {phrase: category for phrase, category in BANK_CAT_MAP.items() if category in categories}
+
+
+def match_category(text, aliases):
+    """Category whose name or synonym appears in `text` (longest phrase wins)."""
+    for phrase in sorted(aliases, key=len, reverse=True):
+        if re.search(r"\b" + re.escape(phrase) + r"\b", text):
+            return aliases[phrase]
+    return None
+
+
+def parse(question, categories, anchor):
+    """{"intent", "category", "merchant", "n", "period"} for a question, or None."""
+    text = clean_string(question)
+    if OPEN_ENDED.search(text):
+        return None
+    intent = next((name for name, pattern in INTENTS if pattern.search(text)), None)
+    if intent is None:
+        return None
+    # the merchant comes first: "at home depot" names no category
+    merchant, subject = _phrase(MERCHANT_PHRASE, text), _phrase(SUBJECT_PHRASE, text)
+    aliases = category_aliases(categories)
+    category = match_category(SUBJECT_PHRASE.sub(" ", MERCHANT_PHRASE.sub(" ", text)), aliases)
+    if subject:
+        # "on coffee" is a category only as a whole phrase, else a merchant ("on home depot")
+        named = aliases.get(subject) or category_synonyms(categories).get(subject)
+        if named:
+            category = named
+        elif merchant is None:
+            merchant = subject
+        else:
+            return None
+    if merchant and (category or intent not in MERCHANT_INTENTS):
+        # "spend on dining at starbucks", "top categories at amazon": leave it to the LLM
+        return None
+    m = TOP_N.search(text)
+    return {
+        "intent": intent,
+        "category": category,
+        "merchant": merchant,
+        "n": max(1, min(int(m.group(1)), 50)) if m else 5,
+        "period": resolve_period(text, anchor),
+    }
+
+
+def _phrase(pattern, text):
+    """The merchant / subject phrase `pattern` finds in `text`, or None."""
+    m = pattern.search(text)
+    if not m:
+        return None
+    phrase = m.group(1).strip()
+    return None if NOT_SUBJECT.fullmatch(phrase) else phrase
+
+
+def _expenses(df):
+    return df[~df["category"].isin(NOT_SPEND)]
+
+
+def _rows(parsed, start, end, clean_dir):
+    """Rows for the parsed filters, or None when the merchant is unknown."""
+    rows = None
+    if parsed["merchant"]:
+        index = dataset_search_index("merchant", clean_dir)
+        if not index.suggest(parsed["merchant"], limit=1):
+            return None
+        rows = index.search(parsed["merchant"])
+    return select_rows(start, end, category=parsed["category"], rows=rows, clean_dir=clean_dir)
+
+
+def _subject(parsed):
+    if parsed["category"]:
+        return f" on {parsed['category']}"
+    if parsed["merchant"]:
+        return f" at {parsed['merchant']}"
+    return ""
+
+
+def _answer(parsed, start, end, clean_dir):
+    """Answer text for a parsed question, or None to fall back to the LLM."""
+    when = describe_period(start, end)
+    intent = parsed["intent"]
+
+    if intent == "monthly_average":
+        if parsed["merchant"]:
+            return None
+        summary = monthly_summary(clean_dir)
+        summary = summary[~summary["category"].isin(NOT_SPEND)]
+        if parsed["category"]:
+            summary = summary[summary["category"] == parsed["category"]]
+        if start is not None:
+            summary = summary[summary["month"] >= pd.Timestamp(start).strftime("%Y-%m")]
+        if end is not None:
+            summary = summary[summary["month"] <= pd.Timestamp(end).strftime("%Y-%m")]
+        by_month = summary.groupby("month")["spend"].sum()
+        if by_month.empty:
+            return f"I found no spending{_subject(parsed)} {when}."
+        return (f"You spent an average of {_money(by_month.mean())} per month{_subject(parsed)} {when} "
+                f"(over {len(by_month)} month{'s' if len(by_month) != 1 else ''}).")
+
+    df = _rows(parsed, start, end, clean_dir)
+    if df is None:
+        return None
+
+    if intent == "income":
+        if parsed["category"] or parsed["merchant"]:
+            return None
+        income = df[df["category"] == "Income"]["amount_signed"].sum()
+        return f"Your income {when} was {_money(income)} across {int((df['category'] == 'Income').sum())} deposits."
+
+    spend = _expenses(df)
+    if intent == "spend":
+        return f"You spent {_money(spend['amount_spend'].sum())}{_subject(parsed)} {when} across {len(spend)} transactions."
+    if intent == "transaction_count":
+        return f"You made {len(spend)} transactions{_subject(parsed)} {when}, totalling {_money(spend['amount_spend'].sum())}."
+    if intent == "top_merchants":
+        top = spend.groupby("merchant", observed=True)["amount_spend"].sum().nlargest(parsed["n"])
+        if top.empty:
+            return f"I found no spending{_subject(parsed)} {when}."
+        lines = [f"{i}. {name}: {_money(amount)}" for i, (name, amount) in enumerate(top.items(), 1)]
+        return f"Your top {len(top)} merchants{_subject(parsed)} {when}:\n" + "\n".join(lines)
+    if intent == "top_categories":
+        totals = spend.groupby("category", observed=True)["amount_spend"].sum().sort_values(ascending=False)
+        totals = totals[totals > 0]
+        if totals.empty:
+            return f"I found no spending {when}."
+        grand = totals.sum()
+        lines = [f"{i}. {name}: {_money(amount)} ({100 * amount / grand:.1f}%)"
+                 for i, (name, amount) in enumerate(totals.head(parsed["n"]).items(), 1)]
+        return f"Your spending by category {when} ({_money(grand)} total):\n" + "\n".join(lines)
+    if intent == "largest_transactions":
+        top = spend.nlargest(parsed["n"], "amount_spend")
+        if top.empty:
+            return f"I found no spending{_subject(parsed)} {when}."
+        lines = [f"{i}. {row.date:%Y-%m-%d} {row.description}: {_money(row.amount_spend)}"
+                 for i, row in enumerate(top.itertuples(), 1)]
+        return f"Your largest transactions{_subject(parsed)} {when}:\n" + "\n".join(lines)
+    return None
+
+
+def answer_locally(question, start_date=None, end_date=None, clean_dir=CLEAN_DIR):
+    """{"answer", "intent", "timings"} when the question has a local answer, else None.
+
+    A period in the question wins over the request's date range; without
+    one the range applies when both ends are given (as for the LLM prompt).
+    """
+    if not INTENTS_ENABLED:
+        return None
+    started = time.perf_counter()
+    try:
+        categories = monthly_summary(clean_dir)["category"].unique()
+        parsed = parse(question, [c for c in categories if c not in NOT_SPEND], latest_date(clean_dir))
+        if parsed is None:
+            stats.record()
+            return None
+        start, end = parsed["period"] or ((start_date, end_date) if start_date and end_date else (None, None))
+        with stage("aggregate"):
+            text = _answer(parsed, start, end, clean_dir)
+    except Exception as e:
+        print(f"Intent engine error, using LLM: {type(e).__name__}: {e}")
+        text = None
+    elapsed = time.perf_counter() - started
+    if text is None:
+        stats.record()
+        return None
+    stats.record(parsed["intent"], elapsed)
+    return {"answer": text, "intent": parsed["intent"], "timings": {"local_ms": round(1000 * elapsed, 3)}}
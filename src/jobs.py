@@ -0,0 +1,161 @@
+"""Background job queue for uploads, re-categorization and chat answers, with pollable status."""
+
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.atomic_io import write_json_atomic
+from src.progress import Progress
+
+STAGES = ("parse", "clean", "categorize", "persist")
+JOB_TTL_SECONDS = 24 * 3600
+
+
+class Job(Progress):
+    """One queued unit of work; its status is mirrored to a JSON file."""
+
+    def __init__(self, kind, jobs_dir, stages=STAGES):
+        self.id = uuid.uuid4().hex
+        self.jobs_dir = jobs_dir
+        self._path = os.path.join(jobs_dir, f"{self.id}.json")
+        self._lock = threading.Lock()
+        self.state = {
+            "id": self.id,
+            "kind": kind,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_s": None,
+            "stages": {
+                name: {"status": "pending", "done": 0, "total": None, "seconds": 0.0}
+                for name in stages
+            },
+            "result": None,
+            "error": None,
+        }
+
+    def stage_started(self, name, total=None):
+        with self._lock:
+            st = self.state["stages"].setdefault(
+                name, {"status": "pending", "done": 0, "total": None, "seconds": 0.0}
+            )
+            st["status"] = "running"
+            if total is not None:
+                st["total"] = total
+        self.save()
+
+    def stage_advanced(self, name, seconds, done=None, total=None):
+        with self._lock:
+            st = self.state["stages"][name]
+            st["seconds"] = round(st["seconds"] + seconds, 4)
+            if total is not None:
+                st["total"] = total
+            if done is not None:
+                st["done"] = done
+            if st["total"] is None or st["done"] >= st["total"]:
+                st["status"] = "done"
+        self.save()
+
+    def update(self, **fields):
+        """Set top-level fields and persist."""
+        with self._lock:
+            self.state.update(fields)
+        self.save()
+
+    def to_dict(self):
+        with self._lock:
+            return json.loads(json.dumps(self.state))
+
+    def save(self):
+        write_json_atomic(self.to_dict(), self._path)
+
+
+class JobQueue:
+    """Run jobs on a small thread pool; any worker process can read their status.
+
+    Every tenant shares the pool; `jobs_dir` (default: the queue's own)
+    picks where a job's status file lives, and jobs are only visible
+    through the directory they were submitted to.
+    """
+
+    def __init__(self, jobs_dir, max_workers=2):
+        self.jobs_dir = jobs_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="expense-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, jobs_dir=None):
+        """Queue `fn(job)`; it should return a JSON-serializable result."""
+        job = self._new(kind, jobs_dir, STAGES)
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def track(self, kind, jobs_dir=None):
+        """A running job for work done elsewhere (not on this pool); end it with complete()."""
+        job = self._new(kind, jobs_dir, ())
+        job.update(status="running", started_at=time.time())
+        return job
+
+    def complete(self, job, result=None, error=None):
+        """Record a job's outcome: `result`, or `error` (an exception) if it failed."""
+        if error is None:
+            job.update(status="succeeded", result=result)
+        else:
+            print(f"Job {job.id} failed: {type(error).__name__}: {error}")
+            job.update(status="failed", error=str(error))
+        finished = time.time()
+        job.update(finished_at=finished, duration_s=round(finished - job.state["started_at"], 4))
+
+    def _new(self, kind, jobs_dir, stages):
+        jobs_dir = jobs_dir or self.jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._prune(jobs_dir)
+        job = Job(kind, jobs_dir, stages)
+        job.save()
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job, fn):
+        job.update(status="running", started_at=time.time())
+        try:
+            result = fn(job)
+        except Exception as e:
+            self.complete(job, error=e)
+        else:
+            self.complete(job, result)
+
+    def get(self, job_id, jobs_dir=None):
+        """Status dict for a job, or None; falls back to disk for other workers' jobs."""
+        jobs_dir = jobs_dir or self.jobs_dir
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.jobs_dir == jobs_dir:
+            return job.to_dict()
+        if not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        path = os.path.join(jobs_dir, f"{job_id}.json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _prune(self, jobs_dir):
+        """Forget finished jobs older than the TTL (status files: in `jobs_dir`)."""
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job.state["finished_at"] and job.state["finished_at"] < cutoff:
+                    del self._jobs[job_id]
+        for name in os.listdir(jobs_dir):
+            path = os.path.join(jobs_dir, name)
+            try:
+                if name.endswith(".json") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,110 @@
+"""One memory budget shared by every tenant's in-process caches.
+
+Caches keyed by a data directory (each dataset and what is derived from it,
+mapped month partitions, partition search indexes, learned models) charge
+each entry here with its approximate size. Once the total passes
+EXPENSE_CACHE_BUDGET_MB, the least recently used entries are evicted,
+whichever tenant they belong to. A worker serving many tenants therefore
+keeps a hot working set in memory and holds at most the budget, plus the
+entry currently in use. Evicted entries are simply rebuilt (re-mapped) on
+their next use.
+"""
+
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+import pandas as pd
+
+BUDGET_MB = float(os.environ.get("EXPENSE_CACHE_BUDGET_MB", 2048))
+# containers bigger than this are sized from a sample of their items
+SAMPLE = 256
+
+
+class MemoryBudget:
+    """LRU accounting of cache entries across caches; evicts the oldest entries over the limit."""
+
+    def __init__(self, limit_bytes):
+        self.limit = int(limit_bytes)
+        self._entries = OrderedDict()  # (cache, key) -> (bytes, evict)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = Counter()     # cache -> entries evicted
+        self.evicted_bytes = 0
+
+    def charge(self, cache, key, nbytes, evict):
+        """Record entry `key` of `cache` as just used and `nbytes` big, then enforce the limit.
+
+        `evict()` removes the entry from its cache; it runs under the
+        budget's lock, so it must only drop references.
+        """
+        with self._lock:
+            old = self._entries.pop((cache, key), None)
+            if old:
+                self._bytes -= old[0]
+            self._entries[(cache, key)] = (int(nbytes), evict)
+            self._bytes += int(nbytes)
+            # never evict the entry just charged: its caller is about to use it
+            while self._bytes > self.limit and len(self._entries) > 1:
+                (victim, _), (size, drop) = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions[victim] += 1
+                self.evicted_bytes += size
+                drop()
+
+    def touch(self, cache, key):
+        """Mark an entry as just used (a cache hit)."""
+        with self._lock:
+            if (cache, key) in self._entries:
+                self._entries.move_to_end((cache, key))
+
+    def forget(self, cache, key):
+        """Stop accounting for an entry its cache dropped by itself."""
+        with self._lock:
+            old = self._entries.pop((cache, key), None)
+            if old:
+                self._bytes -= old[0]
+
+    def stats(self):
+        with self._lock:
+            by_cache = Counter()
+            for (cache, _), (size, _) in self._entries.items():
+                by_cache[cache] += size
+            return {
+                "limit_bytes": self.limit,
+                "bytes": self._bytes,
+                "entries": len(self._entries),
+                "bytes_by_cache": dict(by_cache),
+                "evictions": dict(self.evictions),
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+
+def nbytes(obj, depth=0):
+    """Approximate bytes held by a cached value: frames, arrays, index objects and containers of them."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=False))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))) or depth > 3:
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        items = obj.items()
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = obj
+    elif hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + nbytes(vars(obj), depth + 1)
+    else:
+        return sys.getsizeof(obj)
+    n = len(obj)
+    sample = [x for _, x in zip(range(SAMPLE), items)]
+    if not sample:
+        return sys.getsizeof(obj)
+    per_item = sum(nbytes(x, depth + 1) for x in sample) / len(sample)
+    return int(sys.getsizeof(obj) + per_item * n)
+
+
+budget = MemoryBudget(BUDGET_MB * 2**20)
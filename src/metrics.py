@@ -0,0 +1,196 @@
+"""Per-stage timings, cache hit counts and request latencies, in Prometheus text format.
+
+`stage(name)` times a block. Nested stages report exclusive time, so the
+stages of one request add up to (at most) its total. Inside a request
+(start_trace/finish_trace) each stage is also added to the request's
+breakdown; requests slower than EXPENSE_SLOW_REQUEST_MS log that
+breakdown. Everything is per process: with several gunicorn workers each
+one reports its own numbers.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from src.progress import Progress
+
+# log requests slower than this (milliseconds) with their stage breakdown; 0 turns it off
+SLOW_REQUEST_MS = float(os.environ.get("EXPENSE_SLOW_REQUEST_MS", 0))
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name, labels, value, extra=()):
+    pairs = list(labels) + list(extra)
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f"{name}{{{body}}} {value}" if pairs else f"{name} {value}"
+
+
+class Registry:
+    """Counters, histograms and callback gauges keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._gauges = {}      # name -> fn() returning a number or {labels dict as tuple: number}
+
+    def count(self, name, help, value=1, **labels):
+        with self._lock:
+            self._help.setdefault(name, help)
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, help, seconds, **labels):
+        with self._lock:
+            self._help.setdefault(name, help)
+            series = self._histograms.setdefault(name, {})
+            h = series.setdefault(_labels(labels), [0] * len(BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+
+    def gauge(self, name, help, fn):
+        """Report fn() at scrape time: a number, or {(("label", "value"), ...): number}."""
+        with self._lock:
+            self._help[name] = help
+            self._gauges[name] = fn
+
+    def counter_values(self, name):
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def render(self):
+        """Prometheus text exposition (version 0.0.4)."""
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {n: {k: list(v) for k, v in s.items()} for n, s in self._histograms.items()}
+            gauges = dict(self._gauges)
+            helps = dict(self._help)
+        lines = []
+        for name in sorted(counters):
+            lines += [f"# HELP {name} {helps[name]}", f"# TYPE {name} counter"]
+            lines += [_format(name, k, v) for k, v in sorted(counters[name].items())]
+        for name in sorted(histograms):
+            lines += [f"# HELP {name} {helps[name]}", f"# TYPE {name} histogram"]
+            for k, h in sorted(histograms[name].items()):
+                for bound, n in zip(BUCKETS, h):
+                    lines.append(_format(f"{name}_bucket", k, n, [("le", bound)]))
+                lines.append(_format(f"{name}_bucket", k, h[-1], [("le", "+Inf")]))
+                lines.append(_format(f"{name}_sum", k, round(h[-2], 6)))
+                lines.append(_format(f"{name}_count", k, h[-1]))
+        for name in sorted(gauges):
+            try:
+                value = gauges[name]()
+            except Exception as e:
+                print(f"Metrics: gauge {name} failed: {type(e).__name__}: {e}")
+                continue
+            lines += [f"# HELP {name} {helps[name]}", f"# TYPE {name} gauge"]
+            if isinstance(value, dict):
+                lines += [_format(name, k, v) for k, v in sorted(value.items())]
+            else:
+                lines.append(_format(name, (), value))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+_local = threading.local()
+
+
+class Trace:
+    """Stage breakdown of one request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+def start_trace(name):
+    """Begin collecting stages for the request handled by this thread."""
+    _local.trace = Trace(name)
+    _local.stack = []
+    return _local.trace
+
+
+def finish_trace(status=200, **labels):
+    """Record the current request's latency (and log it when slow); returns its Trace."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return None
+    _local.trace = None
+    seconds = time.perf_counter() - trace.started
+    registry.observe("expense_request_seconds", "Request latency by endpoint.", seconds, endpoint=trace.name, **labels)
+    registry.count("expense_requests_total", "Requests by endpoint and status.", endpoint=trace.name, status=status)
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        parts = ", ".join(f"{k} {1000 * v:.1f} ms" for k, v in sorted(trace.stages.items(), key=lambda kv: -kv[1]))
+        other = seconds - sum(trace.stages.values())
+        print(f"Slow request {trace.name} ({status}): {1000 * seconds:.1f} ms [{parts or 'no stages'}; other {1000 * other:.1f} ms]")
+    return trace
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage `name` (exclusive of stages nested inside it)."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)  # time spent in nested stages
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - started
+        own = total - stack.pop()
+        if stack:
+            stack[-1] += total
+        registry.observe("expense_stage_seconds", "Time spent per stage (exclusive of nested stages).", own, stage=name)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.add(name, own)
+
+
+def cache_access(cache, hit):
+    """Count one lookup in `cache` as a hit or a miss."""
+    registry.count("expense_cache_requests_total", "Cache lookups by cache and result.",
+                   cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratios():
+    """{(("cache", name),): hits / lookups} for the hit-ratio gauge."""
+    totals = {}
+    for labels, n in registry.counter_values("expense_cache_requests_total").items():
+        d = dict(labels)
+        hits, lookups = totals.get(d["cache"], (0, 0))
+        totals[d["cache"]] = (hits + (n if d["result"] == "hit" else 0), lookups + n)
+    return {(("cache", c),): round(h / n, 4) for c, (h, n) in totals.items() if n}
+
+
+registry.gauge("expense_cache_hit_ratio", "Cache hits / lookups since start.", cache_hit_ratios)
+
+
+class PipelineMetrics(Progress):
+    """Progress listener recording clean/categorize pipeline stage timings."""
+
+    def stage_advanced(self, name, seconds, done=None, total=None):
+        registry.observe("expense_pipeline_stage_seconds", "Pipeline stage timings (parse, clean, categorize, persist).",
+                         seconds, stage=name)
+
+
+PIPELINE_METRICS = PipelineMetrics()
@@ -0,0 +1,255 @@
+"""Optional learned categorization tier: hashed character n-grams + multinomial naive Bayes.
+
+Off unless EXPENSE_ML_CATEGORIZER=1. The model is trained on rows the
+rule tiers already categorized (overrides weigh more) and only labels rows
+no rule could place, when its top class is at least
+EXPENSE_ML_MIN_CONFIDENCE likely. Naive Bayes is a linear model over
+n-gram counts, so it updates incrementally: adding an override just adds
+that example's counts (`learn`). The artifact lives in data/models/ and is
+shared by all workers (reloaded when the file changes).
+
+Texts are hashed into EXPENSE_ML_FEATURES buckets with a vectorized
+rolling hash over padded byte arrays, and scoring is one gather + sum per
+text, so inference runs per distinct description over whole batches.
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+from src.atomic_io import atomic_path
+from src.memory_budget import budget, nbytes
+
+MODEL_DIR = "data/models"
+MODEL_FILE = "categorizer.npz"
+ML_ENABLED = os.environ.get("EXPENSE_ML_CATEGORIZER", "").lower() in ("1", "true", "yes")
+N_FEATURES = int(os.environ.get("EXPENSE_ML_FEATURES", 2**18))
+MIN_CONFIDENCE = float(os.environ.get("EXPENSE_ML_MIN_CONFIDENCE", 0.8))
+NGRAMS = (3, 4, 5)
+# longest text prefix (bytes) that is featurized
+MAX_BYTES = 96
+# texts featurized at once (bounds the padded byte matrix), and scored at once
+BATCH = 50_000
+PREDICT_BATCH = 4096
+ALPHA = 0.1
+
+# category_source values whose labels the model learns from; overrides count extra
+TRAIN_SOURCES = {"one_off": 5.0, "user_rule": 5.0, "merchant": 5.0, "bank": 1.0, "rule": 1.0}
+# never predicted: decided by amount sign or meaning "no idea"
+SKIP_CATEGORIES = {"Other", "EXCLUDE", "Income"}
+
+# per-process cache: model path -> (mtime, NgramModel), charged to the shared memory budget
+_loaded = {}
+_lock = threading.Lock()
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_PRIME = np.uint64(1099511628211)
+
+
+def model_path(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, MODEL_FILE)
+
+
+def model_text(description_norm):
+    """Text the model sees for a normalized description (padded so word edges form n-grams)."""
+    return " " + str(description_norm) + " "
+
+
+def hashed_ngrams(texts, n_features=N_FEATURES):
+    """(text position, feature bucket) pairs for every character n-gram of `texts`."""
+    data = [t.encode("utf-8")[:MAX_BYTES] for t in texts]
+    rows_out, feats_out = [], []
+    for start in range(0, len(data), BATCH):
+        chunk = data[start:start + BATCH]
+        lengths = np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk))
+        width = int(lengths.max()) if len(chunk) else 0
+        if width == 0:
+            continue
+        # right-padded byte matrix, one text per row
+        flat = np.frombuffer(b"".join(chunk), dtype=np.uint8)
+        owner = np.repeat(np.arange(len(chunk)), lengths)
+        column = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        buf = np.zeros((len(chunk), width), dtype=np.uint64)
+        buf[owner, column] = flat
+        for n in NGRAMS:
+            if width < n:
+                continue
+            h = np.full((len(chunk), width - n + 1), n, dtype=np.uint64)
+            for k in range(n):
+                h = h * _PRIME + buf[:, k:width - n + 1 + k]
+            r, c = np.nonzero(np.arange(width - n + 1)[None, :] <= (lengths - n)[:, None])
+            rows_out.append(r + start)
+            feats_out.append(((h[r, c] * _MIX) >> np.uint64(32)) % np.uint64(n_features))
+    if not rows_out:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(rows_out), np.concatenate(feats_out).astype(np.int64)
+
+
+class NgramModel:
+    """Multinomial naive Bayes over hashed character n-grams."""
+
+    def __init__(self, classes=(), n_features=N_FEATURES):
+        self.n_features = n_features
+        self.classes = list(classes)
+        self.counts = np.zeros((n_features, len(self.classes)), dtype=np.float32)
+        self.docs = np.zeros(len(self.classes), dtype=np.float64)
+        self.examples = 0
+        self.trained_at = None
+        self._weights = None
+
+    def _class_index(self, labels):
+        for label in dict.fromkeys(labels):
+            if label not in self.classes:
+                self.classes.append(label)
+                self.counts = np.hstack([self.counts, np.zeros((self.n_features, 1), dtype=np.float32)])
+                self.docs = np.append(self.docs, 0.0)
+        lookup = {c: i for i, c in enumerate(self.classes)}
+        return np.array([lookup[label] for label in labels], dtype=np.int64)
+
+    def partial_fit(self, texts, labels, weights=None):
+        """Add labelled texts (each counted `weight` times) to the model."""
+        keep = [i for i, label in enumerate(labels) if label not in SKIP_CATEGORIES and pd.notna(label)]
+        if not keep:
+            return self
+        texts = [texts[i] for i in keep]
+        labels = [labels[i] for i in keep]
+        weights = np.ones(len(keep)) if weights is None else np.asarray(weights, dtype=float)[keep]
+        cls = self._class_index(labels)
+        rows, feats = hashed_ngrams(texts, self.n_features)
+        np.add.at(self.counts, (feats, cls[rows]), weights[rows].astype(np.float32))
+        np.add.at(self.docs, cls, weights)
+        self.examples += len(texts)
+        self.trained_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._weights = None
+        return self
+
+    def weights(self):
+        """(log P(feature | class) per bucket, log prior per class), computed once per update."""
+        if self._weights is None:
+            totals = self.counts.sum(axis=0, dtype=np.float64) + ALPHA * self.n_features
+            log_prob = (np.log(self.counts + ALPHA) - np.log(totals)).astype(np.float32)
+            prior = np.log(self.docs / self.docs.sum()) if self.docs.sum() else np.zeros(len(self.classes))
+            self._weights = (log_prob, prior)
+        return self._weights
+
+    def predict(self, texts):
+        """(class label or None, probability) per text."""
+        labels = np.full(len(texts), None, dtype=object)
+        confidence = np.zeros(len(texts))
+        if not self.classes:
+            return labels, confidence
+        log_prob, prior = self.weights()
+        classes = np.array(self.classes, dtype=object)
+        for start in range(0, len(texts), PREDICT_BATCH):
+            batch = texts[start:start + PREDICT_BATCH]
+            rows, feats = hashed_ngrams(batch, self.n_features)
+            if not len(rows):
+                continue
+            # rows come out grouped by n-gram size; order them by text for one segmented sum
+            order = np.argsort(rows, kind="stable")
+            rows, feats = rows[order], feats[order]
+            present, starts = np.unique(rows, return_index=True)
+            scores = np.add.reduceat(log_prob[feats], starts, axis=0) + prior
+            scores -= scores.max(axis=1, keepdims=True)
+            probs = np.exp(scores)
+            probs /= probs.sum(axis=1, keepdims=True)
+            best = probs.argmax(axis=1)
+            # texts without a single n-gram carry no evidence and stay None
+            labels[start + present] = classes[best]
+            confidence[start + present] = probs[np.arange(len(present)), best]
+        return labels, confidence
+
+    def save(self, path):
+        """Write the model atomically (counts stored sparse)."""
+        feature, cls = np.nonzero(self.counts)
+        meta = {"n_features": self.n_features, "ngrams": list(NGRAMS), "examples": self.examples,
+                "trained_at": self.trained_at, "classes": self.classes}
+        with atomic_path(path) as tmp:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, feature=feature.astype(np.int32), cls=cls.astype(np.int16),
+                                    count=self.counts[feature, cls], docs=self.docs, meta=np.array(json.dumps(meta)))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(meta["classes"], meta["n_features"])
+            model.counts[data["feature"], data["cls"]] = data["count"]
+            model.docs = data["docs"]
+        model.examples = meta["examples"]
+        model.trained_at = meta["trained_at"]
+        return model
+
+    def info(self):
+        return {"classes": len(self.classes), "examples": self.examples, "trained_at": self.trained_at,
+                "n_features": self.n_features}
+
+
+def load_model(model_dir=MODEL_DIR):
+    """The saved model (reloaded when the file changes), or None before the first training."""
+    path = model_path(model_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    hit = _loaded.get(path)
+    if hit and hit[0] == mtime:
+        budget.touch("model", path)
+        return hit[1]
+    try:
+        model = NgramModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable model {path}: {e}")
+        return None
+    _loaded[path] = loaded = (mtime, model)
+    budget.charge("model", path, nbytes(model), lambda: _loaded.pop(path) if _loaded.get(path) is loaded else None)
+    return model
+
+
+def training_examples(df):
+    """Distinct (text, category, weight) rows from the rule-categorized rows of `df`."""
+    labelled = df[df["category_source"].astype(str).isin(list(TRAIN_SOURCES))]
+    pairs = pd.DataFrame({
+        "text": labelled["description_norm"].astype(str),
+        "category": labelled["category"].astype(str),
+        "weight": labelled["category_source"].astype(str).map(TRAIN_SOURCES),
+    })
+    return _distinct(pairs)
+
+
+def _distinct(pairs):
+    # one vote per distinct pair (popular merchants don't drown the rest), strongest source wins
+    return pairs.groupby(["text", "category"], sort=False)["weight"].max().reset_index()
+
+
+def train(examples, model_dir=MODEL_DIR):
+    """Fit a fresh model on training_examples() output (or several concatenated) and save it."""
+    examples = _distinct(examples)
+    texts = [model_text(t) for t in examples["text"].tolist()]
+    model = NgramModel().partial_fit(texts, examples["category"].tolist(), examples["weight"].to_numpy())
+    if not model.classes:
+        return None
+    with _lock:
+        model.save(model_path(model_dir))
+    print(f"Trained categorizer on {model.examples} examples ({len(model.classes)} categories)")
+    return model
+
+
+def learn(description_norms, category, weight=TRAIN_SOURCES["one_off"], model_dir=MODEL_DIR):
+    """Incrementally teach the saved model that these descriptions belong to `category`."""
+    texts = sorted({model_text(d) for d in description_norms})
+    if not texts:
+        return None
+    path = model_path(model_dir)
+    with _lock:
+        if not os.path.exists(path):
+            return None
+        # a private copy: the cached one may be predicting in another thread
+        model = NgramModel.load(path)
+        model.partial_fit(texts, [category] * len(texts), [weight] * len(texts))
+        model.save(path)
+    return model
@@ -0,0 +1,155 @@
+"""Description / merchant normalization shared by the pipeline, API and Streamlit app."""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from src.atomic_io import atomic_path
+from src.memory_budget import budget
+
+# bump when clean_string / get_merchant_name change so stale caches are ignored
+NORMALIZE_VERSION = 1
+NORM_CACHE_PATH = f"data/cache/description_norm.v{NORMALIZE_VERSION}.arrow"
+# cap on remembered descriptions per cache file; beyond it only the latest run's entries are kept
+NORM_CACHE_MAX = 500_000
+
+# words dropped when extracting a merchant from a description
+SKIP_WORDS = {"purchase", "pos", "card", "debit", "credit", "sale", "online", "payment", "venmo", "zelle"}
+_SKIP_WORDS_RE = re.compile(r"(?<!\S)(?:" + "|".join(sorted(SKIP_WORDS)) + r")(?!\S)")
+
+# per-process copies of on-disk caches (one per tenant): path -> (mtime, DataFrame),
+# charged to the shared memory budget
+_loaded = {}
+
+
+def clean_string(s):
+    """Make string lowercase and remove special characters."""
+    s = str(s).strip().lower()
+    s = re.sub(r"[\s\-_/]+", " ", s)
+    s = re.sub(r"[^\w\s+]", "", s)
+    return s
+
+
+def get_merchant_name(desc):
+    """Try to extract merchant from description."""
+    tokens = [t for t in desc.split() if t not in SKIP_WORDS]
+
+    # remove numbers
+    tokens_clean = []
+    for t in tokens:
+        clean_t = re.sub(r"\d+", "", t)
+        tokens_clean.append(clean_t)
+
+    result = " ".join(tokens_clean).strip()
+    # just take first 3 words
+    parts = result.split()[:3]
+    return " ".join(parts)
+
+
+def as_text(values):
+    """Values as Python strings, missing ones spelled as str() spells them ("nan").
+
+    Ids and normalizations of rows with an empty description (read back from
+    CSV as NaN) have always been computed from "nan"; this keeps that on
+    pandas versions whose string dtype leaves NaN as NaN. Categorical
+    columns (the published dataset's) are converted first.
+    """
+    values = values.astype(object)
+    missing = values.isna()
+    if missing.any():
+        values = values.where(~missing, values[missing].map(str))
+    return values
+
+
+def clean_strings(values):
+    """Vectorized clean_string over a Series."""
+    # object dtype keeps Python's Unicode-aware regex semantics (\w, \s)
+    s = values.astype(str).astype(object).str.strip().str.lower()
+    s = s.str.replace(r"[\s\-_/]+", " ", regex=True)
+    return s.str.replace(r"[^\w\s+]", "", regex=True)
+
+
+def get_merchant_names(desc_norm):
+    """Vectorized get_merchant_name over normalized descriptions."""
+    s = desc_norm.astype(object).str.replace(_SKIP_WORDS_RE, "", regex=True)
+    s = s.str.replace(r"\d+", "", regex=True)
+    return s.str.split().str[:3].str.join(" ")
+
+
+def map_unique(values, fn):
+    """Apply a scalar `fn` once per distinct value (NaN included) and broadcast back."""
+    codes, uniques = pd.factorize(values)
+    mapped = [fn(u) for u in uniques] + [fn(np.nan)]
+    # code -1 (missing) picks the trailing fn(NaN) entry
+    return pd.Series(np.array(mapped, dtype=object)[codes], index=values.index)
+
+
+def _load_cache(path):
+    """On-disk description -> (normalized, merchant) table, indexed by description."""
+    empty = pd.DataFrame({"normalized": [], "merchant": []}, index=pd.Index([], dtype=object, name="description"))
+    if not path or not os.path.exists(path):
+        return empty
+    mtime = os.path.getmtime(path)
+    hit = _loaded.get(path)
+    if hit and hit[0] == mtime:
+        budget.touch("normalize", path)
+        return hit[1]
+    try:
+        table = feather.read_table(path).to_pandas().astype(object).set_index("description")
+    except Exception as e:
+        print(f"Ignoring unreadable normalization cache {path}: {e}")
+        return empty
+    _remember(path, mtime, table)
+    return table
+
+
+def _remember(path, mtime, table):
+    """Keep a loaded cache table in this process, charged to the memory budget."""
+    _loaded[path] = loaded = (mtime, table)
+    # the strings dominate, so size them too (nbytes() counts only the pointers)
+    size = int(table.memory_usage(index=True, deep=True).sum())
+    budget.charge("normalize", path, size, lambda: _loaded.pop(path) if _loaded.get(path) is loaded else None)
+
+
+def _save_cache(table, path):
+    """Persist the cache atomically."""
+    with atomic_path(path) as tmp:
+        feather.write_feather(pa.Table.from_pandas(table.reset_index(), preserve_index=False), tmp)
+    _remember(path, os.path.getmtime(path), table)
+
+
+def normalize_descriptions(descriptions, cache_path=NORM_CACHE_PATH):
+    """Return (description_norm, merchant) Series for raw descriptions.
+
+    Only distinct descriptions are normalized, and results are remembered
+    in `cache_path` so overlapping re-imports skip the work entirely.
+    Each tenant has its own cache file (Tenant.norm_cache). Pass
+    cache_path=None to skip the on-disk cache.
+    """
+    # missing descriptions normalize as "nan" (factorize would code them -1)
+    codes, uniques = pd.factorize(as_text(descriptions))
+    uniques = pd.Index(uniques, dtype=object, name="description")
+
+    cache = _load_cache(cache_path)
+    missing = uniques[~uniques.isin(cache.index)]
+    if len(missing):
+        norm = clean_strings(pd.Series(missing, dtype=object))
+        fresh = pd.DataFrame(
+            {"normalized": norm.to_numpy(), "merchant": get_merchant_names(norm).to_numpy()},
+            index=missing,
+        )
+        cache = pd.concat([cache, fresh])
+        if len(cache) > NORM_CACHE_MAX:
+            cache = cache.loc[uniques]
+        if cache_path:
+            _save_cache(cache, cache_path)
+
+    rows = cache.reindex(uniques)
+    norm = rows["normalized"].to_numpy(dtype=object)[codes]
+    merchant = rows["merchant"].to_numpy(dtype=object)[codes]
+    return (
+        pd.Series(norm, index=descriptions.index, name="description_norm"),
+        pd.Series(merchant, index=descriptions.index, name="merchant"),
+    )
@@ -0,0 +1,161 @@
+"""Month-partitioned on-disk tables for out-of-core processing.
+
+A store is a directory of `month=YYYY-MM.arrow` files plus a manifest
+listing each partition's row count and date range. Partitions are sorted
+by date, written atomically and memory-mapped on read, so a worker only
+ever touches the months a query asks for.
+"""
+
+import os
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from src.atomic_io import write_json_atomic
+from src.dataset import compact_frame, map_arrow, sort_by_date, write_arrow
+from src.memory_budget import budget, nbytes
+from src.metrics import cache_access, stage
+
+PARTITION_DIR = "partitions"
+MANIFEST = "_manifest.json"
+
+# opt-in: keep clean/categorized data as month partitions instead of one file
+OUT_OF_CORE = os.environ.get("EXPENSE_OUT_OF_CORE", "").lower() in ("1", "true", "yes")
+# partitions processed concurrently by clean/categorize (1 = one at a time)
+PARTITION_WORKERS = int(os.environ.get("EXPENSE_PARTITION_WORKERS", 1))
+
+# per-process caches: manifest path -> (mtime, manifest); partition path -> (id, DataFrame),
+# charged to the shared memory budget
+_manifests = {}
+_mapped = {}
+
+
+def month_key(value):
+    """"YYYY-MM" for a date-like value."""
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+class PartitionStore:
+    """One month-partitioned table (e.g. clean or categorized transactions)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, month):
+        return os.path.join(self.root, f"month={month}.arrow")
+
+    def manifest(self):
+        """{"version": str or None, "partitions": {month: {rows, min_date, max_date, id}}}."""
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            hit = _manifests.get(path)
+            if hit and hit[0] == mtime:
+                return hit[1]
+            with open(path, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"version": None, "partitions": {}}
+        _manifests[path] = (mtime, manifest)
+        return manifest
+
+    def version(self):
+        return self.manifest()["version"]
+
+    def months(self, start=None, end=None):
+        """Partition keys, ascending, overlapping [start, end] when given."""
+        months = sorted(self.manifest()["partitions"])
+        if start is not None and not pd.isna(start):
+            months = [m for m in months if m >= month_key(start)]
+        if end is not None and not pd.isna(end):
+            months = [m for m in months if m <= month_key(end)]
+        return months
+
+    def rows(self):
+        return sum(p["rows"] for p in self.manifest()["partitions"].values())
+
+    def write(self, month, df):
+        """Write one month's rows (date-sorted, compacted); returns its manifest entry."""
+        df = sort_by_date(df.reset_index(drop=True))
+        os.makedirs(self.root, exist_ok=True)
+        write_arrow(compact_frame(df), self.path(month))
+        return {
+            "rows": len(df),
+            "min_date": str(df["date"].min()) if len(df) else None,
+            "max_date": str(df["date"].max()) if len(df) else None,
+            "id": uuid.uuid4().hex,
+        }
+
+    def commit(self, partitions):
+        """Publish `partitions` (month -> entry) as the new contents; drop other months."""
+        os.makedirs(self.root, exist_ok=True)
+        for name in os.listdir(self.root):
+            if name.startswith("month=") and name[len("month="):-len(".arrow")] not in partitions:
+                os.remove(os.path.join(self.root, name))
+        version = uuid.uuid4().hex
+        write_json_atomic({"version": version, "partitions": partitions}, os.path.join(self.root, MANIFEST))
+        return version
+
+    def drop(self):
+        """Remove every partition and the manifest."""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.startswith("month=") or name == MANIFEST:
+                os.remove(os.path.join(self.root, name))
+
+    def read(self, month, columns=None):
+        """Memory-mapped frame for one partition (shared: never assign into it)."""
+        entry = self.manifest()["partitions"].get(month)
+        if entry is None:
+            return pd.DataFrame()
+        path = self.path(month)
+        if columns is not None:
+            with stage("load"):
+                return map_arrow(path, columns)
+        hit = _mapped.get(path)
+        cache_access("partition", bool(hit and hit[0] == entry["id"]))
+        if hit and hit[0] == entry["id"]:
+            budget.touch("partition", path)
+            return hit[1]
+        with stage("load"):
+            df = map_arrow(path)
+        _mapped[path] = mapped = (entry["id"], df)
+        budget.charge("partition", path, nbytes(df),
+                      lambda: _mapped.pop(path) if _mapped.get(path) is mapped else None)
+        return df
+
+    def scan(self, start=None, end=None, columns=None):
+        """Yield (month, rows with start <= date <= end) one partition at a time."""
+        if columns is not None:
+            columns = ["date"] + [c for c in columns if c != "date"]
+        for month in self.months(start, end):
+            df = self.read(month, columns)
+            # partitions are date-sorted, so the range is a slice
+            lo = df["date"].searchsorted(pd.Timestamp(start), "left") if start else 0
+            hi = df["date"].searchsorted(pd.Timestamp(end), "right") if end else len(df)
+            yield month, df.iloc[lo:hi]
+
+    def read_range(self, start=None, end=None, columns=None):
+        """Rows of every partition the range touches, concatenated in date order."""
+        parts = [part for _, part in self.scan(start, end, columns)]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+
+def clean_store(clean_dir):
+    return PartitionStore(os.path.join(clean_dir, PARTITION_DIR, "clean"))
+
+
+def categorized_store(clean_dir):
+    return PartitionStore(os.path.join(clean_dir, PARTITION_DIR, "categorized"))
+
+
+def map_partitions(fn, months, workers=PARTITION_WORKERS):
+    """[fn(month) for month in months], optionally on a thread pool; keeps order."""
+    if workers <= 1 or len(months) <= 1:
+        return [fn(m) for m in months]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="expense-partition") as pool:
+        return list(pool.map(fn, months))
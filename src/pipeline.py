@@ -0,0 +1,142 @@
+"""Single-writer coordinator for the clean -> categorize -> publish pipeline."""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from src.progress import ProgressGroup
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock shared by every process using the same path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PipelineCoordinator:
+    """Serialize pipeline runs and coalesce requests that arrive while one runs.
+
+    `rebuild(full, progress)` does the actual work; `full=True` means re-clean
+    the raw files before categorizing, and `progress` fans stage updates out
+    to every request merged into the run. Requests made while a run is in progress are
+    merged into a single follow-up run (a full request wins over a
+    categorize-only one), and every caller gets the result of the first run
+    that started after its request.
+    """
+
+    def __init__(self, rebuild, lock_path, edit_lock_path=None):
+        self._rebuild = rebuild
+        self._lock_path = lock_path
+        self._edit_lock_path = edit_lock_path or lock_path + ".edit"
+        self._cond = threading.Condition()
+        self._edit_mutex = threading.Lock()
+        self._running = False
+        self._pending = None  # None, or True/False for a queued full/partial run
+        self._pending_gen = 0
+        self._pending_listeners = []
+        self._next_gen = 1
+        self._done_gen = 0
+        self._results = OrderedDict()  # gen -> (result, error)
+        self._stats = {
+            "requested": 0,
+            "queued": 0,
+            "coalesced": 0,
+            "runs": 0,
+            "failures": 0,
+            "last_duration_s": None,
+        }
+
+    def request(self, full=False, progress=None):
+        """Ask for a rebuild and block until one covering this request finishes."""
+        with self._cond:
+            self._stats["requested"] += 1
+            if self._pending is None:
+                self._pending = full
+                self._pending_gen = self._next_gen
+                self._next_gen += 1
+                self._stats["queued"] += 1
+            else:
+                self._pending = self._pending or full
+                self._stats["coalesced"] += 1
+            if progress is not None:
+                self._pending_listeners.append(progress)
+            my_gen = self._pending_gen
+
+            while self._done_gen < my_gen:
+                if self._running or self._pending is None:
+                    self._cond.wait()
+                    continue
+                # nobody is running: this thread runs the pending batch
+                run_full, gen = self._pending, self._pending_gen
+                listeners, self._pending_listeners = self._pending_listeners, []
+                self._pending = None
+                self._running = True
+                self._cond.release()
+                try:
+                    outcome = self._run(run_full, ProgressGroup(listeners))
+                finally:
+                    self._cond.acquire()
+                self._running = False
+                self._done_gen = gen
+                self._results[gen] = outcome
+                while len(self._results) > 16:
+                    self._results.popitem(last=False)
+                self._cond.notify_all()
+
+            result, error = self._results[my_gen]
+        if error is not None:
+            raise error
+        return result
+
+    def _run(self, full, progress):
+        """Run one rebuild under the cross-process writer lock."""
+        started = time.perf_counter()
+        try:
+            with file_lock(self._lock_path):
+                result = self._rebuild(full, progress)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        duration = time.perf_counter() - started
+        with self._cond:
+            self._stats["runs"] += 1
+            self._stats["last_duration_s"] = round(duration, 4)
+            if error is not None:
+                self._stats["failures"] += 1
+        return result, error
+
+    @contextmanager
+    def edit_lock(self):
+        """Hold the edit lock for a read-modify-write of config or raw files."""
+        with self._edit_mutex:
+            with file_lock(self._edit_lock_path):
+                yield
+
+    def idle(self):
+        """True when no run is in progress or queued and the edit lock is free."""
+        with self._cond:
+            busy = self._running or self._pending is not None
+        return not busy and not self._edit_mutex.locked()
+
+    def stats(self):
+        """Counters for monitoring (requested, queued, coalesced, runs, ...)."""
+        with self._cond:
+            out = dict(self._stats)
+            out["running"] = self._running
+            out["pending"] = self._pending is not None
+        return out
@@ -5,6 +5,8 @@ import argparse
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from src.partitions import OUT_OF_CORE, categorized_store
+from src.summaries import monthly_summary
 
 CLEAN_DIR = "data/clean"
 PLOTS_DIR = "plots"
@@ -20,9 +22,12 @@ def _ensure_out() -> str:
 def _read_data(clean_dir: str = CLEAN_DIR) -> pd.DataFrame:
     """Load categorized transactions."""
     path = os.path.join(clean_dir, "transactions_categorized.csv")
-    if not os.path.exists(path):
+    if OUT_OF_CORE and categorized_store(clean_dir).months():
+        df = categorized_store(clean_dir).read_range().copy()
+    elif not os.path.exists(path):
         raise FileNotFoundError("run categorize first")
-    df = pd.read_csv(path, parse_dates=["date"])
+    else:
+        df = pd.read_csv(path, parse_dates=["date"])
     if "amount_spend" not in df.columns:
         df["amount_spend"] = df.get("amount", 0.0)
     df["month"] = df["date"].dt.to_period("M").astype(str)
@@ -34,9 +39,9 @@ def _pick_month(df: pd.DataFrame, month: str | None) -> str:
     return month or df["month"].sort_values().iloc[-1]
 
 
-def plot_monthly_totals(df: pd.DataFrame, out_dir: str) -> str:
-    """Bar chart of monthly total spend."""
-    s = df.groupby("month")["amount_spend"].sum().sort_index()
+def plot_monthly_totals(summary: pd.DataFrame, out_dir: str) -> str:
+    """Bar chart of monthly total spend, from month x category totals."""
+    s = summary.groupby("month")["spend"].sum().sort_index()
     fig, ax = plt.subplots(figsize=(9, 4.5))
     s.plot(kind="bar", ax=ax)
     ax.set_title("Monthly Total Spend (expenses only)")
@@ -52,7 +57,7 @@ def plot_monthly_totals(df: pd.DataFrame, out_dir: str) -> str:
 
 def plot_spend_by_category(df: pd.DataFrame, out_dir: str) -> str:
     """Bar chart of total spend by category."""
-    s = df.groupby("category")["amount_spend"].sum().sort_values(ascending=False)
+    s = df.groupby("category", observed=True)["amount_spend"].sum().sort_values(ascending=False)
     fig, ax = plt.subplots(figsize=(9, 5))
     s.plot(kind="bar", ax=ax)
     ax.set_title("Spend by Category (expenses only)")
@@ -89,9 +94,9 @@ def plot_cumulative_vs_budget(df: pd.DataFrame, out_dir: str, month: str, budget
     return path
 
 
-def plot_category_month_heatmap(df: pd.DataFrame, out_dir: str) -> str:
-    """Heatmap of category spending by month."""
-    pivot = df.pivot_table(values="amount_spend", index="category", columns="month", aggfunc="sum", fill_value=0.0).sort_index()
+def plot_category_month_heatmap(summary: pd.DataFrame, out_dir: str) -> str:
+    """Heatmap of category spending by month, from month x category totals."""
+    pivot = summary.pivot_table(values="spend", index="category", columns="month", aggfunc="sum", fill_value=0.0).sort_index()
     fig, ax = plt.subplots(figsize=(10, 6))
     im = ax.imshow(pivot.values, aspect="auto", interpolation="nearest")
     ax.set_title("Category × Month Heatmap (expenses only)")
@@ -111,7 +116,7 @@ def plot_category_month_heatmap(df: pd.DataFrame, out_dir: str) -> str:
 
 def plot_top_merchants(df: pd.DataFrame, out_dir: str, top_n: int = 12) -> str:
     """Bar chart of top merchants by spend."""
-    s = df.groupby("merchant")["amount_spend"].sum().sort_values(ascending=False).head(top_n).iloc[::-1]
+    s = df.groupby("merchant", observed=True)["amount_spend"].sum().sort_values(ascending=False).head(top_n).iloc[::-1]
     fig, ax = plt.subplots(figsize=(9, 6))
     s.plot(kind="barh", ax=ax)
     ax.set_title(f"Top {top_n} Merchants by Spend (expenses only)")
@@ -133,13 +138,14 @@ def main():
 
     out_dir = _ensure_out()
     df = _read_data(CLEAN_DIR)
+    summary = monthly_summary(CLEAN_DIR)
     month = _pick_month(df, args.month)
     budget = float(BUDGET_MONTHLY)
 
-    p1 = plot_monthly_totals(df, out_dir)
+    p1 = plot_monthly_totals(summary, out_dir)
     p2 = plot_spend_by_category(df, out_dir)
     p3 = plot_cumulative_vs_budget(df, out_dir, month, budget)
-    p4 = plot_category_month_heatmap(df, out_dir)
+    p4 = plot_category_month_heatmap(summary, out_dir)
     p5 = plot_top_merchants(df, out_dir)
 
     print("saved charts:")
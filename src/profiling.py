@@ -0,0 +1,219 @@
+"""Opt-in profiling of requests and pipeline runs, written to data/profiles/.
+
+Off by default. EXPENSE_PROFILE=1 profiles every request and every
+clean_all/categorize run; otherwise a single request can ask for it with
+an `X-Expense-Profile: <EXPENSE_PROFILE_TOKEN>` header (ignored when no
+token is configured). EXPENSE_PROFILE_FORMAT picks the output:
+
+- "pstats" (default): cProfile, saved as `.prof` (load with pstats/snakeviz)
+- "collapsed": a stack sampler, saved as `.collapsed` lines
+  ("outer;inner;leaf count") for flamegraph.pl / speedscope
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get("EXPENSE_PROFILE_DIR", "data/profiles")
+PROFILE_ALL = os.environ.get("EXPENSE_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.environ.get("EXPENSE_PROFILE_TOKEN", "")
+PROFILE_FORMAT = os.environ.get("EXPENSE_PROFILE_FORMAT", "pstats")
+PROFILE_HEADER = "X-Expense-Profile"
+# only keep captures at least this slow, and at most this many files
+PROFILE_MIN_MS = float(os.environ.get("EXPENSE_PROFILE_MIN_MS", 0))
+PROFILE_KEEP = int(os.environ.get("EXPENSE_PROFILE_KEEP", 200))
+SAMPLE_INTERVAL_S = float(os.environ.get("EXPENSE_PROFILE_INTERVAL_MS", 5)) / 1000
+
+EXTENSIONS = {"pstats": ".prof", "collapsed": ".collapsed"}
+
+# one cProfile capture at a time: newer Pythons allow a single active profiler per process
+_cprofile_lock = threading.Lock()
+_local = threading.local()
+
+
+def header_requested(value):
+    """True when a request's profile header carries the configured token."""
+    return bool(PROFILE_TOKEN) and value == PROFILE_TOKEN
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="expense-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class Capture:
+    """One running profile; `finish()` writes it and returns the path (or None)."""
+
+    def __init__(self, label, fmt=PROFILE_FORMAT):
+        self.label = label
+        self.fmt = fmt if fmt in EXTENSIONS else "pstats"
+        self.profiler = None
+        self.sampler = None
+        self.started = time.perf_counter()
+        if self.fmt == "pstats":
+            if not _cprofile_lock.acquire(blocking=False):
+                print(f"Profiler busy, not profiling {label}")
+                return
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+
+    def finish(self):
+        elapsed_ms = 1000 * (time.perf_counter() - self.started)
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_lock.release()
+        elif self.sampler is not None:
+            self.sampler.stop()
+        else:
+            return None
+        if elapsed_ms < PROFILE_MIN_MS:
+            return None
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.label).strip("_") or "profile"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}_{int(elapsed_ms)}ms{EXTENSIONS[self.fmt]}"
+        path = os.path.join(PROFILE_DIR, name)
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
+        else:
+            self.sampler.write(path)
+        prune()
+        print(f"Profile written: {path}")
+        return path
+
+
+def start(label, fmt=PROFILE_FORMAT):
+    """Begin a capture on this thread unless one is already running here."""
+    if getattr(_local, "capture", None) is not None:
+        return None
+    _local.capture = Capture(label, fmt)
+    return _local.capture
+
+
+def finish(capture):
+    """Stop `capture` (from start()) and write it; returns the file path or None."""
+    if capture is None:
+        return None
+    _local.capture = None
+    return capture.finish()
+
+
+@contextmanager
+def profiled(label, enabled=None):
+    """Profile the block when profiling is on (EXPENSE_PROFILE or `enabled`)."""
+    capture = start(label) if (PROFILE_ALL if enabled is None else enabled) else None
+    try:
+        yield
+    finally:
+        finish(capture)
+
+
+def profile_run(label):
+    """Decorator: profile each call when EXPENSE_PROFILE is on (outermost call only)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not PROFILE_ALL:
+                return fn(*args, **kwargs)
+            with profiled(label, enabled=True):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def prune(keep=PROFILE_KEEP):
+    """Delete the oldest captures beyond `keep`."""
+    files = list_profiles()
+    for entry in files[keep:]:
+        os.remove(entry["path"])
+
+
+def list_profiles(profile_dir=None):
+    """Captured profiles, newest first: {"name", "path", "bytes", "format", "taken", "label", "ms"}."""
+    profile_dir = profile_dir or PROFILE_DIR
+    if not os.path.isdir(profile_dir):
+        return []
+    out = []
+    for name in os.listdir(profile_dir):
+        stem, ext = os.path.splitext(name)
+        if ext not in EXTENSIONS.values():
+            continue
+        m = re.match(r"(\d{8}-\d{6})_(.+)_(\d+)ms$", stem)
+        path = os.path.join(profile_dir, name)
+        out.append({
+            "name": name,
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "format": "pstats" if ext == ".prof" else "collapsed",
+            "taken": m.group(1) if m else "",
+            "label": m.group(2) if m else stem,
+            "ms": int(m.group(3)) if m else None,
+        })
+    out.sort(key=lambda e: (e["taken"], e["name"]), reverse=True)
+    return out
+
+
+def summarize(path, limit=20, sort="cumulative"):
+    """Text summary: top functions for .prof, hottest frames and stacks for .collapsed."""
+    if path.endswith(".prof"):
+        buf = io.StringIO()
+        pstats.Stats(path, stream=buf).strip_dirs().sort_stats(sort).print_stats(limit)
+        return buf.getvalue()
+
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, n = line.rstrip("\n").rpartition(" ")
+            stacks[stack] += int(n)
+    total = sum(stacks.values()) or 1
+    inclusive, leaf = Counter(), Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        leaf[frames[-1]] += n
+        for frame in set(frames):
+            inclusive[frame] += n
+    lines = [f"{total} samples", "", "self %   frame"]
+    lines += [f"{100 * n / total:6.1f}   {frame}" for frame, n in leaf.most_common(limit)]
+    lines += ["", "total %  frame"]
+    lines += [f"{100 * n / total:6.1f}   {frame}" for frame, n in inclusive.most_common(limit)]
+    return "\n".join(lines)
@@ -0,0 +1,42 @@
+"""Stage progress reporting shared by the pipeline and background jobs."""
+
+import time
+from contextlib import contextmanager
+
+
+class Progress:
+    """No-op progress sink; subclasses record stage timings and counts."""
+
+    @contextmanager
+    def stage(self, name, done=None, total=None):
+        """Time one step of `name`; `done`/`total` describe progress after it."""
+        self.stage_started(name, total)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_advanced(name, time.perf_counter() - started, done, total)
+
+    def stage_started(self, name, total=None):
+        pass
+
+    def stage_advanced(self, name, seconds, done=None, total=None):
+        pass
+
+
+NULL_PROGRESS = Progress()
+
+
+class ProgressGroup(Progress):
+    """Fan progress out to several listeners (e.g. coalesced jobs)."""
+
+    def __init__(self, listeners=()):
+        self.listeners = list(listeners)
+
+    def stage_started(self, name, total=None):
+        for p in self.listeners:
+            p.stage_started(name, total)
+
+    def stage_advanced(self, name, seconds, done=None, total=None):
+        for p in self.listeners:
+            p.stage_advanced(name, seconds, done, total)
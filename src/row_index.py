@@ -0,0 +1,185 @@
+"""Row indexes over the published dataset: sorted dates plus per-value postings."""
+
+import numpy as np
+import pandas as pd
+from src.dataset import CLEAN_DIR, load_dataset, derived
+from src.partitions import OUT_OF_CORE, categorized_store
+
+
+class DateIndex:
+    """Binary search over the dataset's date column.
+
+    The published dataset is sorted by date (missing dates last), so a
+    date range is a contiguous block of rows: two searchsorted calls give
+    its bounds and `df.iloc[lo:hi]` is a slice rather than a filtered copy.
+    """
+
+    def __init__(self, dates):
+        values = dates.to_numpy()
+        self._unit = np.datetime_data(values.dtype)[0]
+        self._rows = len(values)
+        self._ticks = values.view("i8")[: int(dates.notna().sum())]
+        self._per_ns = int(np.timedelta64(1, self._unit) / np.timedelta64(1, "ns"))
+        if len(self._ticks) > 1 and (np.diff(self._ticks) < 0).any():
+            raise ValueError("dataset dates are not sorted")
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def bounds(self, start=None, end=None):
+        """(lo, hi) row positions with start <= date <= end (either side optional)."""
+        if (start is None or pd.isna(start)) and (end is None or pd.isna(end)):
+            return 0, self._rows
+        # with any bound set, rows without a date never match
+        lo, hi = 0, len(self._ticks)
+        if start is not None and not pd.isna(start):
+            ns = pd.Timestamp(start).as_unit("ns").value
+            lo = int(np.searchsorted(self._ticks, -(-ns // self._per_ns), side="left"))
+        if end is not None and not pd.isna(end):
+            ns = pd.Timestamp(end).as_unit("ns").value
+            hi = int(np.searchsorted(self._ticks, ns // self._per_ns, side="right"))
+        return lo, max(lo, hi)
+
+
+class ValueIndex:
+    """Ascending row positions for each distinct value of a column."""
+
+    def __init__(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        self._codes = {v: i for i, v in enumerate(uniques)}
+        # stable sort keeps positions ascending inside each value's run
+        self._order = np.argsort(codes, kind="stable").astype(np.int64)
+        counts = np.bincount(codes.astype(np.int64) + 1, minlength=len(uniques) + 1)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def positions(self, value, lo=0, hi=None):
+        """Sorted positions holding `value`, restricted to rows [lo, hi)."""
+        code = self._codes.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        rows = self._order[self._offsets[code + 1]:self._offsets[code + 2]]
+        if lo > 0 or hi is not None:
+            rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, len(self._order) if hi is None else hi)]
+        return rows
+
+    def positions_any(self, values, lo=0, hi=None):
+        """Sorted positions holding any of `values` within [lo, hi)."""
+        parts = [self.positions(v, lo, hi) for v in values]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+
+def date_index(clean_dir=CLEAN_DIR):
+    """DateIndex for the current dataset version."""
+    return derived("index:date", lambda df, previous: DateIndex(df["date"]), clean_dir)
+
+
+def value_index(column, clean_dir=CLEAN_DIR):
+    """ValueIndex over `column` for the current dataset version."""
+    return derived(f"index:{column}", lambda df, previous: ValueIndex(df[column]), clean_dir)
+
+
+def select_rows(start_date=None, end_date=None, source=None, category=None,
+                exclude_categories=(), rows=None, clean_dir=CLEAN_DIR):
+    """Rows of the published dataset matching the filters, in dataset order.
+
+    The date range becomes a slice of the sorted rows; `source` and
+    `category` (a value or list of values) narrow it through their value
+    indexes, and `rows` (sorted positions, e.g. search hits) intersects
+    further. Only `exclude_categories` is applied as a mask, on what is
+    left. The result may share memory with the cached dataset: never
+    assign into it. In out-of-core mode only the month partitions the date
+    range touches are read.
+    """
+    if OUT_OF_CORE:
+        return _select_partitioned(start_date, end_date, source, category, exclude_categories, rows, clean_dir)
+    df = load_dataset(clean_dir)
+    lo, hi = date_index(clean_dir).bounds(start_date, end_date)
+
+    picks = None
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        picks = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+    for column, wanted in (("source", source), ("category", category)):
+        if wanted is None or column not in df.columns:
+            continue
+        wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+        found = value_index(column, clean_dir).positions_any(wanted, lo, hi)
+        picks = found if picks is None else np.intersect1d(picks, found, assume_unique=True)
+
+    out = df.iloc[lo:hi] if picks is None else df.iloc[picks]
+    if len(exclude_categories) and "category" in out.columns:
+        out = out[~out["category"].isin(list(exclude_categories))]
+    return out
+
+
+def empty_rows():
+    """Zero-row frame with the columns (and dtypes) aggregations rely on."""
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "description": pd.Series(dtype=object),
+        "merchant": pd.Series(dtype=object),
+        "amount_signed": pd.Series(dtype=float),
+        "amount_spend": pd.Series(dtype=float),
+        "category": pd.Series(dtype=object),
+        "source": pd.Series(dtype=object),
+    })
+
+
+def _filter_rows(df, source=None, category=None, exclude_categories=()):
+    """Mask-based source/category filters for frames without value indexes."""
+    if source is not None and "source" in df.columns:
+        df = df[df["source"] == source]
+    if category is not None and "category" in df.columns:
+        df = df[df["category"].isin([category] if isinstance(category, str) else list(category))]
+    if len(exclude_categories) and "category" in df.columns:
+        df = df[~df["category"].isin(list(exclude_categories))]
+    return df
+
+
+def _select_partitioned(start_date, end_date, source, category, exclude_categories, rows, clean_dir):
+    """select_rows over month partitions: prune by month, slice by date, mask the rest."""
+    store = categorized_store(clean_dir)
+    offsets = partition_offsets(store)
+    parts = []
+    for month, part in store.scan(start_date, end_date):
+        if rows is not None:
+            # `rows` are positions across all partitions (see partition_offsets)
+            first = offsets[month] + (part.index[0] if len(part) else 0)
+            local = np.asarray(rows, dtype=np.int64) - first
+            part = part.iloc[local[(local >= 0) & (local < len(part))]]
+        parts.append(_filter_rows(part, source, category, exclude_categories))
+    if not parts:
+        return empty_rows()
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+
+def partition_offsets(store):
+    """Month -> position of its first row when all partitions are read in order."""
+    partitions = store.manifest()["partitions"]
+    offsets, total = {}, 0
+    for month in sorted(partitions):
+        offsets[month] = total
+        total += partitions[month]["rows"]
+    return offsets
+
+
+def scan_rows(start_date=None, end_date=None, source=None, clean_dir=CLEAN_DIR):
+    """Yield the rows select_rows would return, one chunk at a time.
+
+    In out-of-core mode each chunk is one month partition, so aggregations
+    can reduce chunk by chunk; otherwise the whole selection is one chunk.
+    """
+    if not OUT_OF_CORE:
+        yield select_rows(start_date, end_date, source=source, clean_dir=clean_dir)
+        return
+    chunks = 0
+    for _, part in categorized_store(clean_dir).scan(start_date, end_date):
+        chunks += 1
+        yield _filter_rows(part, source)
+    if not chunks:
+        yield empty_rows()
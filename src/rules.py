@@ -0,0 +1,378 @@
+"""Declarative categorization rules, compiled into whole-column matching.
+
+data/config/rules.json holds the user's rules:
+
+    {"rules": [
+        {"id": "big-utilities", "category": "Bills", "priority": 10,
+         "merchant": "comcast|xfinity", "amount": {"gt": 100}},
+        {"category": "Travel", "description": "\\bairlines?\\b",
+         "date": {"from": "2024-06-01", "to": "2024-08-31"}}
+    ]}
+
+Every condition is optional and all of a rule's conditions must hold:
+`merchant` / `description` are case-insensitive regexes searched in the
+normalized merchant / raw description, `amount` bounds amount_spend
+(gt/gte/lt/lte), `date` is an inclusive from/to range. Rules run by
+descending `priority` (file order breaks ties); the first rule a row
+matches decides its category.
+
+Text conditions are evaluated once per distinct text, not per row, and a
+text is only tested against rules whose required literal it contains
+(see TextMatcher); amount/date conditions are numpy masks over the rows
+that passed the text conditions.
+"""
+
+import os
+import re
+import json
+import operator
+import numpy as np
+import pandas as pd
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+RULES_JSON = "data/config/rules.json"
+
+RULE_KEYS = {"id", "category", "priority", "merchant", "description", "amount", "date", "enabled"}
+TEXT_FIELDS = ("merchant", "description")
+AMOUNT_OPS = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+# shortest literal worth indexing (texts are looked up by their 3-character substrings)
+MIN_LITERAL = 3
+
+# per-process cache: rules path -> (mtime, RuleSet)
+_compiled = {}
+
+
+class RuleError(ValueError):
+    """A rule in rules.json that cannot be used."""
+
+
+class Rule:
+    """One rule: a category plus text patterns per field and amount/date bounds."""
+
+    def __init__(self, category, patterns=None, amount=None, dates=None, priority=0, rule_id=None):
+        self.category = category
+        self.patterns = patterns or {}  # field -> compiled regex
+        self.amount = amount or {}      # "gt"/"gte"/"lt"/"lte" -> float
+        self.dates = dates              # (first day or None, day after the last or None)
+        self.priority = priority
+        self.id = rule_id
+
+    @property
+    def row_conditions(self):
+        """True when the rule also checks amount or date (not decidable from text alone)."""
+        return bool(self.amount) or self.dates is not None
+
+    def row_mask(self, amount, dates):
+        """Rows (aligned numpy arrays) meeting the amount/date conditions."""
+        mask = np.ones(len(amount), dtype=bool)
+        for op, bound in self.amount.items():
+            mask &= AMOUNT_OPS[op](amount, bound)
+        if self.dates is not None:
+            first, after = self.dates
+            if first is not None:
+                mask &= dates >= first
+            if after is not None:
+                mask &= dates < after
+        return mask
+
+
+def _day(value, name, label):
+    try:
+        return np.datetime64(pd.Timestamp(value).normalize().to_datetime64(), "ns")
+    except (ValueError, TypeError):
+        raise RuleError(f"rule {label}: date {name} {value!r} is not a date")
+
+
+def parse_rule(raw, position=0):
+    """Validate one rules.json entry and compile it into a Rule."""
+    label = raw.get("id", position) if isinstance(raw, dict) else position
+    if not isinstance(raw, dict):
+        raise RuleError(f"rule {label}: expected an object")
+    unknown = set(raw) - RULE_KEYS
+    if unknown:
+        raise RuleError(f"rule {label}: unknown keys {sorted(unknown)}")
+    category = raw.get("category")
+    if not category or not isinstance(category, str):
+        raise RuleError(f"rule {label}: category is required")
+
+    patterns = {}
+    for field in TEXT_FIELDS:
+        if raw.get(field):
+            try:
+                patterns[field] = re.compile(str(raw[field]), re.IGNORECASE)
+            except re.error as e:
+                raise RuleError(f"rule {label}: bad {field} regex: {e}")
+
+    amount = {}
+    bounds = raw.get("amount") or {}
+    if not isinstance(bounds, dict) or set(bounds) - set(AMOUNT_OPS):
+        raise RuleError(f"rule {label}: amount takes {sorted(AMOUNT_OPS)}")
+    for op, value in bounds.items():
+        try:
+            amount[op] = float(value)
+        except (TypeError, ValueError):
+            raise RuleError(f"rule {label}: amount {op} must be a number")
+
+    dates = None
+    span = raw.get("date") or {}
+    if not isinstance(span, dict) or set(span) - {"from", "to"}:
+        raise RuleError(f"rule {label}: date takes from/to")
+    if span:
+        first = _day(span["from"], "from", label) if span.get("from") else None
+        last = _day(span["to"], "to", label) if span.get("to") else None
+        dates = (first, last + np.timedelta64(1, "D") if last is not None else None)
+
+    try:
+        priority = float(raw.get("priority", 0))
+    except (TypeError, ValueError):
+        raise RuleError(f"rule {label}: priority must be a number")
+    return Rule(category, patterns, amount, dates, priority, str(raw.get("id", position)))
+
+
+def load_rules(path=RULES_JSON):
+    """Raw rule dicts from rules.json ({"rules": [...]} or a bare list); [] when missing."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        data = json.load(f)
+    rules = data.get("rules", []) if isinstance(data, dict) else data
+    if not isinstance(rules, list):
+        raise RuleError("rules.json: expected a list of rules")
+    return rules
+
+
+def compile_rules(raw_rules, strict=True):
+    """RuleSet from raw rule dicts; disabled rules are dropped, invalid ones raise (or are skipped)."""
+    rules = []
+    for position, raw in enumerate(raw_rules):
+        if isinstance(raw, dict) and raw.get("enabled", True) is False:
+            continue
+        try:
+            rules.append(parse_rule(raw, position))
+        except RuleError as e:
+            if strict:
+                raise
+            print(f"Skipping {e}")
+    return RuleSet(rules)
+
+
+def load_ruleset(path=RULES_JSON):
+    """Compiled rules.json, cached until the file changes; bad rules are skipped with a warning."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return RuleSet([])
+    hit = _compiled.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    try:
+        ruleset = compile_rules(load_rules(path), strict=False)
+    except (RuleError, json.JSONDecodeError) as e:
+        print(f"Ignoring {path}: {e}")
+        ruleset = RuleSet([])
+    _compiled[path] = (mtime, ruleset)
+    return ruleset
+
+
+def _options(items):
+    """Sets of lowercase literals; every match of parsed `items` contains one literal of each set."""
+    options, run = [], []
+
+    def flush():
+        if run:
+            options.append({"".join(run).lower()})
+            run.clear()
+
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op == sre_parse.SUBPATTERN:
+            options.extend(_options(av[-1]))
+        elif op == sre_parse.BRANCH:
+            branches = [_longest(_options(b)) for b in av[1]]
+            if all(branches):
+                options.append(set().union(*branches))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            options.extend(_options(av[2]))
+    flush()
+    return [o for o in options if min(map(len, o)) >= MIN_LITERAL]
+
+
+def _longest(options):
+    # without frequencies to go on: the longest shortest literal, then the fewest alternatives
+    return max(options, key=lambda o: (min(map(len, o)), -len(o))) if options else None
+
+
+def required_literals(pattern):
+    """Literal sets a compiled regex can't match without (one literal of each set)."""
+    try:
+        return _options(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return []
+
+
+def _grams(literal):
+    return [literal[i:i + 3] for i in range(len(literal) - 2)]
+
+
+class TextMatcher:
+    """Finds every pattern matching a text without trying them all.
+
+    Each pattern is indexed under one 3-character substring of each literal
+    in one of its required literal sets (the set whose substrings are rarest
+    across all patterns), so a text is only checked against patterns sharing
+    one of its substrings. Patterns without a usable literal are screened in
+    chunks, each with one combined regex.
+    """
+
+    SCAN_CHUNK = 32
+
+    def __init__(self, patterns):
+        self.patterns = patterns  # [(rank, compiled regex)]
+        options = [required_literals(p) for _, p in patterns]
+        counts = {}
+        for opts in options:
+            for gram in {g for o in opts for lit in o for g in _grams(lit)}:
+                counts[gram] = counts.get(gram, 0) + 1
+
+        def cost(option):
+            return sum(min(counts[g] for g in _grams(lit)) for lit in option)
+
+        self.literals = []
+        self.index = {}
+        scan = []
+        for j, opts in enumerate(options):
+            if not opts:
+                self.literals.append(())
+                scan.append(j)
+                continue
+            best = min(opts, key=cost)
+            self.literals.append(tuple(best))
+            for lit in best:
+                self.index.setdefault(min(_grams(lit), key=counts.get), []).append(j)
+        self.scan = [(self._combine([patterns[j][1] for j in chunk]), chunk)
+                     for chunk in (scan[i:i + self.SCAN_CHUNK] for i in range(0, len(scan), self.SCAN_CHUNK))]
+
+    @staticmethod
+    def _combine(regexes):
+        # backreferences would point at the wrong groups once patterns are joined
+        if any(re.search(r"\\\d|\(\?P=", r.pattern) for r in regexes):
+            return None
+        try:
+            return re.compile("|".join(f"(?:{r.pattern})" for r in regexes), re.IGNORECASE)
+        except re.error:
+            return None
+
+    def match(self, text):
+        """Sorted ranks of the patterns that match `text`."""
+        lower = text.lower()
+        candidates = set()
+        for i in range(len(lower) - 2):
+            hit = self.index.get(lower[i:i + 3])
+            if hit:
+                candidates.update(hit)
+        found = []
+        for j in candidates:
+            for lit in self.literals[j]:
+                if lit in lower:
+                    if self.patterns[j][1].search(text):
+                        found.append(self.patterns[j][0])
+                    break
+        for combined, chunk in self.scan:
+            if combined is None or combined.search(text):
+                found.extend(self.patterns[j][0] for j in chunk if self.patterns[j][1].search(text))
+        return tuple(sorted(found))
+
+
+class RuleSet:
+    """Rules in evaluation order (priority, then file order), matched over whole columns."""
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda r: -r.priority)  # stable: ties keep file order
+        self.categories = np.array([r.category for r in self.rules] + [None], dtype=object)
+        self.matchers = {}
+        for field in sorted({f for r in self.rules for f in r.patterns}):
+            self.matchers[field] = TextMatcher(
+                [(rank, r.patterns[field]) for rank, r in enumerate(self.rules) if field in r.patterns])
+        self.untexted = [rank for rank, r in enumerate(self.rules) if not r.patterns]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _candidates(self, matches, key):
+        """Ranks that can match a text combination, cut after the first that needs no row check."""
+        ranks = set(self.untexted)
+        found = {field: set(m[c]) for field, m, c in zip(self.matchers, matches, key)}
+        for field, ranks_here in found.items():
+            for rank in ranks_here:
+                if all(rank in found[other] for other in self.rules[rank].patterns if other != field):
+                    ranks.add(rank)
+        ordered = sorted(ranks)
+        for i, rank in enumerate(ordered):
+            if not self.rules[rank].row_conditions:
+                return ordered[:i], rank
+        return ordered, -1
+
+    def apply(self, texts, amount=None, dates=None):
+        """Rank (into self.rules) of the first rule each row matches; -1 where none does.
+
+        texts maps field -> Series of strings; amount / dates are aligned
+        arrays, needed only when some rule has amount/date conditions.
+        """
+        n = len(next(iter(texts.values()))) if texts else len(amount)
+        result = np.full(n, -1, dtype=np.int64)
+        if not self.rules or n == 0:
+            return result
+
+        # one combination code per row over the distinct texts of every field in use
+        matches, sizes = [], []
+        combined = np.zeros(n, dtype=np.int64)
+        for field, matcher in self.matchers.items():
+            codes, uniques = pd.factorize(texts[field].astype(object).fillna("").astype(str))
+            matches.append([matcher.match(u) for u in uniques])
+            sizes.append(len(uniques))
+            combined = combined * len(uniques) + codes
+        combo, combined_keys = pd.factorize(combined)
+        keys = []
+        for value in combined_keys.tolist():
+            key = []
+            for size in reversed(sizes):
+                value, code = divmod(value, size)
+                key.append(code)
+            keys.append(key[::-1])
+
+        terminal = np.full(len(keys), -1, dtype=np.int64)
+        conditional = {}  # rank -> combos where it must be checked row by row
+        for k, key in enumerate(keys):
+            checks, terminal[k] = self._candidates(matches, key)
+            for rank in checks:
+                conditional.setdefault(rank, []).append(k)
+
+        if conditional:
+            amount = np.asarray(amount, dtype=float) if amount is not None else np.full(n, np.nan)
+            dates = np.asarray(dates, dtype="datetime64[ns]") if dates is not None else np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+            order = np.argsort(combo, kind="stable")
+            bounds = np.searchsorted(combo[order], np.arange(len(keys) + 1))
+            pending = np.ones(n, dtype=bool)
+            for rank in sorted(conditional):
+                rows = np.concatenate([order[bounds[k]:bounds[k + 1]] for k in conditional[rank]])
+                rows = rows[pending[rows]]
+                hit = rows[self.rules[rank].row_mask(amount[rows], dates[rows])]
+                result[hit] = rank
+                pending[hit] = False
+            fill = pending
+        else:
+            fill = np.ones(n, dtype=bool)
+        result[fill] = terminal[combo[fill]]
+        return result
+
+    def categories_for(self, ranks):
+        """Category per row for apply() output (None where no rule matched)."""
+        return self.categories[ranks]
@@ -0,0 +1,167 @@
+"""Trigram index for fast case-insensitive merchant/description search."""
+
+import bisect
+import numpy as np
+import pandas as pd
+from src.dataset import CLEAN_DIR, derived
+from src.memory_budget import budget, nbytes
+from src.partitions import OUT_OF_CORE, categorized_store
+
+NGRAM = 3
+
+# out-of-core mode: (clean_dir, column) -> (partition store version, SearchIndex), charged to the memory budget
+_partitioned = {}
+
+
+def _grams(text):
+    """Distinct trigrams of a (lowercased) string."""
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SearchIndex:
+    """Inverted trigram index over one text column.
+
+    Distinct lowercased values are indexed once; each maps to the row
+    positions holding it. Substring queries take the postings of the query's
+    rarest trigram and verify those candidates; prefix queries bisect a
+    sorted list of the distinct values.
+    New rows can be appended with add_rows() without re-indexing old text.
+    """
+
+    def __init__(self):
+        self._strings = []          # string id -> lowercased text
+        self._ids = {}              # lowercased text -> string id
+        self._postings = {}         # trigram -> list of string ids (ascending)
+        self._sorted = None         # (texts, ids) sorted by text, built lazily
+        self._row_ids = np.empty(0, dtype=np.int32)   # row position -> string id (-1: missing)
+        self._csr = None            # (row order by string id, offsets), built lazily
+
+    @classmethod
+    def from_series(cls, values, previous=None):
+        """Index a column; reuse `previous`'s string table so known text isn't re-gram'd."""
+        index = cls()
+        if previous is not None:
+            index._strings = list(previous._strings)
+            index._ids = dict(previous._ids)
+            index._postings = {g: list(ids) for g, ids in previous._postings.items()}
+        index.add_rows(values)
+        return index
+
+    def __len__(self):
+        return len(self._row_ids)
+
+    def _string_id(self, text):
+        """Id for `text`, indexing its trigrams the first time it's seen."""
+        sid = self._ids.get(text)
+        if sid is None:
+            sid = len(self._strings)
+            self._strings.append(text)
+            self._ids[text] = sid
+            for g in _grams(text):
+                self._postings.setdefault(g, []).append(sid)
+        return sid
+
+    def add_rows(self, values):
+        """Append rows (positions continue after the current last row)."""
+        codes, uniques = pd.factorize(values.astype(object).where(values.notna(), None))
+        lowered = [str(u).lower() for u in uniques]
+        sids = np.array([self._string_id(t) for t in lowered] + [-1], dtype=np.int32)
+        self._row_ids = np.concatenate([self._row_ids, sids[codes]])
+        self._sorted = None
+        self._csr = None
+
+    def _rows_by_string(self):
+        """(row positions grouped by string id, offsets per id), built lazily."""
+        if self._csr is None:
+            order = np.argsort(self._row_ids, kind="stable").astype(np.int32)
+            offsets = np.searchsorted(self._row_ids[order], np.arange(len(self._strings) + 1))
+            self._csr = (order, offsets)
+        return self._csr
+
+    def _rows_for(self, sids):
+        """Sorted row positions holding any of the given string ids."""
+        order, offsets = self._rows_by_string()
+        if len(sids) == 0:
+            return np.empty(0, dtype=np.int32)
+        parts = [order[offsets[s]:offsets[s + 1]] for s in sids]
+        return np.sort(np.concatenate(parts))
+
+    def match_strings(self, query, prefix=False):
+        """Ids of indexed strings containing (or starting with) `query`."""
+        q = str(query).lower()
+        if not q:
+            return list(range(len(self._strings)))
+        if prefix:
+            if self._sorted is None:
+                pairs = sorted(zip(self._strings, range(len(self._strings))))
+                self._sorted = ([p[0] for p in pairs], [p[1] for p in pairs])
+            texts, ids = self._sorted
+            lo = bisect.bisect_left(texts, q)
+            hi = bisect.bisect_left(texts, q + "\U0010ffff")
+            return sorted(ids[lo:hi])
+        if len(q) < NGRAM:
+            return [i for i, t in enumerate(self._strings) if q in t]
+        postings = [self._postings.get(g) for g in _grams(q)]
+        if any(p is None for p in postings):
+            return []
+        # the rarest trigram bounds the candidates; verifying them is cheaper
+        # than intersecting the longer lists
+        strings = self._strings
+        return [i for i in min(postings, key=len) if q in strings[i]]
+
+    def search(self, query, prefix=False):
+        """Row positions whose value contains (or starts with) `query`, ascending."""
+        return self._rows_for(self.match_strings(query, prefix))
+
+    def mask(self, query, prefix=False):
+        """Boolean array over all rows, True where the row matches."""
+        out = np.zeros(len(self._row_ids), dtype=bool)
+        out[self.search(query, prefix)] = True
+        return out
+
+    def suggest(self, query, limit=10, prefix=False):
+        """Matching distinct values with row counts, most frequent first."""
+        sids = self.match_strings(query, prefix)
+        offsets = self._rows_by_string()[1]
+        counts = [(self._strings[s], int(offsets[s + 1] - offsets[s])) for s in sids]
+        counts = [c for c in counts if c[1] > 0]
+        counts.sort(key=lambda c: (-c[1], c[0]))
+        return counts[:limit]
+
+
+def dataset_search_index(column, clean_dir=CLEAN_DIR):
+    """Index for a column of the published dataset, rebuilt (incrementally) per version."""
+    if OUT_OF_CORE:
+        return _partitioned_search_index(column, clean_dir)
+    return derived(
+        f"search:{column}",
+        lambda df, previous: SearchIndex.from_series(df[column], previous),
+        clean_dir,
+    )
+
+
+def _partitioned_search_index(column, clean_dir):
+    """Index over month partitions in order; rows are positions across all partitions."""
+    store = categorized_store(clean_dir)
+    version = store.version()
+    key = (clean_dir, column)
+    hit = _partitioned.get(key)
+    if hit and hit[0] == version:
+        budget.touch("search", key)
+        return hit[1]
+    index = SearchIndex.from_series(pd.Series([], dtype=object), hit[1] if hit else None)
+    for _, part in store.scan(columns=[column]):
+        # one partition's column in memory at a time
+        index.add_rows(part[column])
+    _partitioned[key] = built = (version, index)
+    budget.charge("search", key, nbytes(index),
+                  lambda: _partitioned.pop(key) if _partitioned.get(key) is built else None)
+    return index
+
+
+def search_rows(df, query, columns=("merchant", "description"), prefix=False):
+    """Row positions of `df` matching `query` in any of `columns`, using a throwaway index."""
+    hits = [SearchIndex.from_series(df[c]).search(query, prefix) for c in columns if c in df.columns]
+    if not hits:
+        return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(hits))
@@ -0,0 +1,52 @@
+"""Month x category totals for month-level readers (forecasts, monthly charts)."""
+
+import os
+import pandas as pd
+
+from src.dataset import CLEAN_DIR, SUMMARY_FILE, derived, map_arrow, month_category_totals
+from src.partitions import OUT_OF_CORE, categorized_store
+
+SUMMARY_COLUMNS = ["month", "category", "spend", "signed", "count"]
+
+# out-of-core mode: clean_dir -> (manifest version, summary frame)
+_partitioned = {}
+
+
+def _empty():
+    return pd.DataFrame({c: pd.Series(dtype=float if c in ("spend", "signed") else object) for c in SUMMARY_COLUMNS})
+
+
+def _dataset_summary(df, clean_dir):
+    """Totals written alongside the published dataset (computed if missing)."""
+    path = os.path.join(clean_dir, SUMMARY_FILE)
+    if os.path.exists(path):
+        return map_arrow(path).astype({"month": object, "category": object})
+    return month_category_totals(df)
+
+
+def _partition_summary(clean_dir):
+    """Totals stored in the categorized partitions' manifest entries."""
+    store = categorized_store(clean_dir)
+    manifest = store.manifest()
+    hit = _partitioned.get(clean_dir)
+    if hit and hit[0] == manifest["version"]:
+        return hit[1]
+    rows = [
+        dict(entry, month=month)
+        for month, part in sorted(manifest["partitions"].items())
+        for entry in part.get("summary", [])
+    ]
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS) if rows else _empty()
+    _partitioned[clean_dir] = (manifest["version"], summary)
+    return summary
+
+
+def monthly_summary(clean_dir=CLEAN_DIR):
+    """One row per (month, category): spend, signed and count, months ascending.
+
+    Never touches transaction rows: the totals are precomputed when the
+    dataset (or each month partition) is written.
+    """
+    if OUT_OF_CORE:
+        return _partition_summary(clean_dir)
+    return derived("summary", lambda df, previous: _dataset_summary(df, clean_dir), clean_dir)
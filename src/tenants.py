@@ -0,0 +1,89 @@
+"""Tenant-scoped data directories, so one API deployment can serve many users.
+
+Each request names its tenant in the X-Expense-Tenant header. A tenant's
+raw uploads, clean dataset, config (overrides and rules), learned model and
+job status files live under EXPENSE_TENANTS_DIR/<tenant id>/ with the same
+layout as the single-user `data/` directory. Requests without the header use
+that legacy layout (the "default" tenant) unless EXPENSE_REQUIRE_TENANT is
+set. Tenant ids are not credentials: put the API behind something that
+authenticates users and sets the header.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from src.config_store import CONFIG_DB, DB_FILE
+from src.normalize import NORM_CACHE_PATH
+from src.rules import RULES_JSON
+
+TENANTS_DIR = os.environ.get("EXPENSE_TENANTS_DIR", "data/tenants")
+TENANT_HEADER = "X-Expense-Tenant"
+DEFAULT_TENANT = "default"
+DEFAULT_ROOT = "data"
+REQUIRE_TENANT = os.environ.get("EXPENSE_REQUIRE_TENANT", "").lower() in ("1", "true", "yes")
+# Tenant objects kept per process, least recently used dropped first
+MAX_TENANTS = int(os.environ.get("EXPENSE_TENANTS_CACHED", 1024))
+
+# ids become directory names: no dots or slashes
+_VALID_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+# tenant id -> Tenant, least recently used first (dropped ones are rebuilt from their id)
+_tenants = OrderedDict()
+_tenants_lock = threading.Lock()
+
+
+class TenantError(ValueError):
+    """Missing or malformed tenant id."""
+
+
+class Tenant:
+    """Paths of one tenant's data."""
+
+    def __init__(self, tenant_id, root):
+        self.id = tenant_id
+        self.root = root
+        self.raw_dir = os.path.join(root, "raw")
+        self.clean_dir = os.path.join(root, "clean")
+        self.config_dir = os.path.join(root, "config")
+        self.model_dir = os.path.join(root, "models")
+        self.jobs_dir = os.path.join(root, "jobs")
+        self.pipeline_lock = os.path.join(root, ".pipeline.lock")
+        self.rules_json = os.path.join(self.config_dir, os.path.basename(RULES_JSON))
+        # the default tenant keeps honouring EXPENSE_CONFIG_DB
+        self.config_db = CONFIG_DB if tenant_id == DEFAULT_TENANT else os.path.join(self.config_dir, DB_FILE)
+        # description normalization cache; tenants sharing one would evict each other's entries
+        self.norm_cache = (NORM_CACHE_PATH if tenant_id == DEFAULT_TENANT
+                           else os.path.join(root, "cache", os.path.basename(NORM_CACHE_PATH)))
+
+    def __repr__(self):
+        return f"Tenant({self.id!r}, {self.root!r})"
+
+
+def get_tenant(tenant_id=None):
+    """The Tenant for an id (None or "" is the default tenant); raises TenantError for bad ids."""
+    if not tenant_id:
+        if REQUIRE_TENANT:
+            raise TenantError(f"the {TENANT_HEADER} header is required")
+        tenant_id = DEFAULT_TENANT
+    if not _VALID_ID.fullmatch(tenant_id):
+        raise TenantError("tenant ids are 1-64 letters, digits, '-' or '_'")
+    with _tenants_lock:
+        tenant = _tenants.get(tenant_id)
+        if tenant is not None:
+            _tenants.move_to_end(tenant_id)
+            return tenant
+        root = DEFAULT_ROOT if tenant_id == DEFAULT_TENANT else os.path.join(TENANTS_DIR, tenant_id)
+        tenant = _tenants[tenant_id] = Tenant(tenant_id, root)
+        while len(_tenants) > MAX_TENANTS:
+            _tenants.popitem(last=False)
+        return tenant
+
+
+def list_tenants():
+    """Ids of tenants with data on disk (the default tenant excluded)."""
+    if not os.path.isdir(TENANTS_DIR):
+        return []
+    return sorted(name for name in os.listdir(TENANTS_DIR)
+                  if _VALID_ID.fullmatch(name) and os.path.isdir(os.path.join(TENANTS_DIR, name)))
@@ -0,0 +1,144 @@
+"""Append-only change log on top of the published dataset snapshot.
+
+Override edits and uploads of new statements used to rewrite the whole
+categorized dataset. Instead each change is appended as a small Arrow
+segment, so a write costs O(change):
+
+- "rows": newly ingested, already categorized transactions
+- "assign": (row_id, category, category_source) for rows whose category changed
+
+Readers replay the segments on top of the memory-mapped snapshot. Once the
+log holds more than EXPENSE_LOG_MAX_SEGMENTS segments or
+EXPENSE_LOG_COMPACT_RATIO times the snapshot's rows, the writer folds it
+into a new snapshot (publish_dataset), which starts an empty log.
+
+The manifest names the snapshot its segments apply to. A snapshot is
+written before the log is reset, so after a crash in between, the old
+segments (already folded into the new snapshot) are simply ignored.
+"""
+
+import os
+import json
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src.atomic_io import atomic_path, write_json_atomic
+
+LOG_DIR = "txlog"
+MANIFEST = "_log.json"
+ROW_ID = "row_id"
+MAX_SEGMENTS = int(os.environ.get("EXPENSE_LOG_MAX_SEGMENTS", 64))
+COMPACT_RATIO = float(os.environ.get("EXPENSE_LOG_COMPACT_RATIO", 0.2))
+
+# per-process cache: manifest path -> (mtime, manifest)
+_manifests = {}
+
+
+class ChangeLog:
+    """Segments appended since the last snapshot of one clean dir's dataset."""
+
+    def __init__(self, clean_dir):
+        self.root = os.path.join(clean_dir, LOG_DIR)
+
+    def manifest(self):
+        """{"snapshot": id or None, "snapshot_rows", "next_row_id", "sources": {...}, "segments": [{file, kind, rows}]}."""
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            hit = _manifests.get(path)
+            if hit and hit[0] == mtime:
+                return hit[1]
+            with open(path, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"snapshot": None, "snapshot_rows": 0, "next_row_id": 0, "sources": {}, "segments": []}
+        _manifests[path] = (mtime, manifest)
+        return manifest
+
+    def _commit(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        write_json_atomic(manifest, os.path.join(self.root, MANIFEST))
+
+    def reset(self, snapshot, next_row_id, snapshot_rows, sources=None):
+        """Start an empty log on top of `snapshot` (call after the snapshot is written)."""
+        old = self.manifest()
+        self._commit({"snapshot": snapshot, "snapshot_rows": int(snapshot_rows), "next_row_id": int(next_row_id),
+                      "sources": sources or {}, "segments": []})
+        for seg in old["segments"]:
+            path = os.path.join(self.root, seg["file"])
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _append(self, kind, df, **changes):
+        """Write one segment atomically, then list it in the manifest."""
+        manifest = dict(self.manifest())
+        name = f"{len(manifest['segments']):06d}-{kind}-{uuid.uuid4().hex[:8]}.arrow"
+        os.makedirs(self.root, exist_ok=True)
+        with atomic_path(os.path.join(self.root, name)) as tmp:
+            feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="uncompressed")
+        manifest["segments"] = manifest["segments"] + [{"file": name, "kind": kind, "rows": len(df)}]
+        manifest.update(changes)
+        self._commit(manifest)
+
+    def append_rows(self, df, sources=None):
+        """Log new transactions; returns them with fresh row ids. `sources` adds ingest signatures."""
+        start = self.manifest()["next_row_id"]
+        df = df.assign(**{ROW_ID: range(start, start + len(df))})
+        self._append("rows", df, next_row_id=start + len(df),
+                     sources=dict(self.manifest()["sources"], **(sources or {})))
+        return df
+
+    def assign(self, row_ids, categories, category_sources):
+        """Log new categories for existing rows."""
+        self._append("assign", pd.DataFrame({
+            ROW_ID: pd.Series(row_ids).to_numpy(dtype="int64"),
+            "category": pd.Series(categories).astype(str).to_numpy(dtype=object),
+            "category_source": pd.Series(category_sources).astype(str).to_numpy(dtype=object),
+        }))
+
+    def pending_rows(self):
+        """Rows logged since the snapshot."""
+        return sum(seg["rows"] for seg in self.manifest()["segments"])
+
+    def needs_compaction(self):
+        """True once replaying costs enough that a new snapshot is worth writing."""
+        manifest = self.manifest()
+        return (len(manifest["segments"]) > MAX_SEGMENTS
+                or self.pending_rows() > COMPACT_RATIO * max(manifest["snapshot_rows"], 1))
+
+    def replay(self, df, snapshot, read):
+        """`df` (the snapshot named `snapshot`) with every logged change applied.
+
+        `read(path)` loads a segment file into a frame (dataset.map_arrow).
+        """
+        manifest = self.manifest()
+        if manifest["snapshot"] != snapshot or not manifest["segments"]:
+            return df
+        segments = {kind: [read(os.path.join(self.root, seg["file"])) for seg in manifest["segments"] if seg["kind"] == kind]
+                    for kind in ("rows", "assign")}
+        added = segments["rows"]
+        if added:
+            df = pd.concat([df] + added, ignore_index=True)
+        assigned = segments["assign"]
+        if assigned:
+            # later assignments win
+            changes = pd.concat(assigned, ignore_index=True).drop_duplicates(ROW_ID, keep="last")
+            pos = pd.Index(df[ROW_ID]).get_indexer(changes[ROW_ID])
+            found = pos >= 0
+            df = df.copy(deep=False)
+            for col in ("category", "category_source"):
+                values = df[col].astype(object).to_numpy(copy=True)
+                values[pos[found]] = changes[col].to_numpy()[found]
+                df[col] = pd.Categorical(values)
+        return df
+
+    def drop(self):
+        """Remove every segment and the manifest."""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            os.remove(os.path.join(self.root, name))
+        os.rmdir(self.root)
+        _manifests.pop(os.path.join(self.root, MANIFEST), None)